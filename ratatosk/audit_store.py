@@ -0,0 +1,113 @@
+import numpy as np
+import pandas as pd
+from typing import Optional
+
+# status of a checked value, stored as its int8 position in STATUSES, -1 if there is none
+STATUSES = ['OK','NOK','NA','NC','As Info']
+
+def encode_status(values) -> np.ndarray :
+    '''
+    Return the int8 status code of each item of ``values``, -1 for missing or unknown statuses.
+    '''
+    return pd.Index(STATUSES).get_indexer(pd.Series(values,dtype=object)).astype(np.int8)
+
+def decode_status(codes: np.ndarray) -> np.ndarray :
+    '''
+    Return the status string of each code of ``codes``, None for -1.
+    '''
+    statuses = np.array(STATUSES+[None],dtype=object)
+    return statuses[codes]
+
+def count_status(codes: np.ndarray) -> dict :
+    '''
+    Return {status : number of rows} of the status ``codes``.
+    '''
+    counts = np.bincount(codes[codes != -1],minlength=len(STATUSES))
+    return dict(zip(STATUSES,counts.tolist()))
+
+class auditFrame:
+    '''
+    Compact audit result of a sub-MO.
+
+    Rather than a copy of the MO dataframe with string ``_ref`` and ``_check``
+    columns for every parameter, the result keeps the positions of the audited
+    rows in the loaded MO dataframe, and per parameter the recommended settings
+    as a Categorical and the statuses as int8 codes, both aligned to the rows.
+    ``frame`` decodes a dataframe in the former layout when a report is written.
+
+    Parameters
+    ----------
+    mo     : MO name of the loaded MO dataframe.
+    rows   : positions of the audited rows in the loaded MO dataframe.
+    params : dictionary of parameter to (recommended setting Categorical, status codes).
+    source : loaded MO dataframe, default None. It is not sent along when the
+             result is pickled and has to be set again on the receiving side.
+    '''
+    def __init__(
+            self,
+            mo: str,
+            rows: np.ndarray,
+            params: dict,
+            source: Optional[pd.DataFrame] = None
+    ):
+        self.mo = mo
+        self.rows = rows
+        self.params = params
+        self.source = source
+
+    @classmethod
+    def from_frame(
+            cls,
+            mo: str,
+            df: pd.DataFrame,
+            rows: np.ndarray,
+            params: list,
+            source: Optional[pd.DataFrame] = None
+    ) -> 'auditFrame' :
+        '''
+        Compact the audited dataframe ``df`` whose rows are the rows ``rows`` of the loaded MO.
+        Parameters without ``_ref`` and ``_check`` columns in ``df`` are not kept.
+        '''
+        compact_params = {}
+        for param in params:
+            if (param+'_ref' in df.columns) and (param+'_check' in df.columns):
+                compact_params[param] = (pd.Categorical(df[param+'_ref']),
+                                         encode_status(df[param+'_check']))
+
+        return cls(mo,np.asarray(rows,dtype=np.int64),compact_params,source)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['source'] = None
+        return state
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def ref(self,param: str) -> pd.Series :
+        return pd.Series(np.asarray(self.params[param][0]),name=param+'_ref')
+
+    def status(self,param: str) -> pd.Series :
+        return pd.Series(decode_status(self.params[param][1]),name=param+'_check')
+
+    @property
+    def columns(self) -> list :
+        return list(self.source.columns)+[param+suffix for param in self.params for suffix in ['_ref','_check']]
+
+    def frame(
+            self,
+            columns: Optional[list] = None,
+            params: Optional[list] = None
+    ) -> pd.DataFrame :
+        '''
+        Return the audited rows of the loaded MO, ``columns`` only if specified, followed by
+        the ``_ref`` and ``_check`` columns of the audited ``params``, all if not specified.
+        '''
+        df = self.source if columns is None else self.source[[col for col in self.source.columns if col in columns]]
+        df = df.take(self.rows).reset_index(drop=True)
+        decoded = {}
+        for param in (self.params if params is None else [param for param in params if param in self.params]):
+            decoded[param+'_ref'] = self.ref(param)
+            decoded[param+'_check'] = self.status(param)
+
+        return pd.concat([df,pd.DataFrame(decoded,index=df.index)],axis=1)
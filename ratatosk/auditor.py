@@ -3,20 +3,43 @@ import numpy as np
 import re
 import ast
 import os
-from copy import copy
 import string
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 from typing import Dict, Optional
 
 from pandas.api.types import is_numeric_dtype
 from .config_reference import ConfigReference
 from .cell_list import CellList
+from .identifiers import IdentifierDictionary
+from .dependency import dependencyIndex
+from .audit_store import auditFrame, encode_status, count_status
+from .report_writer import verboseReportWriter, summaryWriter, SUMMARY_COLUMNS, SUMMARY_CHUNK_ROWS
+from .cm import cmPrefetcher, sharedCmDict
+from .shared_frames import sharedFrameStore
+from . import naming
+from . import rules
 from ratatosk.global_config import GlobalConfig
 
-from openpyxl import Workbook
-from openpyxl.utils.dataframe import dataframe_to_rows
-from openpyxl.styles import Fill, PatternFill, Alignment, Border, Side, Font
+from openpyxl.styles import PatternFill
 from openpyxl.styles.colors import Color
 
+# cell columns the band of a row is derived from
+CELL_COLUMNS = ['eutrancellfddid','eutrancelltddid','nrcellduid']
+
+# (auditor, reference, cm, dict_band) of an audit worker process
+_worker_state = None
+
+def _init_audit_worker(auditor,reference,dict_band):
+    global _worker_state
+    _worker_state = (auditor,reference,sharedCmDict({}),dict_band)
+
+def _audit_unit(mo,sub_id,handles):
+    auditor,reference,dict_df,dict_band = _worker_state
+    dict_df.update(handles)
+    sub_mo,df,rows = auditor.prepare_sub_mo(reference,dict_df,mo,sub_id,dict_band)
+    return sub_mo,auditor.audit_sub_mo(reference,dict_df,mo,sub_mo,df,rows)
+
 class auditResult:
     def __init__(
             self,
@@ -34,8 +57,7 @@ class auditResult:
             verbose: bool = False,
     ) -> None:
         if not verbose:
-            df = self.__create_simple_report()
-            df.to_excel(file_path,index=None)
+            self.__create_simple_report(file_path)
             print('  Done')
         else:
             df = self.__create_verbose_report(file_path,
@@ -45,52 +67,66 @@ class auditResult:
         return None
 
     def __create_simple_report(
-            self
-    ) -> pd.DataFrame :
+            self,
+            file_path: str
+    ) -> None :
+        '''
+        Stream the simple summary, one row per (audited row, parameter), to ``file_path``
+        as csv, parquet or excel depending on its extension.
+        '''
         print('Creating simple summary.')
-        df_brief_summary = pd.DataFrame(columns=['mecontext','MO Class','MO','Parameter','Value','Recommended Setting','Status'])
-        df_format = self.config_reference.settings
+        writer = summaryWriter(file_path)
 
         for sub_mo in self.audit_result:
             print(sub_mo)
 
             mo_id = sub_mo.split('=')[0].lower()+'id'
 
-            df_concheck = self.audit_result[sub_mo]
+            parameters = list(pd.unique(self.config_reference.settings.loc[self.config_reference.settings['MO']==sub_mo]['Parameter']))
+            parameters = [param.lower() for param in parameters]
+            sub_ids = ['eutrancellfddid','eutrancelltddid','nrcellduid',mo_id]
+
+            df_concheck = self.audit_result[sub_mo].frame(columns=['mecontext']+sub_ids+parameters,params=parameters)
 
             df_concheck['MO'] = ''
-            sub_ids = ['eutrancellfddid','eutrancelltddid','nrcellduid',mo_id]
             for col in df_concheck.columns:
                 if (col.endswith('id')) and (col in sub_ids):
                     # print(col)
                     # print(pd.unique(df_concheck[col]))
                     df_concheck.loc[df_concheck['MO']!='','MO'] = df_concheck['MO']+','
                     df_concheck['MO'] = df_concheck['MO']+'%s='%col.replace('id','')
-                    df_concheck['MO'] = df_concheck['MO']+df_concheck[col].fillna('').astype(str).str.replace('\.0','')
+                    df_concheck['MO'] = df_concheck['MO']+df_concheck[col].astype(object).fillna('').astype(str).str.replace('\.0','')
 
-            parameters = list(pd.unique(self.config_reference.settings.loc[self.config_reference.settings['MO']==sub_mo]['Parameter']))
+            df_summary = self.melt_summary(df_concheck,sub_mo.split('=')[0],parameters)
+            for start in range(0,len(df_summary),SUMMARY_CHUNK_ROWS):
+                writer.write(df_summary.iloc[start:start+SUMMARY_CHUNK_ROWS])
+
+        writer.close()
 
-            #print(df_concheck)
-
-            for param in parameters:
-                param = param.lower()
-                df_concheck_summary = df_concheck[['mecontext','MO',param,param+'_ref',param+'_check']]
-                df_concheck_summary['Parameter'] = param
-                df_concheck_summary['MO Class'] = sub_mo.split('=')[0]
-                df_concheck_summary = df_concheck_summary.rename(columns={param : 'Value',
-                                                                          param+'_ref':'Recommended Setting',
-                                                                          param+'_check':'Status'})
-                df_concheck_summary = df_concheck_summary[['mecontext',
-                                                           'MO Class',
-                                                           'MO',
-                                                           'Parameter',
-                                                           'Value',
-                                                           'Recommended Setting',
-                                                           'Status'
-                                                           ]]
-                df_brief_summary = pd.concat([df_brief_summary,df_concheck_summary])
-
-        return df_brief_summary
+    def melt_summary(
+            self,
+            df_concheck: pd.DataFrame,
+            mo_class: str,
+            parameters: list
+    ) -> pd.DataFrame :
+        '''
+        Melt the value, _ref and _check columns of ``parameters`` into the long summary
+        table, the rows of the first parameter first.
+        '''
+        def melt(suffix):
+            return np.concatenate([df_concheck[param+suffix].to_numpy(dtype=object) if param+suffix in df_concheck.columns
+                                   else np.full(len(df_concheck),np.nan,dtype=object)
+                                   for param in parameters]+[np.array([],dtype=object)])
+
+        return pd.DataFrame({
+            'mecontext'           : np.tile(df_concheck['mecontext'].to_numpy(dtype=object),len(parameters)),
+            'MO Class'            : mo_class,
+            'MO'                  : np.tile(df_concheck['MO'].to_numpy(dtype=object),len(parameters)),
+            'Parameter'           : np.repeat(np.array(parameters,dtype=object),len(df_concheck)),
+            'Value'               : melt(''),
+            'Recommended Setting' : melt('_ref'),
+            'Status'              : melt('_check')
+        },columns=SUMMARY_COLUMNS)
 
     def __create_verbose_report(
             self,
@@ -102,36 +138,34 @@ class auditResult:
         print('Creating Verbose Report')
         print('-----------------------------')
 
-        wb = Workbook()
+        writer = verboseReportWriter(file_path)
 
         df_format = self.config_reference.settings
         df_sheet = ran_objects[['mecontext', 'siteid', 'cell', 'dlChannelBandwidth']]
         df_sheet['duplex_type'] = np.nan
-        dict_concheck = self.audit_result
         config_reference = self.config_reference
         common_col = df_sheet.columns
 
-        dict_sheet = {}
         summary_data = []
         summary_index = [2]
         group_summary_index = [3]
 
-        new_sub_mo_rows = []
+        # decoded audit results of the MOs, keyed to the rows of df_sheet, kept until their last parameter
+        prepared = {}
+        remaining = df_format['MO'].value_counts().to_dict()
 
         for indicator in pd.unique(df_format['Parameter Indicator']):
-            dict_sheet[indicator] = wb.create_sheet(indicator)
+            sheet_groups = []
             print("%s" %indicator)
 
             indicator_col = []
             indicator_check_col = []
 
             df_indicator = df_format.loc[df_format['Parameter Indicator'] == indicator]
-            df_sheet['check_overall_'+indicator] = np.nan
+            indicator_nok = np.zeros(len(df_sheet),dtype=bool)
 
             indicator_pos = 5
             color_index = 40
-            param_start_index = [indicator_pos]
-            group_letter =[]
 
             indicator_summary_dict = {'Parameter Indicator': indicator, 'OK': 0, 'NOK': 0, 'NA': '', 'NC': ''}
             group_summary_list = []
@@ -144,125 +178,73 @@ class auditResult:
 
                 df_group = df_indicator.loc[df_indicator['Group Parameter'] == group]
 
-                df_sheet['check_'+group] = np.nan
-                d = dict_sheet[indicator].cell(row=1, column=indicator_pos, value=group)
-
                 param_summary_list = []
+                group_check_col = []
 
                 for index,row in df_group.iterrows():
                     param = row['Parameter']
                     mo = row['MO']
                     action = row['Action']
-                    remark = row['Remark']
                     rules = row['Rules']
 
                     if ('CellRelation' in mo) or ('External' in mo):
                         continue
 
-                    index_col = ['mecontext']
-                    cell_cols = ['eutrancellfddid','eutrancelltddid','nrcellduid']
-                    for col in cell_cols:
-                        if (col in dict_concheck[mo].columns) & (col not in index_col):
-                            index_col.append('cell')
-                    
-                    sub_ids = []
-                    df_concheck = dict_concheck[mo].copy()
-                    mo_id = mo.lower()+'id'
-                    if ("=*" in mo):
-                        if (mo_id not in cell_cols) & (mo_id in df_concheck.columns):
-                            sub_ids = list(pd.unique(df_concheck[mo_id]))
-                        else:
-                            sub_ids=['']
-                    else:
-                        sub_ids=['']
-                    
-                    # merge cells
-                    df_concheck['cell'] = ''
-                    df_concheck['duplex_type'] = ''
-                    for cell_col in cell_cols:
-                        #print(cell_col)
-                        if cell_col in df_concheck.columns:
-                            df_concheck.loc[(pd.notnull(df_concheck[cell_col]) & (df_concheck['cell']=='')), 'cell'] = df_concheck[cell_col]
-                            df_concheck.loc[(pd.notnull(df_concheck[cell_col]) & (df_concheck['duplex_type']=='')), 'duplex_type'] = cell_col.replace('id','')
-                            #print(f"df concheck : {df_concheck}")
-                    for sub_id in sub_ids:
-                        if sub_id != '':
-                            df_sub_concheck = df_concheck.loc[df_concheck[mo_id]==sub_id]
-                            sub_mo = mo+"="+str(sub_id)
-                            new_sub_mo_rows.append({
-                                'MO.Parameter'  : sub_mo+'.'+param,
-                                'Action'        : action,
-                                'Remark'        : remark,
-                                'Rules'         : rules
-                            })
-                        else:
-                            df_sub_concheck = df_concheck
-                            sub_mo=mo
-
-                        #print(f"dfconcheck: {df_sub_concheck}")
-
-                        col_name = sub_mo+'.'+param
-
-                        dict_concheck_mapper = df_sub_concheck.set_index(index_col).to_dict()
-
-                        df_sheet[col_name] = np.nan
-                        df_sheet.loc[pd.isnull(df_sheet[col_name]),col_name] = df_sheet.set_index(index_col).index.map(dict_concheck_mapper[param])
-                        
-                        #print(index_col)
-                        
-                        if mo.lower()+'id' in cell_cols:
-                            df_sheet.loc[pd.isnull(df_sheet['duplex_type']),'duplex_type'] = df_sheet.loc[pd.isnull(df_sheet['duplex_type'])].set_index(index_col).index.map(dict_concheck_mapper['duplex_type'])
-                            # df_sheet.loc[(pd.isnull(df_sheet[col_name]) & (df_sheet['duplex_type']!=mo.lower())) ,col_name] = "-"
-                            #print(f"df sheet : {df_sheet.loc[(pd.isnull(df_sheet[col_name]) & (df_sheet['duplex_type']!=mo.lower()))]}")
-                            #if 'eutrancellfdd' in col_name.lower():
-                            #print(f"df sheet : {df_sheet}")
-
-                        indicator_col.append(col_name)
-                        group_member_count+=1
-
-                        df_sheet[col_name+'_ref'] = np.nan
-                        df_sheet[col_name+'_check'] = np.nan
-                        try:
-                            df_sheet.loc[pd.isnull(df_sheet[col_name+'_ref']),col_name+'_ref'] = df_sheet.set_index(index_col).index.map(dict_concheck_mapper[param+'_ref'])
-                            df_sheet.loc[pd.isnull(df_sheet[col_name+'_check']),col_name+'_check'] = df_sheet.set_index(index_col).index.map(dict_concheck_mapper[param+'_check'])
-
-                            indicator_col.append(col_name+'_ref')
-                            indicator_col.append(col_name+'_check')
+                    if mo not in prepared:
+                        prepared[mo] = self.__prepare_mo(mo,df_sheet)
+                    df_concheck,indexer = prepared[mo]
 
-                            group_member_count+=2
+                    col_name = mo+'.'+param
 
-                        except Exception as err:
-                            print(err)
-                            df_sheet[col_name+'_check'] = np.nan
-                            indicator_col.append(col_name+'_check')
-                            group_member_count+=1
-
-                        print("          %s" %col_name)
-                        
-                        if action.lower() == 'as info':
-                            df_sheet.loc[pd.notnull(df_sheet[col_name+'_ref']),col_name+'_check'] = 'As Info'
-                            df_sheet.loc[df_sheet[col_name+'_check']=='As Info',col_name+'_ref'] = rules
-                        
-                        df_sheet.loc[(pd.isnull(df_sheet[col_name+'_ref'])), col_name+'_check'] = 'NC'
-                        df_sheet.loc[((df_sheet[col_name+'_ref']=='None') & (pd.notnull(df_sheet[col_name]))), col_name+'_check'] = 'NC'
+                    df_sheet[col_name] = self.__take_rows(df_concheck,param,indexer)
 
-                        # df_sheet.loc[((pd.isnull(df_sheet[col_name+'_check'])) & (df_sheet[col_name]=="-")),col_name+'_check'] = 'OK'
+                    indicator_col.append(col_name)
+                    group_member_count+=1
 
-                        #df_sheet.loc[(pd.isnull(df_sheet[col_name+'_check'])) | (pd.isnull(df_sheet[col_name])),'check_'+group] = 'NA'
-                        df_sheet.loc[(pd.isnull(df_sheet['check_'+group])) & (df_sheet[col_name+'_check'] == 'NOK'),'check_'+group] = 'NOK'
+                    # object columns, statuses and settings are written into them below
+                    df_sheet[col_name+'_ref'] = self.__take_rows(df_concheck,param+'_ref',indexer)
+                    df_sheet[col_name+'_check'] = self.__take_rows(df_concheck,param+'_check',indexer)
+                    if param+'_ref' in df_concheck.columns:
 
-                        summary_dict = self.create_summary_dict(df_sheet[col_name+'_check'])
-                        param_summary = {'Parameter Indicator': col_name, 
-                                        'OK': summary_dict['OK'], 
-                                        'NOK': summary_dict['NOK'], 
-                                        'NA': summary_dict['NA'],
-                                        'NC': summary_dict['NC']}
-                        param_summary_list.append(param_summary)
+                        indicator_col.append(col_name+'_ref')
+                        indicator_col.append(col_name+'_check')
 
-                df_sheet.loc[(pd.isnull(df_sheet['check_'+group])),'check_'+group] = 'OK'
+                        group_member_count+=2
+                    else:
+                        # the parameter was not audited (no row to audit)
+                        print("'%s_ref'"%param)
+                        indicator_col.append(col_name+'_check')
+                        group_member_count+=1
 
-                #df_sheet.loc[df_sheet['check_'+group]=='NA', 'check_overall_'+indicator] = 'NA'
-                df_sheet.loc[(pd.isnull(df_sheet['check_overall_'+indicator])) & (df_sheet['check_'+group] == 'NOK'),'check_overall_'+indicator] = 'NOK'
+                    print("          %s" %col_name)
+                    
+                    if action.lower() == 'as info':
+                        df_sheet.loc[pd.notnull(df_sheet[col_name+'_ref']),col_name+'_check'] = 'As Info'
+                        df_sheet.loc[df_sheet[col_name+'_check']=='As Info',col_name+'_ref'] = rules
+                    
+                    df_sheet.loc[(pd.isnull(df_sheet[col_name+'_ref'])), col_name+'_check'] = 'NC'
+                    df_sheet.loc[((df_sheet[col_name+'_ref']=='None') & (pd.notnull(df_sheet[col_name]))), col_name+'_check'] = 'NC'
+                    group_check_col.append(col_name+'_check')
+
+                    summary_dict = self.create_summary_dict(df_sheet[col_name+'_check'])
+                    param_summary = {'Parameter Indicator': col_name, 
+                                    'OK': summary_dict['OK'], 
+                                    'NOK': summary_dict['NOK'], 
+                                    'NA': summary_dict['NA'],
+                                    'NC': summary_dict['NC']}
+                    param_summary_list.append(param_summary)
+
+                    # drop the decoded MO after its last parameter
+                    remaining[mo] -= 1
+                    if remaining[mo] == 0:
+                        del prepared[mo]
+
+                # a group is NOK if any of its parameters is NOK, the indicator if any of its groups is
+                group_nok = np.zeros(len(df_sheet),dtype=bool)
+                for col in group_check_col:
+                    group_nok |= (df_sheet[col] == 'NOK').to_numpy()
+                df_sheet['check_'+group] = np.where(group_nok,'NOK','OK').astype(object)
+                indicator_nok |= group_nok
 
                 summary_dict = self.create_summary_dict(df_sheet['check_'+group])
                 group_summary = {'Parameter Indicator': group, 
@@ -273,36 +255,21 @@ class auditResult:
                 group_summary_list.append(group_summary)
                 group_summary_list += param_summary_list
 
-                dict_sheet[indicator].merge_cells(start_row=1,start_column=indicator_pos, end_row=1 , end_column=indicator_pos+group_member_count-1)
-                d.alignment = Alignment(horizontal="center",vertical='center')
-                d.fill = group_color
+                sheet_groups.append((group,group_color,group_member_count))
 
                 indicator_pos+=group_member_count
                 indicator_check_col.append('check_'+group)
-                param_start_index.append(indicator_pos)
-                group_letter.append(d.column_letter)
 
                 color_index += 1
 
                 group_summary_index.append(group_summary_index[-1]+1+int(group_member_count/3))
 
 
-            df_sheet.loc[(pd.isnull(df_sheet['check_overall_'+indicator])),'check_overall_'+indicator] = 'OK'
-
-            ####### Overall Check Column Formatting ######
+            df_sheet['check_overall_'+indicator] = np.where(indicator_nok,'NOK','OK').astype(object)
 
             summary_index.append(group_summary_index[-1])
             group_summary_index[-1] += 1
 
-            d = dict_sheet[indicator].cell(row=1, column=indicator_pos, value='Overall Check')
-            dict_sheet[indicator].merge_cells(start_row=1,
-                                            end_row=1,
-                                            start_column=indicator_pos, 
-                                            end_column=indicator_pos+len(pd.unique(df_indicator['Group Parameter']))-1)
-            d.alignment = Alignment(horizontal="center",vertical="center")
-            d.fill = PatternFill(patternType='solid', fgColor=Color(indexed=color_index+1))
-            group_letter.append(d.column_letter)
-
             indicator_check_col.append('check_overall_'+indicator)
 
             summary_dict = self.create_summary_dict(df_sheet['check_overall_'+indicator])
@@ -318,81 +285,20 @@ class auditResult:
             df = df_sheet[presentation_col]
             df = df.drop('duplex_type', axis=1)
 
-            for r in dataframe_to_rows(df,index=None):
-                dict_sheet[indicator].append(r)
-
-            for i in range(len(param_start_index)):
-                start_i = param_start_index[i]-1
-                last_col = False
-                if (i == len(param_start_index)-1):
-                    stop_i = start_i+len(pd.unique(df_indicator['Group Parameter']))
-                    last_col = True
-                else:
-                    stop_i = param_start_index[i+1]-1
-
-                j=0
-                for col in range(start_i,stop_i):
-                    try:
-                        letter = dict_sheet[indicator][2][col].column_letter
-                        if last_col:
-                            dict_sheet[indicator][2][col].fill = copy(dict_sheet[indicator][2][param_start_index[j]-1].fill)
-                            j+=1
-                        else:
-                            dict_sheet[indicator][2][col].fill = copy(dict_sheet[indicator][1][start_i].fill)
-
-                        dict_sheet[indicator][2][col].alignment = Alignment(textRotation=45,horizontal="center")
-                        
-                        header_text = v
-                        dict_sheet[indicator].column_dimensions[letter].width = max(len(header_text))
-                        
-                        if ('ref' in dict_sheet[indicator][2][col].value) or ('_check' in dict_sheet[indicator][2][col].value):     
-                            dict_sheet[indicator].column_dimensions[letter].hidden = True
-                    except:
-                        pass
-
-            dsum = dict_sheet[indicator].cell(row=2, column=indicator_pos+len(pd.unique(df_indicator['Group Parameter'])), value='Summary')
-            dsum.alignment = Alignment(textRotation=45,horizontal="center")
-            dsum.fill = PatternFill(patternType='solid', fgColor=Color(indexed=52))
-            group_letter.append(dsum.column_letter)
-
-            double = Side(border_style='thin',color="000000")
-
-            for row in dict_sheet[indicator].iter_rows(min_row=1, max_col=stop_i+1, max_row=2):
-                for cell in row:
-                    cell.border = Border(left=double,right=double,top=double,bottom=double)
-
-            for row in dict_sheet[indicator].iter_rows(min_row=3, max_col=stop_i+1, max_row=len(df)+1):
-                for cell in row:
-                    cell.border = Border(left=double,right=double)
-            
-            # Format first 4 id columns (mecontext,cell,siteid,dlchannelbw)
-            for i in range(4):
-                dict_sheet[indicator].cell(row=2, column=i+1).alignment = Alignment(horizontal='center', vertical='center')
-
-            dict_sheet[indicator].row_dimensions[1].hidden = True
-            dict_sheet[indicator].freeze_panes = dict_sheet[indicator]['E3']
-            dict_sheet[indicator].sheet_view.zoomScale = 75
+            writer.write_indicator(indicator,df,sheet_groups,PatternFill(patternType='solid', fgColor=Color(indexed=color_index+1)))
         
         ### ------------------ Add CellRelation --------------- ###
         for mo in dict_df:
             if ('CellRelation' in mo) or ('External' in mo):
-                ws = wb.create_sheet(title=mo)
-                df_concheck = dict_df[mo].configuration
-                for r in dataframe_to_rows(df_concheck,index=None,header=True):
-                    ws.append(r)
+                writer.write_table(mo,dict_df[mo].configuration)
 
         ######-------------------------------------------------- Adding Summary Sheet ------------------------------------------###############
         print('Calculating Summary')
-        ws = wb['Sheet']
-        ws.title = 'Summary'
 
         df_summary = pd.DataFrame(summary_data)
 
         # ADD FEATURE STATE NAME IN A NEW COlUMN #
         df_summary['Info'] = ''
-        df_format = pd.concat([df_format,
-                               pd.DataFrame(new_sub_mo_rows)],
-                               ignore_index=True)
 
         if 'FeatureState' in dict_df:
             df_featurestate = dict_df['FeatureState'].configuration.copy()
@@ -411,47 +317,144 @@ class auditResult:
         df_summary['Rules'] = df_summary['Parameter Indicator'].map(df_format.set_index('MO.Parameter').to_dict()['Rules'])
         df_summary['Rules'] = df_summary['Rules'].astype(str).str.replace('None',"")
 
-        for r in dataframe_to_rows(df_summary,index=None,header=True):
-            ws.append(r)
+        writer.write_summary(df_summary,summary_index,group_summary_index)
+        writer.save()
+        print('Done')
+
+    def __prepare_mo(
+            self,
+            mo: str,
+            df_sheet: pd.DataFrame
+    ) -> tuple :
+        '''
+        Decode the audited rows of ``mo`` once for all its parameters and return them with,
+        for each row of ``df_sheet``, the position of its audited row (-1 if there is none).
 
-        header_color = PatternFill(patternType='solid', fgColor=Color(indexed=32))
-        summary_color = PatternFill(patternType='solid', fgColor=Color(indexed=48))
-        mo_color = PatternFill(patternType='solid', fgColor=Color(indexed=44))
+        Rows are matched on mecontext, and also on the cell for cell level MOs. The last
+        audited row wins on duplicated keys.
+        '''
+        cell_cols = ['eutrancellfddid','eutrancelltddid','nrcellduid']
+        settings = self.config_reference.settings
+        params = list(pd.unique(settings.loc[settings['MO']==mo,'Parameter']))
+        df_concheck = self.audit_result[mo].frame(columns=['mecontext']+cell_cols+params,params=params)
+
+        index_col = ['mecontext']
+        keys = [df_concheck['mecontext'].to_numpy(dtype=object)]
+        if any(col in df_concheck.columns for col in cell_cols):
+            # merge cells, first cell column set
+            cell = pd.Series('',index=df_concheck.index,dtype=object)
+            for cell_col in cell_cols:
+                if cell_col in df_concheck.columns:
+                    cell = cell.mask(pd.notnull(df_concheck[cell_col]) & (cell==''),df_concheck[cell_col].astype(object))
+            index_col.append('cell')
+            keys.append(cell.to_numpy())
+
+        index = pd.MultiIndex.from_arrays(keys) if len(keys)>1 else pd.Index(keys[0])
+        unique = ~index.duplicated(keep='last')
+        positions = np.flatnonzero(unique)
+        indexer = index[unique].get_indexer(df_sheet.set_index(index_col).index)
+        indexer[indexer != -1] = positions[indexer[indexer != -1]]
+
+        return df_concheck,indexer
+
+    def __take_rows(
+            self,
+            df_concheck: pd.DataFrame,
+            col: str,
+            indexer: np.ndarray
+    ) -> pd.Index :
+        '''
+        Return ``df_concheck[col]`` at the rows ``indexer``, NaN for -1.
+        '''
+        if col not in df_concheck.columns:
+            return pd.Index(np.full(len(indexer),np.nan,dtype=object))
 
-        header_col_index = [0,1,2,3]
-        for color_index in header_col_index:
-            ws[1][color_index].fill = header_color
-            ws[1][color_index].font = Font(color=Color(indexed=1))
-            for i in summary_index:
-                ws[i][color_index].fill = summary_color
-            for i in group_summary_index:
-                ws[i][color_index].fill = mo_color
+        values = df_concheck[col].to_numpy(dtype=object)
+        if len(values)==0:
+            return pd.Index(np.full(len(indexer),np.nan,dtype=object))
+        values = values[np.maximum(indexer,0)]
+        values[indexer == -1] = np.nan
 
-        wb.save(file_path)
-        print('Done')
+        return pd.Index(values)
 
     def create_summary_dict(self,series):
-        summary_dict = series.value_counts().to_dict()
-        if not ('OK' in summary_dict):
-            summary_dict['OK'] = 0
-        if not ('NOK' in summary_dict):
-            summary_dict['NOK'] = 0
-        if not ('NA' in summary_dict):
-            summary_dict['NA'] = 0
-        if not ('As Info' in summary_dict):
-            summary_dict['As Info'] = 0
-        if not ('NC' in summary_dict):
-            summary_dict['NC'] = 0    
-        
+        ''' Count the statuses of ``series``, either status strings or int8 status codes '''
+        codes = series.to_numpy() if series.dtype == np.int8 else encode_status(series)
+        summary_dict = count_status(codes)
+
         summary_dict['OK'] += summary_dict['As Info'] + summary_dict['NC']
         summary_dict['NA'] = len(series)-summary_dict['OK']-summary_dict['NOK']
         
         return summary_dict
     
 
+class bandPartition:
+    '''
+    Band partition index of a cm dataframe.
+
+    Rows are ordered by band, in the order of ``groupby('band')``, so the rows
+    of a band are a contiguous slice of ``df``. Rows without band are dropped.
+    Auditing a parameter keeps the rows of a band together, thus the index is
+    updated from the length of the audited groups instead of regrouping.
+
+    Parameters
+    ----------
+    df : cm dataframe with a ``band`` column.
+    '''
+    def __init__(
+            self,
+            df: pd.DataFrame
+    ):
+        codes,bands = pd.factorize(df['band'],sort=True)
+        order = np.argsort(codes,kind='stable')
+        order = order[codes[order] != -1]
+        self.df = df.take(order)
+        self.bands = list(bands)
+        self.bounds = np.concatenate([[0],np.cumsum(np.bincount(codes[codes != -1],minlength=len(bands)))])
+
+    def groups(self):
+        '''
+        Yield (band, rows of the band) in band order.
+        '''
+        for i,band in enumerate(self.bands):
+            yield band,self.df.iloc[self.bounds[i]:self.bounds[i+1]].copy()
+
+    def update(
+            self,
+            df: pd.DataFrame,
+            lengths: list
+    ):
+        '''
+        Replace ``df`` by the concatenation of the audited groups of ``lengths`` rows.
+        '''
+        self.df = df
+        self.bounds = np.concatenate([[0],np.cumsum(lengths)]).astype(int)
+
 class Auditor:
-    def __init__(self):
-        pass
+    '''
+    Auditor of loaded cm against a config reference.
+
+    Parameters
+    ----------
+    identifiers : IdentifierDictionary used to encode the identifier columns of
+                  the loaded cm, default None. If specified dependency lookups join
+                  on integer identifier codes.
+    workers     : number of processes auditing sub-MOs concurrently, default None.
+                  If not specified, or 1, sub-MOs are audited in this process.
+
+    Rule statuses are memoised per (rule, value), up to rules.MEMO_MAX_ENTRIES of
+    them, and dependency join indexes per (MO, sub-id, mapping columns) for the
+    lifetime of the auditor.
+    '''
+    def __init__(
+            self,
+            identifiers: Optional[IdentifierDictionary] = None,
+            workers: Optional[int] = None
+    ):
+        self.identifiers = identifiers
+        self.workers = workers
+        self.evaluator = rules.ruleEvaluator()
+        self.dependency_index = dependencyIndex(identifiers)
 
     def audit(
             self, 
@@ -466,7 +469,7 @@ class Auditor:
         global_config    = GlobalConfig(global_config_path)
         dict_band = global_config.get_parameter('dict_band')
 
-        dict_concheck = {}
+        units = []
         for mo in reference.moList :
             
             mo_id = mo.lower()+'id'
@@ -476,121 +479,197 @@ class Auditor:
                 sub_ids = reference.moList[mo][mo_id]
 
             for sub_id in sub_ids:
-                
-                if sub_id != '':
-                    sub_mo = mo+'='+sub_id
-                else:
-                    sub_mo = mo
+                units.append((mo,sub_id))
 
+        if (self.workers is None) or (self.workers <= 1) or (len(units) <= 1):
+            dict_concheck = {}
+            for mo,sub_id in units:
+                sub_mo,df,rows = self.prepare_sub_mo(reference,dict_df,mo,sub_id,dict_band)
                 print(sub_mo)
+                dict_concheck[sub_mo] = self.audit_sub_mo(reference,dict_df,mo,sub_mo,df,rows)
 
-                df_settings_mo = reference.settings.loc[(reference.settings['MO']==sub_mo)]
-                
-                dict_concheck[sub_mo] = dict_df[mo].configuration
-                
-                if '=' in sub_mo:
-                    dict_concheck[sub_mo] = dict_concheck[sub_mo].loc[dict_concheck[sub_mo][mo_id]==sub_id]
+            return auditResult(dict_concheck,reference)
 
-                if len(dict_concheck[sub_mo])>0:
-                    for index, row in df_settings_mo.iterrows():
-                    
-                        param = row['Parameter']
-                        print('   %s'%param)
-                        dependency = row['Dependency']
-                        RAT = row['Tech']
-
-                        if '{' in dependency:
-                            dict_dependency = self.__to_dict_str(dependency)
-                            dict_dependency = {value.lower(): key for key, values in dict_dependency.items() for value in values}
-
-                        ########################## Map cell band ###########################
-                        #### ini harus ada solusinya kalau pindah operator ga bisa handle dengan logic ini
-
-                        # dict_band = {'T' : 'L900',
-                        #             'L' : 'L1800',
-                        #             'R' : 'L2100',
-                        #             'E' : 'L2300_20',
-                        #             'F' : 'L2300_20',
-                        #             'V' : 'L2300_10' }
-                        
-                        dict_concheck[sub_mo]['band'] = np.nan
-                        band_pattern = r'[A-Za-z]{3}\d{3}[A-Za-z](.)'
-                        dict_concheck[sub_mo]['band_label'] = np.nan
-                        if 'eutrancellfddid' in dict_concheck[sub_mo].columns:
-                            #dict_concheck[sub_mo].loc[pd.isna(dict_concheck[sub_mo]['band']), 'band'] = dict_concheck[sub_mo]['eutrancellfddid'].str[7].map(dict_band)
-                            empty_band_label =  dict_concheck[sub_mo].loc[pd.isna(dict_concheck[sub_mo]['band_label'])]
-                            empty_band_label['band_label'] = empty_band_label['eutrancellfddid'].str.extract(r'[A-Za-z]{3}\d{3}[A-Za-z](.)')
-                            #empty_band_label.loc[pd.isna(empty_band_label['band']), 'band'] = empty_band_label['band_label'].map(dict_band)
-                            dict_concheck[sub_mo].loc[pd.isna(dict_concheck[sub_mo]['band_label'])] = empty_band_label
-                        if 'eutrancelltddid' in dict_concheck[sub_mo].columns:
-                            #dict_concheck[sub_mo].loc[pd.isna(dict_concheck[sub_mo]['band']), 'band'] = dict_concheck[sub_mo]['eutrancelltddid'].str[7].map(dict_band)
-                            empty_band_label =  dict_concheck[sub_mo].loc[pd.isna(dict_concheck[sub_mo]['band_label'])]
-                            empty_band_label['band_label'] = empty_band_label['eutrancelltddid'].str.extract(r'[A-Za-z]{3}\d{3}[A-Za-z](.)')
-                            #empty_band_label.loc[pd.isna(empty_band_label['band']), 'band'] = empty_band_label['band_label'].map(dict_band)
-                            dict_concheck[sub_mo].loc[pd.isna(dict_concheck[sub_mo]['band_label'])] = empty_band_label
-                        if 'nrcellduid' in dict_concheck[sub_mo].columns:
-                            empty_band_label =  dict_concheck[sub_mo].loc[pd.isna(dict_concheck[sub_mo]['band_label'])]
-                            empty_band_label['band_label'] = empty_band_label['nrcellduid'].str.extract(r'[A-Za-z]{3}\d{3}[A-Za-z](.)')
-                            #empty_band_label.loc[pd.isna(empty_band_label['band']), 'band'] = empty_band_label['band_label'].map(dict_band)
-                            dict_concheck[sub_mo].loc[pd.isna(dict_concheck[sub_mo]['band_label'])] = empty_band_label
-                        
-                        dict_concheck[sub_mo]['band'] = dict_concheck[sub_mo]['band_label'].map(dict_band)
-                        #print(dict_concheck[sub_mo])
+        return self.__audit_parallel(reference,dict_df,units,dict_band)
+
+    def __audit_parallel(self,reference,dict_df,units,dict_band):
+        '''
+        Audit the (MO, sub-id) ``units`` on a pool of worker processes.
+
+        Each MO is published in shared memory as soon as it is loaded, whole
+        MO units having their band columns mapped first, and the units of an
+        MO are submitted once the MO and the MOs it depends on are published.
+        Workers attach the MOs they audit or depend on instead of receiving a
+        copy, and only the (MO, sub-id) of a unit, the handles of its MOs and
+        its audited dataframe are sent between processes. Results are
+        collected in the order of ``units``.
+        '''
+        unit_mos = {}
+        for mo,sub_id in units:
+            sub_mo = mo+'='+sub_id if sub_id != '' else mo
+            dependencies = reference.settings.loc[reference.settings['MO']==sub_mo,'Dependency']
+            needed = {mo} | {dep['mo'] for dependency in dependencies for dep in reference.parse_dependency(str(dependency))}
+            unit_mos[(mo,sub_id)] = [dep_mo for dep_mo in needed if dep_mo in dict_df]
+
+        if isinstance(dict_df,cmPrefetcher):
+            loaded_mos = dict_df.as_completed()
+        else:
+            loaded_mos = iter(dict_df)
+
+        # the cm may still be loading on other threads when the pool starts, a
+        # forked worker would inherit the locks they hold, e.g. the stdout lock
+        start_method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+
+        with sharedFrameStore() as store:
+            with ProcessPoolExecutor(max_workers=self.workers,
+                                     mp_context=multiprocessing.get_context(start_method),
+                                     initializer=_init_audit_worker,
+                                     initargs=(self,reference,dict_band)) as executor:
+                handles = {}
+                futures = {}
+                def submit_ready_units():
+                    for unit,mos in unit_mos.items():
+                        if (unit not in futures) and all(dep_mo in handles for dep_mo in mos):
+                            futures[unit] = executor.submit(_audit_unit,*unit,{dep_mo : handles[dep_mo] for dep_mo in mos})
+
+                submit_ready_units()
+                for mo in loaded_mos:
+                    if (mo,'') in unit_mos:
+                        # the band of a whole MO unit is mapped in place, so it is published with the MO
+                        self.prepare_sub_mo(reference,dict_df,mo,'',dict_band)
+                    handles[mo] = dict_df[mo].share(store)
+                    submit_ready_units()
+
+                dict_concheck = {}
+                for unit in units:
+                    sub_mo,result = futures[unit].result()
+                    print(sub_mo)
+                    result.source = dict_df[result.mo].configuration
+                    dict_concheck[sub_mo] = result
 
-                            #dict_concheck[sub_mo] = dict_concheck[sub_mo].drop()
-                        
-                        if ('eutrancellfddid' not in dict_concheck[sub_mo].columns) and ('eutrancelltddid' not in dict_concheck[sub_mo].columns) and ('nrcellduid' not in dict_concheck[sub_mo].columns) :
-                            # for site level mo, which band related to a site is irrelevant. Choose whichever.
-                            #print(RAT)
-                            if RAT == '4G':
-                                dict_concheck[sub_mo]['band'] = 'L900'
-                            elif RAT == '5G':
-                                dict_concheck[sub_mo]['band'] = 'N2300'
-                        #####################################################################
-                        
-                        result = pd.DataFrame()
-                        for band, group in dict_concheck[sub_mo].groupby('band'):
-
-                            if '{' in dependency:
-                                band_dependency = dict_dependency[band.lower()]
-                            else:
-                                band_dependency = dependency
-
-                            #print('%s, %s, %s'%(band,len(group),len(result)))
-                            target = row[band]
-                            group = self.__audit_param(group,dict_df,param,band_dependency,target)
-                            #print(f"Group : \n {group}")
-                            #print('    %s, %s, %s'%(band,len(group),len(result)))
-                            #print(f"Result : \n {result}")
-                            if len(result)>0:
-                                result = pd.concat([result,group],ignore_index=True)
-                            else:
-                                result = group
-                        dict_concheck[sub_mo] = result
-                        #print(len(dict_concheck[sub_mo]))
-        
         return auditResult(dict_concheck,reference)
 
+    def prepare_sub_mo(self,reference,dict_df,mo,sub_id,dict_band):
+        '''
+        Return (sub_mo, rows of ``mo`` having sub-id ``sub_id`` with the band columns mapped,
+        positions of these rows in the MO dataframe).
+
+        The band columns are written in place when the rows are the whole MO dataframe.
+        '''
+        mo_id = mo.lower()+'id'
+        if sub_id != '':
+            sub_mo = mo+'='+sub_id
+        else:
+            sub_mo = mo
+
+        df = dict_df[mo].configuration
+        rows = np.arange(len(df))
+        if '=' in sub_mo:
+            rows = np.flatnonzero((df[mo_id]==sub_id).to_numpy())
+            # own the rows, the band columns are not written to the MO dataframe
+            df = df.iloc[rows].copy()
+
+        if len(df)>0:
+            ########################## Map cell band ###########################
+            #### ini harus ada solusinya kalau pindah operator ga bisa handle dengan logic ini
+
+            # dict_band = {'T' : 'L900',
+            #             'L' : 'L1800',
+            #             'R' : 'L2100',
+            #             'E' : 'L2300_20',
+            #             'F' : 'L2300_20',
+            #             'V' : 'L2300_10' }
+
+            # band only depends on the cells, map it once per sub mo
+            df['band'] = np.nan
+            df['band_label'] = naming.first_band_label(df,CELL_COLUMNS)
+            df['band'] = df['band_label'].map(dict_band)
+            #####################################################################
+
+        return sub_mo,df,rows
+
+    def audit_sub_mo(self,reference,dict_df,mo,sub_mo,df,rows):
+        '''
+        Audit all parameters of ``sub_mo`` on its prepared rows ``df``, the rows ``rows``
+        of the ``mo`` dataframe, and return the compact auditFrame of the audited rows.
+        '''
+        df_settings_mo = reference.settings.loc[(reference.settings['MO']==sub_mo)]
+        source = dict_df[mo].configuration
+        if len(df)==0:
+            return auditFrame(mo,rows,{},source)
+
+        # index labels are positions in df, so the rows kept by each parameter can be traced back
+        df = df.set_axis(pd.RangeIndex(len(df)),axis=0,copy=False)
+
+        site_level = not any(col in df.columns for col in CELL_COLUMNS)
+        partition = None
+        site_band = None
+
+        for index, row in df_settings_mo.iterrows():
+        
+            param = row['Parameter']
+            print('   %s'%param)
+            dependency = row['Dependency']
+            RAT = row['Tech']
+
+            if site_level:
+                # for site level mo, which band related to a site is irrelevant. Choose whichever.
+                band = {'4G' : 'L900', '5G' : 'N2300'}.get(RAT,np.nan)
+                if (partition is None) or (band != site_band):
+                    site_band = band
+                    if len(df)>0:
+                        df['band'] = band
+                    partition = None
+
+            if partition is None:
+                partition = bandPartition(df) if len(df)>0 else None
+
+            result = pd.DataFrame()
+            lengths = []
+            kept = [np.array([],dtype=np.int64)]
+            for band, group in (partition.groups() if partition is not None else []):
+
+                band_dependency = reference.get_band_dependency(dependency,band)
+
+                #print('%s, %s, %s'%(band,len(group),len(result)))
+                rule = reference.get_rule(index,band)
+                group = self.__audit_param(group,dict_df,param,band_dependency,rule)
+                lengths.append(len(group))
+                kept.append(group.index.to_numpy())
+                #print(f"Group : \n {group}")
+                #print('    %s, %s, %s'%(band,len(group),len(result)))
+                #print(f"Result : \n {result}")
+                if len(result)>0:
+                    result = pd.concat([result,group],ignore_index=True)
+                else:
+                    result = group
+            rows = rows[np.concatenate(kept)]
+            result.index = pd.RangeIndex(len(result))
+            df = result
+            if len(result)>0:
+                partition.update(result,lengths)
+            else:
+                partition = None
+            #print(len(df))
+
+        return auditFrame.from_frame(mo,df,rows,list(df_settings_mo['Parameter']),source)
+
     
-    def __audit_param(self,df_config,dict_df,param,dependency,target):
-        ''' Comparing a parameter value in df_config against the corresponding reference value in config_ref '''
+    def __audit_param(self,df_config,dict_df,param,dependency,rule):
+        ''' Comparing a parameter value in df_config against the corresponding compiled reference rule '''
         
-        dict_rules = {}
-        #print(df_config.columns)
-        #print("   target : %s"%target)
-        #remove all whitespace from target
-        if type(target) == str :
-           target = re.sub(r'\s+','',target)
-           #print("   string target")
-        if (str(target)=='*'):
+        # rules of the reference values written in _ref, other values are checked as exact value
+        ref_rules = {rule.raw : rule}
+        if isinstance(rule,rules.Wildcard):
             #print("   wildcard target")
             df_config[param+'_ref'] = df_config[param]
-            df_config.loc[pd.notnull(df_config[param]), param+'_check'] = 'OK'
+            df_config[param+'_check'] = rule.check(df_config[param])
         else:
             ######### check if param dependent ##########
             if dependency != 'None':
                 #print("   dependent target")
                 dependency = dependency.split(';')
+                target_dependencies = []
                 for dep_param in dependency:
                     ################ Disect Dependency Column ###################
                     
@@ -609,8 +688,6 @@ class Auditor:
                         dep_mo = dep_mo.split('=')[0]
                         
                     df_dependent = dict_df[dep_mo].configuration
-                    if dep_mo_id != '':
-                        df_dependent = df_dependent.loc[df_dependent[dep_mo.lower()+'id'] == dep_mo_id]
 
                     mapping_columns = []
                     valid_map_columns = ['mecontext','eutrancellfddid','eutrancelltddid','nrcellduid']
@@ -618,15 +695,12 @@ class Auditor:
                         if (col in valid_map_columns) and (col in df_dependent):
                             mapping_columns.append(col)
                     
-                    #print(df_config.columns)
-                    #print(df_dependent.set_index(mapping_columns))
-                    dict_dependency_param = df_dependent.set_index(mapping_columns).to_dict()[dep_param]
-                    
-                    dep_param = dep_mo + '.' + dep_param
-                    if dep_param.split('.')[1] not in df_config:
-                        df_config[dep_param] = df_config.set_index(mapping_columns).index.map(dict_dependency_param)
+                    dep_column = dep_mo + '.' + dep_param
+                    if dep_param not in df_config:
+                        df_config[dep_column] = self.map_dependency(df_config,df_dependent,dep_mo,dep_mo_id,mapping_columns,dep_param)
                     else:
-                        df_config[dep_param] = df_config[dep_param.split('.')[1]]
+                        df_config[dep_column] = df_config[dep_param]
+                    dep_param = dep_column
 
                     #print(dict_dependency_param)
                     #print(df_config)
@@ -648,146 +722,58 @@ class Auditor:
                          
                     else:
                         ## Dependency affect target ##
-
-                        if target == '=':
-                            df_config[param+'_ref'] = df_config[dep_param]
-                        ## add other operator clause here
-                        else:
-                            ##### Map target reference from dependency #####
-                            
-                            dict_rules = self.create_rules(target)
-                            #print("   Dict rules: %s"%dict_rules)
-                            df_config.loc[pd.isnull(df_config[dep_param]), dep_param] = np.nan
-                            df_config[dep_param+'_eq'] = df_config[dep_param]
-                            try:
-                                df_config[dep_param+'_eq'] = df_config[dep_param+'_eq'].astype(float)
-                            except:
-                                pass
-                            for key in dict_rules.keys():
-                                if (type(key)==str):
-                                    if (('>' in key) or ('<' in key) or ('!=' in key)):
-                                        df_config[dep_param+'_eq'] = self.convert_cond_value(df_config[[dep_param+'_eq']],key)
-                                        
-                            #print(df_config)
-        
-                            df_config[param+'_ref'] = df_config[dep_param+'_eq'].map(dict_rules)
-                            df_config.loc[df_config[param+'_ref'] == '*', param+'_ref'] = df_config[param]
-                
-                #exact_target = True
-                # if (not(is_numeric_dtype(df_config[param+'_ref']))) and (param != 'advcellsupaction'):
-                #     df_config[param] = df_config[param].astype(str).str.replace(' ','').str.replace('.0','')
-                if param+'_ref' in df_config.columns:
-                    df_config.reset_index().loc[df_config.reset_index()[param+'_ref'].apply(lambda x: isinstance(x, str)), param] = df_config.reset_index()[param].astype(str).str.replace(' ','').str.replace('.0','')
+                        target_dependencies.append(dep_param)
+
+                if isinstance(rule,rules.Equal):
+                    df_config[param+'_ref'] = df_config[target_dependencies[0]]
+                    ref_rules = {}
+                ## add other operator clause here
+                elif isinstance(rule,rules.Conditional):
+                    ##### Map target reference from dependency #####
+                    for dep_param in target_dependencies:
+                        df_config.loc[pd.isnull(df_config[dep_param]), dep_param] = np.nan
+                        df_config[dep_param+'_eq'] = df_config[dep_param]
+                        try:
+                            df_config[dep_param+'_eq'] = df_config[dep_param+'_eq'].astype(float)
+                        except:
+                            pass
+                    df_config[param+'_ref'] = rule.map([df_config[dep_param+'_eq'] for dep_param in target_dependencies])
+                    df_config.loc[df_config[param+'_ref'] == '*', param+'_ref'] = df_config[param]
+                    ref_rules = rule.rules
             
             if not (param+'_ref' in df_config.columns):
-                df_config[param+'_ref'] = target
+                df_config[param+'_ref'] = rule.raw
             
-            ######### Split Ref and Basic Types Checking Target ##########
-            df_config_check = pd.DataFrame()
-            for target, df_config in df_config.groupby(param+'_ref'):
-                exact_target = True
-                
-                if param+'_eq' not in df_config.columns:
-                    df_config[param+'_eq'] = df_config[param]
-                
-                if (type(target)==str):
-                    if (('>' in target) or ('<' in target) or ('!' in target) or ('=' in target)):
-                        exact_target = False
-                    if ('[' in target):
-                        list_target = [x for x in target.strip('[]').split(',')]
-                        df_config[param+'_eq'] = df_config[param+'_eq'].astype(str).str.replace(' ','').str.replace('\.0','')
-                        df_config[param+'_ref'] = target
-                        df_config.loc[df_config[param+'_eq'].isin(list_target), param+'_check'] = 'OK'
-                        df_config.loc[(pd.notnull(df_config[param+'_eq'])) & (pd.isnull(df_config[param+'_check'])), param+'_check'] = 'NOK'
-                        
-                    if ('(' in target):
-                        target = target.strip("()")
-                        lower_bound = target.split(',')[0]
-                        upper_bound = target.split(',')[1]
-                        
-                        if lower_bound.replace("-","").isnumeric() and upper_bound.replace("-","").isnumeric():
-                           df_config[param+'_ref'] = f"{lower_bound} to {upper_bound}"
-                           lower_bound = int(lower_bound)
-                           upper_bound = int(upper_bound)+1
-                           
-                           if lower_bound>upper_bound:
-                              raise(ValueError(f"Error checking parameter {param} with target range {target}. Lower bound larger than upper bound"))
-                           
-                           list_target = list(range(lower_bound,upper_bound))
-                           #print(list_target)
-                           df_config.loc[df_config[param+'_eq'].isin(list_target), param+'_check'] = 'OK'
-                           #print(df_config)
-                           df_config.loc[(pd.notnull(df_config[param+'_eq'])) & (pd.isnull(df_config[param+'_check'])), param+'_check'] = 'NOK'
-                        else:
-                           raise(ValueError(f"Error checking parameter {param} with target range {target}. Invalid reference target. Range checking only take integer values."))
-        
-                if (exact_target):
-                    try:
-                       df_config.loc[pd.isnull(df_config[param+'_eq']), param+'_check'] = 'NA'
-                       df_config.loc[(pd.isnull(df_config[param+'_check'])) & (df_config[param+'_eq'] != df_config[param+'_ref']), param+'_check'] = 'NOK' 
-                       df_config.loc[(pd.isnull(df_config[param+'_check'])) & (df_config[param+'_eq'] == df_config[param+'_ref']), param+'_check'] = 'OK'
-                    except:
-                       print('df_config length : %s'%len(df_config))
-                else:
-                    #print("not exact target")
-                    #print(param)
-                    df_config[param+'_eq'] = self.convert_cond_value(df_config[[param+'_eq']],target)
-                    df_config.loc[df_config[param+'_eq'] == df_config[param+'_ref'], param+'_check'] = 'OK'
-                    df_config.loc[df_config[param+'_eq'] != df_config[param+'_ref'], param+'_check'] = 'NOK'
-                    
-                if len(df_config_check)>0:
-                    df_config_check = pd.concat([df_config_check,df_config])
-                else:
-                    df_config_check = df_config
-            df_config = df_config_check
+            ######### Check every row against its own Ref ##########
+            # rows ordered by ref and without ref, as grouped by ref
+            codes,targets = pd.factorize(df_config[param+'_ref'],sort=True)
+            order = np.argsort(codes,kind='stable')
+            order = order[codes[order] != -1]
+            df_config = df_config.take(order)
+
+            target_rules = []
+            for target in targets:
+                target_rule = ref_rules.get(target)
+                if (target_rule is None) or isinstance(target_rule,rules.Wildcard):
+                    target_rule = rules.Exact(target)
+                target_rules.append(target_rule)
+
+            if param+'_eq' not in df_config.columns:
+                df_config[param+'_eq'] = df_config[param]
+
+            labels,checks = self.evaluator.check_rows(df_config[param+'_eq'],codes[order],target_rules)
+            df_config[param+'_ref'] = pd.Series(labels,index=df_config.index).infer_objects()
+            df_config[param+'_check'] = checks
         #print(df_config)
         return df_config
     
-    def create_rules(self,target):
-        dict_rules = {}
-        for rule in target.strip('{}').replace(' ','').split(';'):
-            rule = rule.replace(' ','')
-            if (rule != '='):
-                rule_key = rule.split(':')[0]
-                rule_value = rule.split(':')[1]
-                if rule_key.replace('-','').isnumeric():
-                    rule_key = float(rule_key)
-                if rule_value.replace('-','').isnumeric():
-                    rule_value = float(rule_value)
-                dict_rules[rule_key] = rule_value
-        return dict_rules
-    
-    def convert_cond_value(self,df, target):
-        #print(target)
-        #print(df)
-        operator = re.search("([<>=!:\*]+)", target).group(1)
-        operand = re.search("([A-Za-z]+|-?\d+)", target).group()
-    
-        param = df.columns[0]
-    
-        if is_numeric_dtype(df[param]):
-            df[param] = df[param].astype(float)
-        if operand.replace('-','').isnumeric():
-            operand = float(operand)
-        
-        #print(f"{operand} and {operator}")
-    
-        if operator == '>':
-            df.loc[df[param].apply(lambda x: not isinstance(x, str) and x > operand), param] = operator+str(operand).split('.')[0]
-        elif operator == '<':
-            #print(f"df config before : {df}")
-            df.loc[df[param].apply(lambda x: not isinstance(x, str) and x < operand), param] = operator+str(operand).split('.')[0]
-            #print(f" operator : {operator}")
-            #print(f"df config : {df}")
-        elif operator == '!=':
-            df.loc[df[param]!=operand, param] = operator+str(operand).split('.')[0]
-        elif operator == '>=':
-            df.loc[df[param].apply(lambda x: not isinstance(x, str) and x >= operand), param] = operator+str(operand).split('.')[0]
-        elif operator == '<=':
-            df.loc[df[param].apply(lambda x: not isinstance(x, str) and x <= operand), param] = operator+str(operand).split('.')[0]
-    
-        return df[param]
-    
+    def map_dependency(self,df_config,df_dependent,dep_mo,dep_mo_id,mapping_columns,dep_param):
+        '''
+        Return the ``dep_param`` value of df_dependent (rows of sub-id ``dep_mo_id`` if specified)
+        for each row of df_config, matching rows on ``mapping_columns`` through the cached join index.
+        '''
+        return self.dependency_index.lookup(df_config,df_dependent,dep_mo,dep_mo_id,mapping_columns,dep_param)
+
     def map_param(self,dep_param,df_config,dict_df):
         dep_mo = dep_param.split('.')[0] 
         dep_param = dep_param.split('.')[1]
@@ -805,26 +791,5 @@ class Auditor:
         
         return df_config
     
-    # Function to add double quotes around text before colon and items in lists
-    def __to_dict_str(self, text):
-        def add_quotes(x):
-            key = x.group(1)
-            items = x.group(2).split(',')
-            quoted_items = ['"' + item.strip() + '"' for item in items]
-            return f'"{key.strip()}":[' + ','.join(quoted_items) + ']'
-    
-        # Use regex to add double quotes around text before colon and items in lists
-        valid_dict_string = re.sub(r'([^:,]+):\[([^\[\]]*)\]', lambda x: add_quotes(x), text)
-
-        valid_dict_string = valid_dict_string.replace("{","").replace("}","")
-        valid_dict_string = "{" + valid_dict_string + "}"
-
-        # Now, using ast.literal_eval to convert the string to a dictionary
-        try:
-            dict_dependency = ast.literal_eval(valid_dict_string)
-            return dict_dependency
-        except (SyntaxError, ValueError):
-            print("Error: The input string is not a valid dictionary.")
-            return None
 
     
\ No newline at end of file
@@ -5,6 +5,7 @@ import os
 
 from ratatosk.global_config import GlobalConfig
 from .exceptions import InvalidHeaderError 
+from . import naming
 
 class CellList:
     def __init__(self,
@@ -63,7 +64,7 @@ class CellList:
             else:
                 df_all_cell = df_all_cell_5g
         
-        df_all_cell['ne'] = df_all_cell['cell'].str.extract(r"([A-Za-z]{3}\d{3}[A-Za-z]{2})")
+        df_all_cell['ne'] = naming.ne(df_all_cell['cell'])
         
         if filter_column == 'enm':
            df_all_cell = df_all_cell.loc[df_all_cell[filter_column].isin(filter_by)]
@@ -149,7 +150,7 @@ class CellList:
                pass
         
         #print('number final: %s' %len(df_result))
-        df_result['siteid'] = df_result['cell'].str.extract(r'([A-Za-z]{3}\d{3})')
+        df_result['siteid'] = naming.siteid(df_result['cell'])
     
         df_result.dropna()
         df_result  = df_result.drop_duplicates(subset=['cell'])
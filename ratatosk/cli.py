@@ -19,10 +19,12 @@ def main():
 @click.option('--cm-folder', default='',type=str, help='Folder to look for CM files')
 @click.option('--cm-subfolder', default='',type=str, help='Sub-folders to look for CM files in cm-folder')
 @click.option('--verbose', default=False,type=bool, help='Choose generate simple summary or verbose report')
-@click.option('--output', default='',type=str, help='Output folder path')
-@click.option('--preprocess', default=True,type=bool, help='Run preprocess or not')
-@click.option('--file-ext', default='csv',type=str, help='File Extension')
+@click.option('--output', default='',type=str, help='Output file path. The simple summary is written as xlsx, csv or parquet depending on the extension')
+@click.option('--preprocess', default=False,type=bool, help='Write the preprocessed columns into the cm files or not')
+@click.option('--file-ext', default='csv',type=str, help='File Extension: csv, zip, gz or zst')
 @click.option('--rat', default='',type=str, help='Radio access technology to be audit')
+@click.option('--cache', default=True,type=bool, help='Use the columnar CM cache or not')
+@click.option('--explain', default=False,type=bool, help='Only print the CM files, columns and estimated rows to be loaded')
 @click.option('--arg-file', default='',type=str, help='Path for command argument file')
 
 def audit_cm(
@@ -38,6 +40,8 @@ def audit_cm(
     verbose,
     preprocess,
     rat,
+    cache,
+    explain,
     arg_file,
 ):
     """
@@ -62,6 +66,8 @@ def audit_cm(
        preprocess = args.get('preprocess',object_list)
        rat = args.get('rat',object_list)
        file_ext = args.get('file_ext',object_list)
+       cache = args.get('cache',cache)
+       explain = args.get('explain',explain)
     
     
     if (object_list == '') :
@@ -83,7 +89,9 @@ def audit_cm(
        output,
        verbose,
        preprocess,
-       rat
+       rat,
+       cache,
+       explain
     )
     
 @main.command()
@@ -117,7 +125,8 @@ def cmedit_query(
 @click.option('--cm-folder', default='',type=str, help='Folder to look for CM files')
 @click.option('--cm-subfolders', default='',type=str, help='Sub-folders to look for CM files in cm-folder')
 @click.option('--output', default='',type=str, help='Output file path')
-@click.option('--file-ext', default='csv',type=str, help='File Extension')
+@click.option('--file-ext', default='csv',type=str, help='File Extension: csv, zip, gz or zst')
+@click.option('--cache', default=True,type=bool, help='Use the columnar CM cache or not')
 
 def get_cm(
     mo,
@@ -129,6 +138,7 @@ def get_cm(
     cm_subfolders='',
     file_ext='csv',
     output='',
+    cache=True,
 ):
     """
     Get CM file for certain MO of a certain date configuration.
@@ -154,7 +164,8 @@ def get_cm(
         cm_subfolders,
         file_ext,
         output,
-        format
+        format,
+        cache
     )
 
 if __name__ == '__main__':
@@ -1,7 +1,35 @@
+import os
 import pandas as pd
 import re
 from collections import OrderedDict
-from typing import Optional, Dict
+from collections.abc import Mapping
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Optional, Dict, Callable
+
+from .cm_cache import cmCache
+from .shared_frames import sharedFrame, sharedFrameStore
+from . import naming
+from . import virtual_columns
+
+# compression of csv cm files by extension, read and written by pandas
+CSV_COMPRESSIONS = {
+    '.csv' : None,
+    '.zip' : 'zip',
+    '.gz'  : 'gzip',
+    '.zst' : 'zstd'
+}
+
+def is_csv_file(cm_file: str) -> bool :
+    '''
+    Return ``True`` if ``cm_file`` is a csv file, compressed or not.
+    '''
+    return os.path.splitext(cm_file)[1] in CSV_COMPRESSIONS
+
+def csv_compression(cm_file: str) -> Optional[str] :
+    '''
+    Return the pandas compression of the csv ``cm_file``, None if it is not compressed.
+    '''
+    return CSV_COMPRESSIONS.get(os.path.splitext(cm_file)[1])
 
 class Cm:
     def __init__(self,mo,s_date,df):
@@ -9,6 +37,12 @@ class Cm:
         self.date = s_date
         self.configuration = df
 
+    def share(self,store: sharedFrameStore) -> 'sharedCm' :
+        '''
+        Publish the configuration in ``store`` and return a handle to send to worker processes.
+        '''
+        return sharedCm(self.mo,self.date,store.publish(self.configuration))
+
     def to_mo_format(self):
         cm = self.configuration.copy()
         df_formatted = pd.DataFrame(columns=['mecontext','MO Class','MO','Parameter','Value'])
@@ -70,12 +104,9 @@ class Cm:
         if (fdd_id not in df_config.columns) and (tdd_id not in df_config.columns):
             raise TypeError("This cm is not eutrancellrelation type thus cannot be proceed.")
         if (fdd_id in df_config.columns):
-            df_config['SiteType'] = df_config['eutrancellfddid'].str[6]
+            df_config['SiteType'] = naming.site_type(df_config['eutrancellfddid'])
         if (tdd_id in df_config.columns):
-            df_config['SiteType'] = df_config['eutrancelltddid'].str[6]
-
-        df_config.loc[df_config['SiteType']!='I','SiteType'] = 'M'
-        df_config.loc[df_config['SiteType']!='I','SiteType'] = 'M'
+            df_config['SiteType'] = naming.site_type(df_config['eutrancelltddid'])
 
         return df_config
 
@@ -135,9 +166,9 @@ class Cm:
         
         df_config = self.configuration
 
-        df_config['target_siteid'] = df_config[mo_id].str.extract(r'([A-Za-z]{3}\d{3})')
+        df_config['target_siteid'] = naming.siteid(df_config[mo_id])
 
-        df_config['source_siteid'] = df_config['mecontext'].str.extract(r'([A-Za-z]{3}\d{3})')
+        df_config['source_siteid'] = naming.siteid(df_config['mecontext'])
 
         if criteria == 'cosite':
             df_config['cosite'] = 0
@@ -153,11 +184,29 @@ class Cm:
         
 class cmCollector:
     '''
-    Collector for cm of any MO. no attribute should be
-    defined to initialized this object
+    Collector for cm of any MO.
+
+    Parameters
+    ----------
+    cache_folder : folder of the columnar cm cache, default None.
+                   If not specified cm files are always parsed from the source.
+
+    chunksize : number of rows per chunk when reading a cm file with filters, default None.
+                If specified filtered reads are streamed chunk by chunk and only
+                matching rows are kept in memory.
+
+    max_workers : number of sub_folders read concurrently by ``collect_cm``, default None.
+                  If not specified all sub_folders are read at once.
     '''
-    def __init__(self):
-        pass
+    def __init__(
+            self,
+            cache_folder: Optional[str] = None,
+            chunksize: Optional[int] = None,
+            max_workers: Optional[int] = None
+    ):
+        self.cache = cmCache(cache_folder)
+        self.chunksize = chunksize
+        self.max_workers = max_workers
 
     def collect_cm(
             self,
@@ -204,18 +253,27 @@ class cmCollector:
         print(f'Loading CM File : {mo}')
 
         if len(sub_folders)>0:
-            df_config = pd.DataFrame()
-            for sub_folder in sub_folders:
+            def read_sub_folder(sub_folder):
                 cm_file = f'%s/%s/%s/%s.{file_ext}'%(cm_folder,sub_folder,s_date,mo)
                 df = self.read_cm_file(cm_file=cm_file,
                                        parameters=parameters,
                                        filters=filters
                                        )
                 df['folder'] = sub_folder
-                if len(df_config )>0:
-                    df_config = pd.concat([df_config,df],ignore_index=True)
-                else:
-                    df_config = df
+                return df
+
+            # sub folders usually sit on different disks/mounts, read them concurrently
+            max_workers = self.max_workers or len(sub_folders)
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                dfs = list(executor.map(read_sub_folder,sub_folders))
+
+            non_empty_dfs = [df for df in dfs if len(df)>0]
+            if len(non_empty_dfs)>1:
+                df_config = pd.concat(non_empty_dfs,ignore_index=True)
+            elif len(non_empty_dfs)==1:
+                df_config = non_empty_dfs[0]
+            else:
+                df_config = dfs[-1]
         else:
             cm_file = f'%s/%s/%s.{file_ext}'%(cm_folder,s_date,mo)
             df_config = self.read_cm_file(cm_file=cm_file,
@@ -259,16 +317,23 @@ class cmCollector:
             a pandas dataframe from the cm file
         """
         #print(filters)
+        mo = os.path.basename(cm_file).split('.')[0]
+        virtual = virtual_columns.requested_columns(mo,parameters)
+        read_parameters = self.get_read_parameters(cm_file,parameters)
+
         try:
-            if (cm_file.endswith('.csv') or cm_file.endswith('.zip')):
-                df_config = pd.read_csv(cm_file,index_col=None)
-            elif cm_file.endswith('.xlsx'):
-                df_config = pd.read_excel(cm_file,index_col=None)
+            if (len(filters)>0) and (self.chunksize is not None):
+                df_config = self.stream_cm_file(cm_file,read_parameters,filters,virtual)
+            else:
+                df_config = self.load_cm_file(cm_file,read_parameters,filters)
+
+                if len(df_config)==0:
+                    raise FileNotFoundError(f"No valid file found. Please check the folder path and/or the sub_folders.")
 
-            if len(df_config)==0:
-                raise FileNotFoundError(f"No valid file found. Please check the folder path and/or the sub_folders.")
+                df_config = virtual_columns.add_virtual_columns(df_config,virtual,self.sibling_reader(cm_file))
+                df_config = self.filter_rows(df_config,filters)
 
-            df_config['siteid'] = df_config['mecontext'].str.extract(r"([A-Za-z]{3}\d{3})")
+            df_config = virtual_columns.unique_rows(mo,df_config)
 
             columns = ['mecontext','siteid']
 
@@ -278,37 +343,10 @@ class cmCollector:
                 columns.append('eutrancelltddid')
             if 'nrcellduid' in df_config.columns:
                 columns.append('nrcellduid')
-                
-            #print(f"df size : {len(df_config)}")
-            ### Filtering ###
-            if len(filters)>0:
-                #print(filters)
-                if ('eutrancellfddid' in columns) or ('eutrancelltddid' in columns) or ('nrcellduid' in columns):
-                    split_dfs = []
-                    if 'eutrancellfddid' in columns:
-                        df_config_fdd = df_config[df_config['eutrancellfddid'].notna()]
-                        df_config_fdd = self.filter_cm(df_config_fdd.drop(columns=['eutrancelltddid','nrcellduid'],errors='ignore'),filters)
-                        split_dfs.append(df_config_fdd)
-                    if 'eutrancelltddid' in columns:
-                        df_config_tdd = df_config[df_config['eutrancelltddid'].notna()]
-                        df_config_tdd = self.filter_cm(df_config_tdd.drop(columns=['eutrancellfddid','nrcellduid'],errors='ignore'),filters)
-                        split_dfs.append(df_config_tdd)
-                    if 'nrcellduid' in columns:
-                        df_nr = df_config[df_config['nrcellduid'].notna()]
-                        df_nr = self.filter_cm(df_nr.drop(columns=['eutrancellfddid','eutrancelltddid'],errors='ignore'),filters)
-                        split_dfs.append(df_nr)
-                    
-                    if len(split_dfs)>1:
-                        df_config = pd.concat(split_dfs, ignore_index=True)
-                    elif len(split_dfs)==1:
-                        df_config = split_dfs[0]
-
-                else:
-                    df_config = self.filter_cm(df_config,filters)
-            
-                for filter in filters:
-                    if (filter in df_config.columns) and (filter not in columns):
-                        columns.append(filter)
+
+            for filter in filters:
+                if (filter in df_config.columns) and (filter not in columns):
+                    columns.append(filter)
 
             ## Return all ID columns and parameters column ###
             for col in df_config.columns:
@@ -333,6 +371,199 @@ class cmCollector:
             df_config = pd.DataFrame()
 
         return df_config
+
+    def filter_rows(
+            self,
+            df_config: pd.DataFrame,
+            filters: Optional[Dict[str,list]] = {}
+    ) -> pd.DataFrame :
+        '''
+        Add siteid to a raw cm dataframe and keep only the rows matching ``filters``.
+        Rows of each cell type (FDD, TDD, NR) are filtered on their own cell column.
+        '''
+        df_config['siteid'] = naming.siteid(df_config['mecontext'])
+
+        #print(f"df size : {len(df_config)}")
+        ### Filtering ###
+        if len(filters)>0:
+            #print(filters)
+            cell_columns = [col for col in ['eutrancellfddid','eutrancelltddid','nrcellduid'] if col in df_config.columns]
+            if len(cell_columns)>0:
+                split_dfs = []
+                if 'eutrancellfddid' in cell_columns:
+                    df_config_fdd = df_config[df_config['eutrancellfddid'].notna()]
+                    df_config_fdd = self.filter_cm(df_config_fdd.drop(columns=['eutrancelltddid','nrcellduid'],errors='ignore'),filters)
+                    split_dfs.append(df_config_fdd)
+                if 'eutrancelltddid' in cell_columns:
+                    df_config_tdd = df_config[df_config['eutrancelltddid'].notna()]
+                    df_config_tdd = self.filter_cm(df_config_tdd.drop(columns=['eutrancellfddid','nrcellduid'],errors='ignore'),filters)
+                    split_dfs.append(df_config_tdd)
+                if 'nrcellduid' in cell_columns:
+                    df_nr = df_config[df_config['nrcellduid'].notna()]
+                    df_nr = self.filter_cm(df_nr.drop(columns=['eutrancellfddid','eutrancelltddid'],errors='ignore'),filters)
+                    split_dfs.append(df_nr)
+
+                if len(split_dfs)>1:
+                    df_config = pd.concat(split_dfs, ignore_index=True)
+                elif len(split_dfs)==1:
+                    df_config = split_dfs[0]
+
+            else:
+                df_config = self.filter_cm(df_config,filters)
+
+        return df_config
+
+    def stream_cm_file(
+            self,
+            cm_file: str,
+            parameters: Optional[list] = [],
+            filters: Optional[Dict[str,list]] = {},
+            virtual: Optional[list] = []
+    ) -> pd.DataFrame :
+        '''
+        Read a cm file in chunks of ``chunksize`` rows and keep only the rows
+        matching ``filters`` from each chunk, so peak memory follows the size
+        of the filtered result instead of the size of the file.
+        The ``virtual`` columns are derived on each chunk before it is filtered.
+        On a cache miss the chunks are written to the columnar cache as they
+        are read, the whole file is never materialised.
+        '''
+        chunks = None
+        if self.cache.has(cm_file):
+            columns = self.get_needed_columns(self.cache.columns(cm_file),parameters,filters)
+            chunks = self.cache.iter_read(cm_file,columns=columns,batch_size=self.chunksize)
+        elif self.cache.enabled and is_csv_file(cm_file):
+            mo = os.path.basename(cm_file).split('.')[0]
+            source_chunks = (virtual_columns.add_virtual_columns(chunk,virtual_columns.file_columns(mo))
+                             for chunk in pd.read_csv(cm_file,index_col=None,chunksize=self.chunksize))
+            cached_chunks = self.cache.put_chunks(cm_file,source_chunks)
+            if cached_chunks is not None:
+                chunks = (self.project(chunk,parameters,filters) for chunk in cached_chunks)
+
+        if (chunks is None) and is_csv_file(cm_file):
+            # not cached, read only the needed columns
+            usecols = self.get_needed_columns(self.sniff_header(cm_file),parameters,filters)
+            chunks = pd.read_csv(cm_file,index_col=None,usecols=usecols,chunksize=self.chunksize)
+        elif chunks is None:
+            chunks = [self.load_cm_file(cm_file,parameters,filters)]
+
+        n_rows = 0
+        filtered_chunks = []
+        siblings = self.sibling_reader(cm_file)
+        for chunk in chunks:
+            n_rows += len(chunk)
+            if len(chunk)>0:
+                chunk = virtual_columns.add_virtual_columns(chunk,virtual,siblings)
+                filtered_chunks.append(self.filter_rows(chunk,filters))
+
+        if n_rows==0:
+            raise FileNotFoundError(f"No valid file found. Please check the folder path and/or the sub_folders.")
+
+        return pd.concat(filtered_chunks,ignore_index=True)
+
+    def load_cm_file(
+            self,
+            cm_file: str,
+            parameters: Optional[list] = [],
+            filters: Optional[Dict[str,list]] = {}
+    ) -> pd.DataFrame :
+        '''
+        Return the raw content of a cm file.
+
+        Only the columns needed for ``parameters`` and ``filters`` are read.
+        The header is sniffed first so the parser never materialises the
+        other columns. csv files, zipped, gzipped or zstd compressed or not,
+        are served from the columnar cache when available. On a cache miss
+        the whole file is parsed once and stored in the cache along with the
+        virtual columns derived from the file alone, so later reads find them.
+        '''
+        if is_csv_file(cm_file):
+            if self.cache.has(cm_file):
+                columns = self.get_needed_columns(self.cache.columns(cm_file),parameters,filters)
+                return self.cache.read(cm_file,columns=columns)
+
+            if self.cache.enabled:
+                df_config = pd.read_csv(cm_file,index_col=None,low_memory=False)
+                mo = os.path.basename(cm_file).split('.')[0]
+                df_config = virtual_columns.add_virtual_columns(df_config,virtual_columns.file_columns(mo))
+                self.cache.put(cm_file,df_config)
+                return self.project(df_config,parameters,filters)
+
+            usecols = self.get_needed_columns(self.sniff_header(cm_file),parameters,filters)
+            return pd.read_csv(cm_file,index_col=None,usecols=usecols)
+        elif cm_file.endswith('.xlsx'):
+            usecols = self.get_needed_columns(self.sniff_header(cm_file),parameters,filters)
+            return pd.read_excel(cm_file,index_col=None,usecols=usecols)
+
+    def project(
+            self,
+            df_config: pd.DataFrame,
+            parameters: Optional[list] = [],
+            filters: Optional[Dict[str,list]] = {}
+    ) -> pd.DataFrame :
+        '''
+        Return the columns of the raw cm dataframe ``df_config`` needed for ``parameters`` and ``filters``.
+        '''
+        columns = self.get_needed_columns(list(df_config.columns),parameters,filters)
+        return df_config if columns is None else df_config[columns].copy()
+
+    def get_read_parameters(self,cm_file: str,parameters: Optional[list] = []) -> list :
+        '''
+        Return ``parameters`` with the source columns of the virtual columns they request from ``cm_file``.
+        '''
+        if len(parameters) == 0:
+            return parameters
+        mo = os.path.basename(cm_file).split('.')[0]
+        virtual = virtual_columns.requested_columns(mo,parameters)
+        return list(OrderedDict.fromkeys(parameters+virtual_columns.source_parameters(virtual)))
+
+    def sibling_reader(self,cm_file: str) -> Callable :
+        '''
+        Return a function of (MO, columns) reading those columns of the cm file of
+        another MO in the folder of ``cm_file``, each file is read once.
+        '''
+        frames = {}
+        def read_sibling(mo,columns):
+            if mo not in frames:
+                name = os.path.basename(cm_file)
+                sibling_file = os.path.join(os.path.dirname(cm_file),mo+name[name.index('.'):])
+                frames[mo] = self.load_cm_file(sibling_file,[col.lower() for col in columns])
+            return frames[mo]
+
+        return read_sibling
+
+    def sniff_header(self,cm_file: str) -> list:
+        '''
+        Return the header of a cm file without reading its rows.
+        '''
+        if self.cache.has(cm_file):
+            return self.cache.columns(cm_file)
+        if cm_file.endswith('.xlsx'):
+            return list(pd.read_excel(cm_file,index_col=None,nrows=0).columns)
+
+        return list(pd.read_csv(cm_file,index_col=None,nrows=0).columns)
+
+    def get_needed_columns(
+            self,
+            header: list,
+            parameters: Optional[list] = [],
+            filters: Optional[Dict[str,list]] = {}
+    ) -> Optional[list] :
+        '''
+        Return the columns of ``header`` that ``read_cm_file`` keeps for the given
+        ``parameters`` and ``filters``, or None if all columns are needed.
+        '''
+        if len(parameters) == 0:
+            return None
+
+        columns = []
+        for col in header:
+            if (col == 'mecontext') or (col in filters) or (col.lower() in parameters):
+                columns.append(col)
+            elif col.endswith('id') and (col != 'unknown_id'):
+                columns.append(col)
+
+        return columns
     
     def filter_cm(self,df,filters={}):
         #print(f"filters : {filters}")
@@ -341,4 +572,126 @@ class cmCollector:
                 if (filter != 'eutrancellfddid') and (filter != 'eutrancelltddid') and (filter != 'nrcellduid'):
                     df[filter] = df[filter].astype(str).str.replace('\.0','')
                 df = df.loc[df[filter].isin(filters[filter])]
-        return df
\ No newline at end of file
+        return df
+
+class cmPrefetcher(Mapping):
+    '''
+    Read-only mapping of MO name to Cm whose values are loaded on a worker pool.
+
+    MOs are submitted with ``submit`` and start loading right away. Looking up
+    an MO waits until that MO is loaded, so a consumer can start working on the
+    first MOs while the others are still being read. Errors raised while
+    loading an MO are raised again on lookup.
+
+    Used as a context manager the pool is shut down on exit, MOs not started
+    yet are cancelled if the block raised.
+
+    Parameters
+    ----------
+    max_workers : number of MOs loaded concurrently, default None.
+                  If not specified the ThreadPoolExecutor default is used.
+    '''
+    def __init__(
+            self,
+            max_workers: Optional[int] = None
+    ):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+        self.futures = OrderedDict()
+
+    def submit(self,mo: str,loader: Callable,*args,**kwargs) -> None:
+        '''
+        Start loading ``mo`` by calling ``loader(*args,**kwargs)`` which must return a Cm.
+        '''
+        self.futures[mo] = self.executor.submit(loader,*args,**kwargs)
+
+    def as_completed(self):
+        '''
+        Yield the MOs in the order they finish loading.
+        '''
+        mos = {future : mo for mo,future in self.futures.items()}
+        for future in as_completed(mos):
+            yield mos[future]
+
+    def shutdown(self,cancel_futures: bool = False) -> None:
+        '''
+        Wait for the MOs being loaded, MOs not started yet are not loaded if ``cancel_futures``.
+        '''
+        self.executor.shutdown(wait=True,cancel_futures=cancel_futures)
+
+    def __enter__(self) -> 'cmPrefetcher' :
+        return self
+
+    def __exit__(self,exc_type,exc_value,traceback) -> None:
+        self.shutdown(cancel_futures=exc_type is not None)
+
+    def __getitem__(self,mo: str) -> Cm :
+        if mo not in self.futures:
+            raise KeyError(mo)
+        return self.futures[mo].result()
+
+    def __contains__(self,mo) -> bool:
+        return mo in self.futures
+
+    def __iter__(self):
+        return iter(self.futures)
+
+    def __len__(self) -> int:
+        return len(self.futures)
+
+class sharedCm:
+    '''
+    Picklable handle of a Cm whose configuration is published in shared memory.
+    '''
+    def __init__(self,mo,s_date,frame: sharedFrame):
+        self.mo = mo
+        self.date = s_date
+        self.frame = frame
+
+    def attach(self) -> Cm :
+        return Cm(self.mo,self.date,self.frame.attach())
+
+class sharedCmDict(Mapping):
+    '''
+    Read-only mapping of MO name to Cm attached from shared memory.
+
+    Each MO is attached on its first lookup, so a worker only maps the MOs
+    and dependency MOs it actually audits.
+
+    Parameters
+    ----------
+    handles : dictionary of MO name to sharedCm.
+    '''
+    def __init__(self,handles: Dict[str,sharedCm]):
+        self.handles = handles
+        self.attached = {}
+
+    @classmethod
+    def publish(cls,dict_cm: Mapping,store: sharedFrameStore) -> 'sharedCmDict' :
+        '''
+        Publish every Cm of ``dict_cm`` in ``store``.
+        '''
+        return cls({mo : dict_cm[mo].share(store) for mo in dict_cm})
+
+    def update(self,handles: Dict[str,sharedCm]) -> None:
+        '''
+        Add the MOs of ``handles``, published after the mapping was sent.
+        '''
+        self.handles.update(handles)
+
+    def __getstate__(self):
+        # only the handles are sent to other processes
+        return {'handles' : self.handles, 'attached' : {}}
+
+    def __getitem__(self,mo: str) -> Cm :
+        if mo not in self.attached:
+            self.attached[mo] = self.handles[mo].attach()
+        return self.attached[mo]
+
+    def __contains__(self,mo) -> bool:
+        return mo in self.handles
+
+    def __iter__(self):
+        return iter(self.handles)
+
+    def __len__(self) -> int:
+        return len(self.handles)
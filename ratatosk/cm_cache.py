@@ -0,0 +1,168 @@
+import os
+import glob
+import hashlib
+import threading
+import pandas as pd
+from typing import Optional
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+class cmCache:
+    '''
+    Columnar (parquet) cache of decoded cm files.
+
+    A cache entry is keyed by the folder of the cm file (cm_folder/subfolder/date),
+    the MO name and the size and modification time of the source file, so an
+    entry is never reused once the decoder drops a new file in place.
+    If pyarrow is not installed the cache is disabled and every read
+    falls back to the source file.
+    '''
+    def __init__(self,cache_folder: Optional[str] = None):
+        self.cache_folder = cache_folder
+        self.enabled = (pq is not None) and (cache_folder not in [None,''])
+
+    def entry_path(self,cm_file: str) -> str:
+        '''
+        Return the cache file path for the current version of ``cm_file``.
+        '''
+        stat = os.stat(cm_file)
+        folder = os.path.dirname(os.path.abspath(cm_file))
+        mo = os.path.basename(cm_file).split('.')[0]
+        digest = hashlib.sha1(folder.encode()).hexdigest()[:16]
+
+        return '%s/%s/%s.%s-%s.parquet'%(self.cache_folder,digest,mo,stat.st_size,stat.st_mtime_ns)
+
+    def has(self,cm_file: str) -> bool:
+        if not self.enabled:
+            return False
+        try:
+            return os.path.exists(self.entry_path(cm_file))
+        except OSError:
+            return False
+
+    def columns(self,cm_file: str) -> list:
+        '''
+        Return the header of the cached cm file without reading any data.
+        '''
+        return pq.read_schema(self.entry_path(cm_file)).names
+
+    def num_rows(self,cm_file: str) -> int:
+        '''
+        Return the number of rows of the cached cm file from the parquet metadata.
+        '''
+        return pq.read_metadata(self.entry_path(cm_file)).num_rows
+
+    def read(
+            self,
+            cm_file: str,
+            columns: Optional[list] = None
+    ) -> pd.DataFrame :
+        '''
+        Read the cached cm file. Only ``columns`` are read from disk if specified.
+        '''
+        return pd.read_parquet(self.entry_path(cm_file),columns=columns)
+
+    def iter_read(
+            self,
+            cm_file: str,
+            columns: Optional[list] = None,
+            batch_size: int = 65536
+    ):
+        '''
+        Yield the cached cm file as dataframes of at most ``batch_size`` rows.
+        '''
+        parquet_file = pq.ParquetFile(self.entry_path(cm_file))
+        for batch in parquet_file.iter_batches(batch_size=batch_size,columns=columns):
+            yield batch.to_pandas()
+
+    def put(self,cm_file: str,df: pd.DataFrame) -> None:
+        '''
+        Store ``df`` as the cache entry of ``cm_file`` and remove stale entries of the same MO.
+        If the entry cannot be written it is reported and skipped, other entries are not affected.
+        '''
+        if not self.enabled:
+            return None
+
+        entry = self.entry_path(cm_file)
+        tmp_entry = entry+'.%s.%s.tmp'%(os.getpid(),threading.get_ident())
+        try:
+            os.makedirs(os.path.dirname(entry),exist_ok=True)
+            df.to_parquet(tmp_entry,index=False)
+            os.replace(tmp_entry,entry)
+        except Exception as err:
+            # only this entry is dropped, the file is read from the source next time
+            print(f"  Failed to cache {cm_file} with error {err}")
+            if os.path.exists(tmp_entry):
+                os.remove(tmp_entry)
+            return None
+
+        self.remove_stale(cm_file,entry)
+
+        return None
+
+    def put_chunks(self,cm_file: str,chunks):
+        '''
+        Store the dataframes ``chunks`` as the cache entry of ``cm_file``, one row group per chunk.
+
+        Return a generator yielding each chunk once it is written, so the file
+        is cached while it is streamed, or None if the entry cannot be created.
+        A chunk that cannot be written, e.g. when its column types differ from
+        the first chunk, drops the entry and the remaining chunks are still yielded.
+        '''
+        if not self.enabled:
+            return None
+
+        entry = self.entry_path(cm_file)
+        try:
+            os.makedirs(os.path.dirname(entry),exist_ok=True)
+        except OSError as err:
+            print(f"  Failed to cache {cm_file} with error {err}")
+            return None
+
+        return self.__write_chunks(cm_file,entry,chunks)
+
+    def __write_chunks(self,cm_file: str,entry: str,chunks):
+        tmp_entry = entry+'.%s.%s.tmp'%(os.getpid(),threading.get_ident())
+        writer = None
+        failed = False
+        try:
+            for chunk in chunks:
+                if not failed:
+                    try:
+                        table = pa.Table.from_pandas(chunk,preserve_index=False)
+                        if writer is None:
+                            writer = pq.ParquetWriter(tmp_entry,table.schema)
+                        writer.write_table(table.cast(writer.schema))
+                    except Exception as err:
+                        # only this entry is dropped, the file is read from the source next time
+                        print(f"  Failed to cache {cm_file} with error {err}")
+                        failed = True
+                yield chunk
+
+            if (not failed) and (writer is not None):
+                writer.close()
+                writer = None
+                os.replace(tmp_entry,entry)
+                self.remove_stale(cm_file,entry)
+        finally:
+            if writer is not None:
+                writer.close()
+            if os.path.exists(tmp_entry):
+                os.remove(tmp_entry)
+
+    def remove_stale(self,cm_file: str,entry: str) -> None:
+        '''
+        Remove the entries of the MO of ``cm_file`` other than ``entry``.
+        '''
+        mo = os.path.basename(cm_file).split('.')[0]
+        for stale_entry in glob.glob('%s/%s.*.parquet'%(os.path.dirname(entry),glob.escape(mo))):
+            if stale_entry != entry:
+                try:
+                    os.remove(stale_entry)
+                except OSError:
+                    pass
@@ -1,13 +1,60 @@
 import pandas as pd
 import re
-from .exceptions import InvalidHeaderError 
+import os
+from typing import Optional
+from .exceptions import InvalidHeaderError, InvalidRuleError
+from .rules import Rule, compile_rule
+from ratatosk.global_config import GlobalConfig
 
 class ConfigReference:
-    def __init__(self,reference_file_path):
+    def __init__(
+            self,
+            reference_file_path,
+            bands: Optional[list] = None
+    ):
         self.filePath = reference_file_path
+        self.bands = bands if bands is not None else self.__get_bands()
         self.settings = self.__load_reference()
         self.paramGroup = self.__create_param_group()
         self.moList = self.__get_mo_list()
+        self.rules = self.__compile_rules()
+
+    def __get_bands(self) -> list:
+        global_config_path = os.path.join(os.path.dirname(__file__), 'config.json')
+        global_config    = GlobalConfig(global_config_path)
+        bands = list(global_config.get_parameter('bands'))
+        for band in list(global_config.get_parameter('dict_band').values())+['N2300']:
+            if band not in bands:
+                bands.append(band)
+        return bands
+
+    def __compile_rules(self) -> dict:
+        """
+        Compile the band cells of the reference into {(row index, band) : Rule}.
+        All invalid rules are reported at once with InvalidRuleError.
+        """
+        compiled_rules = {}
+        errors = []
+        bands = [band for band in self.bands if band in self.settings.columns]
+        for index,row in self.settings.iterrows():
+            for band in bands:
+                dependency = self.get_band_dependency(row['Dependency'],band)
+                dependent = len([dep for dep in self.parse_dependency(dependency) if dep['operator'] == ''])
+                try:
+                    compiled_rules[(index,band)] = compile_rule(row[band],dependent)
+                except InvalidRuleError as err:
+                    errors.append(f"{row['MO.Parameter']} {band} : {err}")
+
+        if len(errors)>0:
+            raise InvalidRuleError(f"Invalid rules in reference file {self.filePath}\n"+'\n'.join(errors))
+
+        return compiled_rules
+
+    def get_rule(self,index,band: str) -> Rule :
+        """
+        Return the compiled rule of row ``index`` of settings for ``band``.
+        """
+        return self.rules[(index,band)]
 
     def __get_mo_list(self):
         df = self.settings.copy()
@@ -53,37 +100,75 @@ class ConfigReference:
         
         dependencies = list(set(pd.unique(df['Dependency'])))
         for dependency in dependencies:
-            mo_ids = ''
-            mo_s = []
-            if dependency != 'None':
-                if '{' not in dependency:
-                    mo_s=[dependency]
-                else:
-                    # Extract alphabets with dot before and after using regex
-                    mo_s = re.findall(r'\b\w*\.\w*\b', dependency)
-
-                for mo in mo_s:
-                    sub_mo = mo.split('.')[0].split('=')[0]
-                    param = mo.split('.')[1].lower()
-                    if '=' in mo:
-                        mo_ids = mo.split('.')[0].split('=')[1]
-                    mo_id = sub_mo.lower()+'id'
-
-                    if sub_mo not in mo_dict:
-                        #print(sub_mo)
-                        mo_dict[sub_mo] = {mo_id : [],
-                                        'parameters' : []}
-                        mo_dict[sub_mo]['parameters'] = [param]
-                        if mo_ids != '':
-                            mo_dict[sub_mo][mo_id] = [mo_ids]
-                    else : 
-                        if param not in mo_dict[sub_mo]['parameters']:
-                            mo_dict[sub_mo]['parameters'].append(param)
-                        if (mo_ids != '') and (mo_ids not in mo_dict[sub_mo][mo_id]):
-                            mo_dict[sub_mo]['sub_id'].append(mo_ids)
+            for dep in self.parse_dependency(dependency):
+                sub_mo = dep['mo']
+                param = dep['parameter']
+                mo_ids = dep['sub_id']
+                mo_id = sub_mo.lower()+'id'
+
+                if sub_mo not in mo_dict:
+                    #print(sub_mo)
+                    mo_dict[sub_mo] = {mo_id : [],
+                                    'parameters' : []}
+                    mo_dict[sub_mo]['parameters'] = [param]
+                    if mo_ids != '':
+                        mo_dict[sub_mo][mo_id] = [mo_ids]
+                else : 
+                    if param not in mo_dict[sub_mo]['parameters']:
+                        mo_dict[sub_mo]['parameters'].append(param)
+                    # an empty sub-id list means all sub-id, only extend lists already restricted
+                    if (mo_ids != '') and (len(mo_dict[sub_mo][mo_id])>0) and (mo_ids not in mo_dict[sub_mo][mo_id]):
+                        mo_dict[sub_mo][mo_id].append(mo_ids)
         #print(mo_dict)
         return mo_dict
         
+    def get_band_dependency(self,dependency: str,band: str) -> str:
+        """
+        Return the Dependency applying to ``band``. For the band dictionary format
+        ``{MO.param:[band1,band2],MO.param:[band3]}`` it is the MO.param listing the band,
+        "None" if no MO.param list the band.
+        """
+        if '{' not in dependency:
+            return dependency
+
+        for dep,bands in re.findall(r'([^{}\[\]:,]+):\[([^\[\]]*)\]', dependency):
+            if band.lower() in [x.strip().lower() for x in bands.split(',')]:
+                return dep.strip()
+
+        return 'None'
+
+    def parse_dependency(self,dependency: str) -> list:
+        """
+        Return the list of MO parameters referenced by a Dependency cell.
+
+        Each item is a dictionary {'mo','sub_id','parameter','operator'} with empty
+        string for sub_id and operator if not specified. Both the plain format
+        ``MO.param;MO=subid.param.+`` and the band dictionary format
+        ``{MO.param:[band1,band2],MO.param:[band3]}`` are supported.
+        """
+        if dependency == 'None':
+            return []
+
+        if '{' in dependency:
+            dep_groups = re.findall(r'([^{}\[\]:,]+):\[', dependency)
+        else:
+            dep_groups = [dependency]
+
+        dependency_list = []
+        for dep_group in dep_groups:
+            for dep in dep_group.split(';'):
+                parts = dep.split('.')
+                if len(parts)<2:
+                    continue
+                dependency_list.append({
+                    'mo'        : parts[0].split('=')[0],
+                    'sub_id'    : parts[0].split('=')[1] if '=' in parts[0] else '',
+                    'parameter' : parts[1].lower(),
+                    'operator'  : parts[2] if len(parts)>2 else ''
+                })
+
+        return dependency_list
+
     def __load_reference(self):
         """
         This function load a reference configuration file, preprocess it and return the file as pandas dataframe if
@@ -0,0 +1,120 @@
+import threading
+import numpy as np
+import pandas as pd
+from typing import Optional
+
+from .identifiers import IdentifierDictionary, IDENTIFIER_KINDS
+
+class dependencyIndex:
+    '''
+    Cache of the join indexes used to map Dependency values.
+
+    A join index is built once per (dependent MO, sub-id, mapping columns) from
+    the key arrays of the dependent MO and serves every dependent parameter,
+    band and audited MO using it. Lookups are vectorised ``get_indexer`` calls
+    followed by a ``take`` of the dependency values.
+
+    Parameters
+    ----------
+    identifiers : IdentifierDictionary of the run, default None.
+                  If specified identifier columns are joined on their integer codes.
+    '''
+    def __init__(
+            self,
+            identifiers: Optional[IdentifierDictionary] = None
+    ):
+        self.identifiers = identifiers
+        self.indexes = {}
+        self.lock = threading.Lock()
+
+    def __getstate__(self):
+        # join indexes refer to the dataframes of this process, they are not sent along
+        return {'identifiers' : self.identifiers}
+
+    def __setstate__(self,state):
+        self.__init__(state['identifiers'])
+
+    def key_arrays(self,df: pd.DataFrame,columns: list) -> tuple :
+        '''
+        Return the key arrays of ``df`` for ``columns`` and a mask of the rows having all keys.
+        '''
+        if (self.identifiers is not None) and self.identifiers.can_join(columns):
+            with self.identifiers.lock:
+                categories = dict(self.identifiers.categories)
+            arrays = [self.identifiers.codes(df[col],categories[IDENTIFIER_KINDS[col]]) for col in columns]
+            valid = np.logical_and.reduce([array != -1 for array in arrays])
+        else:
+            arrays = [df[col].to_numpy() for col in columns]
+            valid = np.logical_and.reduce([pd.notnull(array) for array in arrays])
+
+        return arrays,valid
+
+    def make_index(self,arrays: list) -> pd.Index :
+        if len(arrays) == 1:
+            return pd.Index(arrays[0])
+        return pd.MultiIndex.from_arrays(arrays)
+
+    def get_index(
+            self,
+            df_dependent: pd.DataFrame,
+            dep_mo: str,
+            dep_mo_id: str,
+            columns: list
+    ) -> dict :
+        '''
+        Return the cached join index of ``df_dependent``, rows of sub-id ``dep_mo_id`` only
+        if specified. The index is rebuilt if the dependent MO dataframe changed.
+        '''
+        key = (dep_mo,dep_mo_id,tuple(columns))
+        with self.lock:
+            entry = self.indexes.get(key)
+        if (entry is not None) and (entry['frame'] is df_dependent) and (entry['length'] == len(df_dependent)):
+            return entry
+
+        rows = np.arange(len(df_dependent))
+        if dep_mo_id != '':
+            rows = np.flatnonzero((df_dependent[dep_mo.lower()+'id'] == dep_mo_id).to_numpy())
+
+        arrays,valid = self.key_arrays(df_dependent.iloc[rows],columns)
+        index = self.make_index([array[valid] for array in arrays])
+        # last row wins on duplicated keys
+        unique = ~index.duplicated(keep='last')
+
+        entry = {
+            'frame'     : df_dependent,
+            'length'    : len(df_dependent),
+            'index'     : index[unique],
+            'positions' : rows[valid][unique]
+        }
+        with self.lock:
+            self.indexes[key] = entry
+
+        return entry
+
+    def lookup(
+            self,
+            df_config: pd.DataFrame,
+            df_dependent: pd.DataFrame,
+            dep_mo: str,
+            dep_mo_id: str,
+            columns: list,
+            dep_param: str
+    ) -> pd.Series :
+        '''
+        Return ``df_dependent[dep_param]`` aligned to the rows of ``df_config`` by the
+        mapping ``columns``. Rows without a match get NaN.
+        '''
+        if len(columns) == 0:
+            return pd.Series(np.nan,index=df_config.index)
+
+        entry = self.get_index(df_dependent,dep_mo,dep_mo_id,columns)
+        arrays,valid = self.key_arrays(df_config,columns)
+        indexer = entry['index'].get_indexer(self.make_index(arrays))
+        indexer[~valid] = -1
+
+        positions = np.full(len(indexer),-1,dtype=np.int64)
+        positions[indexer != -1] = entry['positions'][indexer[indexer != -1]]
+        # position -1 is not in the RangeIndex, thus NaN
+        values = df_dependent[dep_param].reset_index(drop=True).reindex(positions)
+
+        return pd.Series(values.to_numpy(),index=df_config.index,name=dep_param)
@@ -1,3 +1,7 @@
 class InvalidHeaderError(Exception):
     """Custom exception for invalid header in the dataframe"""
-    pass
\ No newline at end of file
+    pass
+
+class InvalidRuleError(Exception):
+    """Custom exception for invalid rule in the reference file"""
+    pass
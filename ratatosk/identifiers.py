@@ -0,0 +1,116 @@
+import threading
+import numpy as np
+import pandas as pd
+
+# identifier columns encoded by IdentifierDictionary and the dictionary they share
+IDENTIFIER_KINDS = {
+    'mecontext'       : 'node',
+    'siteid'          : 'site',
+    'eutrancellfddid' : 'cell',
+    'eutrancelltddid' : 'cell',
+    'nrcellduid'      : 'cell',
+}
+
+class IdentifierDictionary:
+    '''
+    Run-wide dictionary of nodes, sites and cells.
+
+    Identifier columns of every loaded MO are stored as pandas Categoricals
+    whose categories are the dictionary of their kind. The dictionaries are
+    append-only, so the category code of a value never changes during a run
+    and codes from different MOs can be compared and joined as integers.
+    '''
+    def __init__(self):
+        self.categories = {kind : pd.Index([],dtype=object) for kind in set(IDENTIFIER_KINDS.values())}
+        self.lock = threading.Lock()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['lock']
+        return state
+
+    def __setstate__(self,state):
+        self.__dict__.update(state)
+        self.lock = threading.Lock()
+
+    def encode(self,series: pd.Series,kind: str) -> pd.Series :
+        '''
+        Return ``series`` as a Categorical sharing the dictionary of ``kind``.
+        '''
+        uniques = pd.Index(pd.unique(series.dropna()))
+        with self.lock:
+            categories = self.categories[kind]
+            new_values = uniques[categories.get_indexer(uniques) == -1]
+            if len(new_values)>0:
+                categories = categories.append(new_values.astype(object))
+                self.categories[kind] = categories
+
+        codes = categories.get_indexer(series)
+        return pd.Series(pd.Categorical.from_codes(codes,categories=categories),
+                         index=series.index,
+                         name=series.name)
+
+    def encode_frame(self,df: pd.DataFrame) -> pd.DataFrame :
+        '''
+        Encode all identifier columns of ``df`` in place and return it.
+        '''
+        for col in IDENTIFIER_KINDS:
+            if col in df.columns:
+                df[col] = self.encode(df[col],IDENTIFIER_KINDS[col])
+        return df
+
+    def codes(self,series: pd.Series,categories: pd.Index) -> np.ndarray :
+        '''
+        Return the codes of ``series`` in ``categories``, -1 for missing or unknown values.
+        '''
+        if isinstance(series.dtype,pd.CategoricalDtype):
+            series_categories = series.cat.categories
+            if categories[:len(series_categories)].equals(series_categories):
+                return series.cat.codes.to_numpy().astype(np.int64)
+
+        return categories.get_indexer(series).astype(np.int64)
+
+    def join_keys(self,dfs: list,columns: list,categories: dict) -> list:
+        '''
+        Return for each dataframe of ``dfs`` one int64 key per row combining the codes
+        of the identifier ``columns`` in the ``categories`` snapshot. Keys are comparable
+        across ``dfs``. Rows with a missing identifier get key -1.
+        '''
+        lengths = [len(df) for df in dfs]
+        keys = np.zeros(sum(lengths),dtype=np.int64)
+        missing = np.zeros(sum(lengths),dtype=bool)
+        for col in columns:
+            kind_categories = categories[IDENTIFIER_KINDS[col]]
+            codes = np.concatenate([self.codes(df[col],kind_categories) for df in dfs])
+            keys = keys*(len(kind_categories)+1) + codes + 1
+            missing |= (codes == -1)
+            # keep keys dense so combining more columns cannot overflow
+            keys = pd.factorize(keys)[0].astype(np.int64)
+        keys[missing] = -1
+
+        return np.split(keys,np.cumsum(lengths)[:-1])
+
+    def can_join(self,columns: list) -> bool:
+        return (len(columns)>0) and all(col in IDENTIFIER_KINDS for col in columns)
+
+    def map_values(
+            self,
+            df: pd.DataFrame,
+            df_source: pd.DataFrame,
+            columns: list,
+            value_column: str
+    ) -> np.ndarray :
+        '''
+        Return ``df_source[value_column]`` aligned to the rows of ``df`` by the identifier
+        ``columns``, joining on integer keys. Rows without a match get NaN and the last
+        source row wins on duplicated keys.
+        '''
+        with self.lock:
+            categories = dict(self.categories)
+
+        keys,source_keys = self.join_keys([df,df_source],columns,categories)
+        lookup = pd.Series(df_source[value_column].to_numpy(),index=source_keys)
+        lookup = lookup[source_keys != -1]
+        lookup = lookup[~lookup.index.duplicated(keep='last')]
+
+        return lookup.reindex(keys).to_numpy()
@@ -0,0 +1,228 @@
+import os
+import gzip
+import zipfile
+import pandas as pd
+from collections import OrderedDict
+from typing import Optional, Dict
+
+from .config_reference import ConfigReference
+from .cm import cmCollector
+from .virtual_columns import requested_columns
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Columns needed by the report builders on top of the audited parameters
+EXTRA_PARAMETERS = {
+    'FeatureState' : ['description']
+}
+
+class LoadPlan:
+    '''
+    Deduplicated plan of the cm files to read for a config reference.
+
+    Every MO requested by the reference, either as an audited MO or as a
+    Dependency target, is compiled into a single MO entry holding the union of
+    its parameters and sub-id. The plan has one entry per (MO, subfolder)
+    so each cm file is read exactly once per run.
+
+    Parameters
+    ----------
+    config_reference : ConfigReference to compile.
+
+    s_date : "YYYYMMDD" date of the cm to be collected.
+
+    cm_folder : Main folder to search for the cm files
+
+    sub_folders : ['subfolder1', 'subfolder2', ...], default empty.
+                  If not specified CM will be searched only in the ``cm_folder``.
+
+    file_ext : extension of the cm files, default ``csv``
+
+    filters : {'col1' : ['value1']}, default empty.
+              object filters (node, site or cell) applied to every MO.
+    '''
+    def __init__(
+            self,
+            config_reference: ConfigReference,
+            s_date: str,
+            cm_folder: str,
+            sub_folders: Optional[list] = [],
+            file_ext: str = 'csv',
+            filters: Optional[Dict[str,list]] = {}
+    ):
+        self.config_reference = config_reference
+        self.date = s_date
+        self.cm_folder = cm_folder
+        self.sub_folders = sub_folders
+        self.file_ext = file_ext
+        self.filters = filters
+        self.moList = self.__compile()
+        self.entries = self.__create_entries()
+
+    def __compile(self) -> OrderedDict :
+        '''
+        Return {mo : {'parameters' : [...], 'sub_ids' : [...] or None}} for all MO
+        to be loaded. sub_ids is None when all sub-id of the MO are needed.
+        '''
+        reference = self.config_reference
+        mo_list = OrderedDict()
+
+        def add_mo(mo,sub_id,parameters):
+            if mo not in mo_list:
+                mo_list[mo] = {'parameters' : [], 'sub_ids' : []}
+            for param in parameters:
+                if param not in mo_list[mo]['parameters']:
+                    mo_list[mo]['parameters'].append(param)
+            if sub_id == '':
+                mo_list[mo]['sub_ids'] = None
+            elif (mo_list[mo]['sub_ids'] is not None) and (sub_id not in mo_list[mo]['sub_ids']):
+                mo_list[mo]['sub_ids'].append(sub_id)
+
+        # keep the MO order used by the auditor
+        for mo in reference.moList:
+            mo_list[mo] = {'parameters' : list(reference.moList[mo]['parameters']), 'sub_ids' : []}
+
+        for index,row in reference.settings.iterrows():
+            mo = row['MO'].split('=')[0]
+            sub_id = row['MO'].split('=')[1] if '=' in row['MO'] else ''
+            add_mo(mo,sub_id,[row['Parameter']])
+
+            for dep in reference.parse_dependency(row['Dependency']):
+                add_mo(dep['mo'],dep['sub_id'],[dep['parameter']])
+
+        for mo in EXTRA_PARAMETERS:
+            if mo in mo_list:
+                for param in EXTRA_PARAMETERS[mo]:
+                    if param not in mo_list[mo]['parameters']:
+                        mo_list[mo]['parameters'].append(param)
+
+        return mo_list
+
+    def __create_entries(self) -> list:
+        entries = []
+        for mo in self.moList:
+            for sub_folder in (self.sub_folders if len(self.sub_folders)>0 else ['']):
+                if sub_folder != '':
+                    cm_file = f'%s/%s/%s/%s.{self.file_ext}'%(self.cm_folder,sub_folder,self.date,mo)
+                else:
+                    cm_file = f'%s/%s/%s.{self.file_ext}'%(self.cm_folder,self.date,mo)
+
+                entries.append({
+                    'mo'         : mo,
+                    'sub_folder' : sub_folder,
+                    'file'       : cm_file,
+                    'parameters' : self.get_parameters(mo),
+                    'filters'    : self.get_filters(mo),
+                    'sub_ids'    : self.moList[mo]['sub_ids']
+                })
+
+        return entries
+
+    def get_parameters(self,mo: str) -> list:
+        return self.moList[mo]['parameters']
+
+    def get_filters(self,mo: str) -> Dict[str,list] :
+        '''
+        Return the object filters and the sub-id filter to apply when loading ``mo``.
+        '''
+        filters = dict(self.filters)
+        sub_ids = self.moList[mo]['sub_ids']
+        if (sub_ids is not None) and (len(sub_ids)>0):
+            filters[mo.lower()+'id'] = sub_ids
+
+        return filters
+
+    def explain(self,cmc: Optional[cmCollector] = None) -> pd.DataFrame :
+        '''
+        Print and return the files, columns and estimated rows of the plan
+        without loading any cm file.
+        '''
+        if cmc is None:
+            cmc = cmCollector()
+
+        rows = []
+        for entry in self.entries:
+            cm_file = entry['file']
+            columns = ['mecontext']+entry['parameters']
+            derived = [column.name for column in requested_columns(entry['mo'],entry['parameters'])]
+            estimated_rows = None
+            exists = os.path.exists(cm_file)
+            if exists:
+                try:
+                    header = cmc.sniff_header(cm_file)
+                    columns = cmc.get_needed_columns(header,cmc.get_read_parameters(cm_file,entry['parameters']),entry['filters'])
+                    if columns is None:
+                        columns = header
+                    derived = [name for name in derived if name not in header]
+                    estimated_rows = self.estimate_rows(cm_file,cmc)
+                except Exception as err:
+                    print(f"Failed to inspect cm_file {cm_file} with error {err}")
+
+            rows.append({
+                'MO'             : entry['mo'],
+                'Subfolder'      : entry['sub_folder'],
+                'File'           : cm_file,
+                'Exists'         : exists,
+                'Sub-Id'         : 'all' if entry['sub_ids'] is None else ','.join(entry['sub_ids']),
+                'Columns'        : ','.join(columns),
+                'Derived'        : ','.join(derived),
+                'Estimated Rows' : estimated_rows
+            })
+
+        df_plan = pd.DataFrame(rows)
+
+        print('Load plan')
+        for row in rows:
+            print(f"  {row['File']}")
+            print(f"     exists         : {row['Exists']}")
+            print(f"     sub-id         : {row['Sub-Id']}")
+            print(f"     columns        : {row['Columns']}")
+            print(f"     derived        : {row['Derived']}")
+            print(f"     estimated rows : {row['Estimated Rows']}")
+
+        return df_plan
+
+    def estimate_rows(self,cm_file: str,cmc: cmCollector,sample_bytes: int = 1<<16) -> int:
+        '''
+        Estimate the number of rows of a cm file from its uncompressed size and
+        the average line length of its first ``sample_bytes`` bytes. Cached cm
+        files report the exact number of rows.
+        '''
+        if cmc.cache.has(cm_file):
+            return cmc.cache.num_rows(cm_file)
+
+        if cm_file.endswith('.zip'):
+            with zipfile.ZipFile(cm_file) as zip_file:
+                member = zip_file.infolist()[0]
+                size = member.file_size
+                with zip_file.open(member) as file:
+                    sample = file.read(sample_bytes)
+        elif cm_file.endswith('.gz'):
+            # the gzip trailer ends with the uncompressed size modulo 2**32
+            with open(cm_file,'rb') as file:
+                file.seek(-4,os.SEEK_END)
+                size = int.from_bytes(file.read(4),'little')
+            with gzip.open(cm_file,'rb') as file:
+                sample = file.read(sample_bytes)
+        elif cm_file.endswith('.zst') and (zstandard is not None):
+            with open(cm_file,'rb') as file:
+                size = zstandard.frame_content_size(file.read(18))
+                file.seek(0)
+                sample = zstandard.ZstdDecompressor().stream_reader(file).read(sample_bytes)
+            if size < 0:
+                return None
+        elif cm_file.endswith('.csv'):
+            size = os.path.getsize(cm_file)
+            with open(cm_file,'rb') as file:
+                sample = file.read(sample_bytes)
+        else:
+            return None
+
+        n_lines = sample.count(b'\n')
+        if (n_lines == 0) or (len(sample) >= size):
+            return max(n_lines-1,0)
+
+        return int(size/(len(sample)/n_lines))-1
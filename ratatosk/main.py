@@ -6,9 +6,11 @@ import re
 from ratatosk.global_config import GlobalConfig
 from ratatosk.cell_list import CellList
 from ratatosk.config_reference import ConfigReference
-from ratatosk.cm import cmCollector
+from ratatosk.cm import cmCollector, cmPrefetcher
 from ratatosk.pre_processor import cmPreProcessor
 from ratatosk.auditor import Auditor
+from ratatosk.load_plan import LoadPlan
+from ratatosk.identifiers import IdentifierDictionary
 
 def cmedit_query_function(
     object_list='',
@@ -65,12 +67,19 @@ def get_cm_function(
         cm_subfolders='',
         file_ext='csv',
         output_folder_path='',
-        format='cm-bulk'
+        format='cm-bulk',
+        cache=True
 ):
     global_config_path = os.path.join(os.path.dirname(__file__), 'config.json')
     global_config    = GlobalConfig(global_config_path)
 
-    cmc = cmCollector()
+    cache_folder = None
+    if cache:
+        cache_folder = global_config.get_parameter('cache_folder')
+
+    cmc = cmCollector(cache_folder=cache_folder,
+                      chunksize=global_config.get_parameter('chunk_size'),
+                      max_workers=global_config.get_parameter('load_workers'))
 
     if cm_folder_path == '':
         cm_folder_path = global_config.get_parameter('cm_folder')
@@ -129,8 +138,10 @@ def audit_cm_function(
         file_ext='csv',
         output_folder_path='',
         verbose=False,
-        preprocess=True,
-        rat=['4G','5G']
+        preprocess=False,
+        rat=['4G','5G'],
+        cache=True,
+        explain=False
     ):
     '''
     
@@ -166,13 +177,52 @@ def audit_cm_function(
     print(f'Analyzing configuration date {date}\n')
     ####################################################################
 
+
+    ############################# Load Plan #############################
+    filters = {}
+    if filter_by == 'node':
+        print("filter by node")
+        filters['mecontext'] = list(cells['mecontext'])
+    elif filter_by == 'site':
+        print("filter by site")
+        filters['siteid'] = list(cells['siteid'])
+    elif (filter_by == 'cell') or (filter_by == 'ne'):
+        print("filter by cell")
+        filters['eutrancellfddid'] = list(cells['cell'])
+        filters['eutrancelltddid'] = list(cells['cell'])
+        filters['nrcellduid'] = list(cells['cell'])
+    else:
+        raise ValueError("Invalid Filter Option. Can only filter by 'node', 'site' or 'cell' ")
+
+    load_plan = LoadPlan(
+        config_reference,
+        date,
+        cm_folder_path,
+        cm_subfolders,
+        file_ext,
+        filters
+    )
+
+    cache_folder = None
+    if cache:
+        cache_folder = global_config.get_parameter('cache_folder')
+    cmc = cmCollector(cache_folder=cache_folder,
+                      chunksize=global_config.get_parameter('chunk_size'),
+                      max_workers=global_config.get_parameter('load_workers'))
+
+    if explain:
+        load_plan.explain(cmc)
+        return None
+    ######################################################################
+
     
     ############################ Preprocessing ##########################
     if preprocess :
         preprocessor = cmPreProcessor(
             cm_folder=cm_folder_path,
             sub_folders=cm_subfolders,
-            s_date=date
+            s_date=date,
+            workers=global_config.get_parameter('preprocess_workers')
         )
         print("Preprocessing")
         preprocessor.run(
@@ -198,34 +248,14 @@ def audit_cm_function(
 
     ############################## Load CM ###############################
     
-    dict_df = {}
-    cmc = cmCollector()
-
-    for mo in config_reference.moList:
-        parameters = config_reference.moList[mo]['parameters']
-        
-        if mo == 'FeatureState':
-            parameters.append('description')
-            
-        filters = {}
-        if filter_by == 'node':
-            print("filter by node")
-            filters['mecontext'] = list(cells['mecontext'])
-        elif filter_by == 'site':
-            print("filter by site")
-            filters['siteid'] = list(cells['siteid'])
-        elif (filter_by == 'cell') or (filter_by == 'ne'):
-            print("filter by cell")
-            filters['eutrancellfddid'] = list(cells['cell'])
-            filters['eutrancelltddid'] = list(cells['cell'])
-            filters['nrcellduid'] = list(cells['cell'])
-        else:
-            raise ValueError("Invalid Filter Option. Can only filter by 'node', 'site' or 'cell' ")
+    # nodes, sites and cells of all MOs share one dictionary of integer codes
+    identifiers = IdentifierDictionary()
 
+    def load_mo(mo):
+        parameters = load_plan.get_parameters(mo)
+        filters = load_plan.get_filters(mo)
         mo_id = mo.lower()+'id'
-    
-        if len(config_reference.moList[mo][mo_id]) > 0:
-            filters[mo_id] = config_reference.moList[mo][mo_id]
+
         #print(parameters)
         #print(filters.keys())
         cm = cmc.collect_cm(
@@ -300,18 +330,24 @@ def audit_cm_function(
 
         #print(len(cm.configuration))
         #print(cm.configuration)
-        dict_df[mo] = cm
+        cm.configuration = identifiers.encode_frame(cm.configuration)
+        return cm
 
-    print("\n")
-    #####################################################################
-    
+    # MOs are loaded and prepared on a worker pool while the auditor works
+    # on the ones already loaded. Looking up an MO (or a dependency MO) that
+    # is still loading waits for it. The pool is shut down once the audit is
+    # done, loads not started yet are cancelled if it failed.
+    with cmPrefetcher(max_workers=global_config.get_parameter('prefetch_workers')) as dict_df:
+        for mo in load_plan.moList:
+            dict_df.submit(mo,load_mo,mo)
 
-    ############################## Concheck #############################
-    cm_auditor = Auditor()
-    audit_result = cm_auditor.audit(
-        config_reference,
-        dict_df
-    )
+        ############################ Concheck ###########################
+        cm_auditor = Auditor(identifiers=identifiers,
+                             workers=global_config.get_parameter('audit_workers'))
+        audit_result = cm_auditor.audit(
+            config_reference,
+            dict_df
+        )
     print("\n")
     #print(audit_result.audit_result.keys())
     #####################################################################
@@ -322,4 +358,4 @@ def audit_cm_function(
                                cells,
                                dict_df,
                                verbose)
-    print(pd.read_excel(output_folder_path))
\ No newline at end of file
+    print(f'Report saved to {output_folder_path}')
\ No newline at end of file
@@ -0,0 +1,81 @@
+import re
+import numpy as np
+import pandas as pd
+from functools import lru_cache
+from collections import namedtuple
+
+# Naming convention of nodes and cells, e.g. node BKT402ML and cell BKT402ML1 :
+#   BKT402 : siteid
+#   M      : site type, "I" for indoor and "M" for outdoor
+#   L      : band label
+#   1      : sector
+SITE_PATTERN = re.compile(r'([A-Za-z]{3}\d{3})')
+NE_PATTERN = re.compile(r'([A-Za-z]{3}\d{3}[A-Za-z]{2})')
+BAND_PATTERN = re.compile(r'[A-Za-z]{3}\d{3}[A-Za-z](.)')
+SECTOR_PATTERN = re.compile(r'[A-Za-z]{3}\d{3}[A-Za-z]{2}(\d+)')
+
+ParsedName = namedtuple('ParsedName',['siteid','ne','sector','band_label','site_type'])
+
+MISSING_NAME = ParsedName(np.nan,np.nan,np.nan,np.nan,'M')
+
+def _search(pattern: re.Pattern,name: str):
+    match = pattern.search(name)
+    return match.group(1) if match else np.nan
+
+@lru_cache(maxsize=1<<20)
+def parse_name(name) -> ParsedName :
+    '''
+    Parse a node or cell name into its siteid, ne, sector, band label and site type.
+    Parts not found in ``name`` are NaN, site type defaults to "M".
+    '''
+    if not isinstance(name,str):
+        return MISSING_NAME
+
+    return ParsedName(
+        siteid     = _search(SITE_PATTERN,name),
+        ne         = _search(NE_PATTERN,name),
+        sector     = _search(SECTOR_PATTERN,name),
+        band_label = _search(BAND_PATTERN,name),
+        site_type  = 'I' if name[6:7] == 'I' else 'M'
+    )
+
+def parse_names(names: pd.Series,field: str) -> pd.Series :
+    '''
+    Return ``field`` of ParsedName for every row of ``names``.
+
+    Each unique name is parsed once (and memoised across calls) then the
+    result is mapped back to the rows by its factorized code.
+    '''
+    codes,uniques = pd.factorize(names)
+    values = [getattr(parse_name(name),field) for name in np.asarray(uniques,dtype=object)]
+    # code -1 (missing name) picks the last item
+    values = np.array(values+[getattr(MISSING_NAME,field)],dtype=object)
+
+    return pd.Series(values[codes],index=names.index,name=field)
+
+def siteid(names: pd.Series) -> pd.Series :
+    return parse_names(names,'siteid')
+
+def ne(names: pd.Series) -> pd.Series :
+    return parse_names(names,'ne')
+
+def sector(names: pd.Series) -> pd.Series :
+    return parse_names(names,'sector')
+
+def band_label(names: pd.Series) -> pd.Series :
+    return parse_names(names,'band_label')
+
+def site_type(names: pd.Series) -> pd.Series :
+    return parse_names(names,'site_type')
+
+def first_band_label(df: pd.DataFrame,columns: list) -> pd.Series :
+    '''
+    Return the band label of the first cell column of ``columns`` found in ``df``
+    having a parsable name, NaN if there is none.
+    '''
+    result = pd.Series(np.nan,index=df.index,dtype=object,name='band_label')
+    for col in columns:
+        if col in df.columns:
+            result = result.fillna(band_label(df[col]))
+
+    return result
@@ -1,19 +1,583 @@
 import pandas as pd
 import os
 import json
+import hashlib
+import io
 import zipfile
-from typing import Optional
+from collections import OrderedDict
+from contextlib import ExitStack
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import Optional, Callable
+from . import naming
+from .cm import csv_compression
+from .virtual_columns import VIRTUAL_COLUMNS
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# version of each step, bump it when the transform changes to re-run the step on files
+# already preprocessed
+STEP_VERSIONS = {
+    'define_site_type'            : 1,
+    'drop_featurestate_duplicate' : 1,
+    'handle_sectorCarrier'        : 1,
+    'create_logicalchannelvalue'  : 1,
+    'handle_preproc'              : 1,
+    'merge_fdd_tdd'               : 1
+}
+
+MANIFEST_FILE = 'preprocess_manifest.json'
+
+# MOs whose reference columns are parsed by handle_preproc, flagged by a "modified" column
+PREPROC_MOS = ['QciProfilePredefined','QciProfileOperatorDefined','ReportConfigSearch','SubscriberGroupProfile','RlfProfile']
+
+class preprocessStep:
+    '''
+    Preprocessing step of one cm file of a date folder.
+
+    A step reads the dataframes of its ``inputs`` and returns the new dataframe of
+    its ``output``. Steps are the nodes of a graph over the cm files, ``run_steps``
+    reads every file once, applies all the steps of a file in memory and writes
+    the file once.
+
+    Parameters
+    ----------
+    key         : name of the step, its version is STEP_VERSIONS[key].
+    description : progress message of the step.
+    output      : MO of the file written by the step.
+    inputs      : MOs of the files read by the step, the output included if it is read.
+    transform   : function of {MO : dataframe} returning the dataframe of ``output``,
+                  the same dataframe if the file is left unchanged.
+    done        : function of the header of the output file, None if the file does not
+                  exist, returning ``True`` if the step is already applied, default None.
+    file_type   : extension of the output file if it is not the one of the run, default None.
+    '''
+    def __init__(
+            self,
+            key: str,
+            description: str,
+            output: str,
+            inputs: list,
+            transform: Callable,
+            done: Optional[Callable] = None,
+            file_type: Optional[str] = None
+    ):
+        self.key = key
+        self.description = description
+        self.output = output
+        self.inputs = inputs
+        self.transform = transform
+        self.done = done
+        self.file_type = file_type
+        self.version = STEP_VERSIONS[key]
+
+def _site_type(frames: dict,mo: str) -> pd.DataFrame :
+    df = frames[mo].copy(deep=False)
+    df['SiteType'] = naming.site_type(df[mo.lower()+'id'])
+    return df
+
+def _featurestate(frames: dict) -> pd.DataFrame :
+    df = frames['FeatureState'].sort_values(by='featureState',ascending=False)
+    return df.drop_duplicates(subset=['mecontext','featurestateid'],keep='first')
+
+def _sectorcarrier(frames: dict) -> pd.DataFrame :
+    df_sectorCarrier = frames['SectorCarrier'].copy(deep=False)
+    df_sectorCarrier['mapping'] = df_sectorCarrier['mecontext'].astype('str') + df_sectorCarrier['sectorcarrierid'].astype('str')
+    for column in VIRTUAL_COLUMNS['SectorCarrier']:
+        df_sectorCarrier[column.name] = column.compute(df_sectorCarrier,{mo : frames[mo] for mo in column.siblings})
+
+    return df_sectorCarrier
+
+def _logicalchannel(frames: dict,mo: str) -> pd.DataFrame :
+    df = frames[mo]
+    if len(df)<=1:
+        return df
+    df = df.copy(deep=False)
+    df['logicalChannelGroupRefValue'] = df['logicalChannelGroupRef'].str[-1]
+    return df
+
+def _preproc(frames: dict,mo: str) -> pd.DataFrame :
+    if ('modified' in frames[mo].columns) or (mo not in PREPROC_MOS):
+        return frames[mo]
+    df = frames[mo].copy(deep=False)
+    for column in VIRTUAL_COLUMNS[mo]:
+        df[column.name] = column.compute(df,{})
+    df['modified'] = 1
+    return df
+
+def _merge_fdd_tdd(frames: dict) -> pd.DataFrame :
+    df_fdd = frames['EUtranCellFDD'].rename(columns={'eutrancellfddid':'eutrancellid'})
+    df_tdd = frames['EUtranCellTDD'].rename(columns={'eutrancelltddid':'eutrancellid'})
+
+    df_merge = pd.concat([df_fdd,df_tdd],ignore_index=True)
+    df_merge.loc[pd.isnull(df_merge['dlChannelBandwidth']),'dlChannelBandwidth'] = df_merge['channelBandwidth']
+    df_merge.loc[df_merge['eutrancellid'].str[7]=='L','dlChannelBandwidth'] = 17700
+
+    return df_merge
+
+def _has_columns(columns: Optional[list],required: list) -> bool :
+    return (columns is not None) and all(col in columns for col in required)
+
+def _exists(columns: Optional[list]) -> bool :
+    return columns is not None
+
+# steps are built from module functions so they can be sent to preprocessing workers
+
+def site_type_step(mo: str) -> preprocessStep :
+    '''
+    Add SiteType to ``mo``, EUtranCellFDD or EUtranCellTDD. Site types define as "I"
+    for indoor and "M" for outdoor. Cell defined as BKT402ML1, the 7th character is the site type.
+    '''
+    return preprocessStep('define_site_type','Defining site type',mo,[mo],partial(_site_type,mo=mo),
+                          done=partial(_has_columns,required=['SiteType']))
+
+def featurestate_step() -> preprocessStep :
+    '''
+    Drop duplicates in FeatureState defined by unique mecontext and featurestateid.
+    '''
+    return preprocessStep('drop_featurestate_duplicate','Dropping featureState duplicates',
+                          'FeatureState',['FeatureState'],_featurestate)
+
+def sectorcarrier_step() -> preprocessStep :
+    '''
+    Add to SectorCarrier the eutrancellfddid and eutrancelltddid referring to it.
+    '''
+    return preprocessStep('handle_sectorCarrier','Modifying sectorCarrier','SectorCarrier',
+                          ['SectorCarrier','EUtranCellFDD','EUtranCellTDD'],_sectorcarrier,
+                          done=partial(_has_columns,required=['eutrancellfddid','eutrancelltddid']))
+
+def logicalchannel_step(mo: str) -> preprocessStep :
+    '''
+    Add logicalChannelGroupRefValue, the last character of logicalChannelGroupRef, to ``mo``.
+    '''
+    return preprocessStep('create_logicalchannelvalue','Creating logical channel',mo,[mo],
+                          partial(_logicalchannel,mo=mo),
+                          done=partial(_has_columns,required=['logicalChannelGroupRefValue']))
+
+def preproc_step(mo: str) -> preprocessStep :
+    '''
+    Parse the references of ``mo`` into the values audited, the file is flagged by a ``modified`` column.
+    '''
+    return preprocessStep('handle_preproc','Handling preprocess',mo,[mo],partial(_preproc,mo=mo),
+                          done=partial(_has_columns,required=['modified']))
+
+def merge_fdd_tdd_step() -> preprocessStep :
+    '''
+    Merge EUtranCellFDD and EUtranCellTDD into EUtranCellFDD_TDD.csv if it does not exist yet.
+    '''
+    return preprocessStep('merge_fdd_tdd','Merging EUtranCellFDD and TDD','EUtranCellFDD_TDD',
+                          ['EUtranCellFDD','EUtranCellTDD'],_merge_fdd_tdd,done=_exists,file_type='csv')
+
+def read_header(file: str) -> Optional[list] :
+    '''
+    Return the columns of the cm ``file``, None if it does not exist.
+    '''
+    if not os.path.exists(file):
+        return None
+    return list(pd.read_csv(file,index_col=None,nrows=0).columns)
+
+def replace_file(file: str,write: Callable) -> None :
+    '''
+    Replace ``file`` at once by the file written by ``write(path)`` under a temporary name,
+    concurrent readers see either the former or the new file, never a partial one.
+    '''
+    tmp_file = '%s.%s.tmp'%(file,os.getpid())
+    try:
+        write(tmp_file)
+        os.replace(tmp_file,file)
+    finally:
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
+
+def write_cm(df: pd.DataFrame,file: str) -> None :
+    '''
+    Write ``df`` as the cm ``file``, a csv file compressed by its extension: .zip, .gz, .zst
+    or none for .csv. The csv is streamed through the compressor into a temporary file
+    renamed over ``file``, no uncompressed copy is written and ``file`` is kept whole
+    until the new one is complete.
+    '''
+    compression = csv_compression(file)
+    if compression == 'zip':
+        # the zip member is named as the csv the decoder zipped
+        name = os.path.basename(file)[:-len('.zip')]
+        if not name.endswith('.csv'):
+            name += '.csv'
+        replace_file(file,partial(_write_zip,df,name=name))
+    else:
+        replace_file(file,lambda path: df.to_csv(path,index=False,compression=compression))
+
+def _write_zip(df: pd.DataFrame,path: str,name: str) -> None :
+    # pandas buffers a zip member in memory, write the member as a stream instead
+    with zipfile.ZipFile(path,'w',zipfile.ZIP_DEFLATED) as archive:
+        with archive.open(name,'w',force_zip64=True) as member:
+            with io.TextIOWrapper(member,encoding='utf-8',newline='') as handle:
+                df.to_csv(handle,index=False)
+
+class folderLock:
+    '''
+    Exclusive lock on the preprocessing of a date folder.
+
+    The lock is an flock on ``preprocess.lock`` in the folder, held from reading
+    the preprocess log until it is updated. A run finding the folder locked waits
+    for the other run to finish and then reads its log, so steps done meanwhile
+    are not repeated. The OS releases the lock if the holding process dies.
+    Without fcntl (Windows) folders are not locked.
+
+    Parameters
+    ----------
+    folder : date folder of the cm files.
+    '''
+    def __init__(self,folder: str):
+        self.folder = folder
+        self.file = None
+
+    def __enter__(self):
+        self.file = open(self.folder+'/preprocess.lock','a')
+        if fcntl is not None:
+            try:
+                fcntl.flock(self.file,fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                print(f"  Waiting for the preprocessing of {self.folder} by another run")
+                fcntl.flock(self.file,fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self,*args):
+        if fcntl is not None:
+            fcntl.flock(self.file,fcntl.LOCK_UN)
+        self.file.close()
+        self.file = None
+
+def file_names(steps: list,file_type: str = 'csv') -> dict :
+    '''
+    Return {MO : file name} of the files read or written by ``steps``.
+    '''
+    names = {}
+    for step in steps:
+        names.setdefault(step.output,f'{step.output}.{step.file_type or file_type}')
+    for step in steps:
+        for mo in step.inputs:
+            names.setdefault(mo,f'{mo}.{file_type}')
+    return names
+
+def run_steps(
+        folder: str,
+        steps: list,
+        file_type: str = 'csv',
+        manifest: Optional['preprocessManifest'] = None
+) -> list :
+    '''
+    Run ``steps`` in order on the cm files of ``folder``.
+
+    A file is read once, when a step first needs it, and written once, after the
+    last step using it, at which point it is released. A step is not run if the
+    ``manifest`` records it as applied to the current output file or, when the
+    manifest has no entry for the file, if ``done`` finds it applied from the
+    header. A step failing or missing an input is reported and skipped, the other
+    steps still run.
+
+    Returns the steps applied, or already applied, whose output file is saved.
+    '''
+    frames = {}
+    names = file_names(steps,file_type)
+    changed = set()
+    applied = {}
+    completed = []
+
+    last_use = {}
+    for k,step in enumerate(steps):
+        for mo in step.inputs+[step.output]:
+            last_use[mo] = k
+
+    def cm_file(mo):
+        return f'{folder}/{names[mo]}'
+
+    for k,step in enumerate(steps):
+        if (manifest is not None) and (manifest.entry(names[step.output]) is not None):
+            is_done = manifest.applied(step,names[step.output],
+                                       {mo : names[mo] for mo in step.inputs if mo != step.output})
+        elif step.done is None:
+            is_done = False
+        elif step.output in frames:
+            is_done = step.done(list(frames[step.output].columns))
+        else:
+            is_done = step.done(read_header(cm_file(step.output)))
+
+        if is_done:
+            print(f"   {names[step.output]} is up to date for {step.key}")
+            completed.append(step)
+        else:
+            try:
+                for mo in step.inputs:
+                    if mo not in frames:
+                        frames[mo] = pd.read_csv(cm_file(mo),index_col=None,low_memory=False)
+                print(f"  {step.description} in {cm_file(step.output)}")
+                df = step.transform(frames)
+                if df is not frames.get(step.output):
+                    frames[step.output] = df
+                    changed.add(step.output)
+                applied.setdefault(step.output,[]).append(step)
+            except Exception as e:
+                print(e)
+
+        for mo in [mo for mo in frames if last_use[mo] == k]:
+            df = frames.pop(mo)
+            if mo not in changed:
+                completed += applied.pop(mo,[])
+                continue
+            try:
+                write_cm(df,cm_file(mo))
+                completed += applied.pop(mo)
+                print(f"   Saved {cm_file(mo)}")
+            except Exception as e:
+                print(e)
+
+    return completed
+
+def file_hash(file: str) -> str :
+    '''
+    Return the sha1 of the content of ``file``.
+    '''
+    digest = hashlib.sha1()
+    with open(file,'rb') as content:
+        for block in iter(lambda: content.read(1<<20),b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+class preprocessManifest:
+    '''
+    Manifest of the preprocessing of a date folder, ``preprocess_manifest.json``.
+
+    For every cm file preprocessed the manifest records the fingerprint (size,
+    modification time and sha1) of the file as dropped by the decoder, of the
+    file as written by the preprocessing, and per step applied to it the version
+    of the step and the fingerprint of the other files it read. The sha1 of the
+    file as dropped by the decoder is only known if the run left it unchanged.
+
+    A step is applied to the current file if the file still has the recorded
+    output fingerprint, the step version is unchanged and the files it read are
+    unchanged. Size and modification time are compared to the recorded
+    fingerprint first: a file is only hashed when its size matches and its
+    modification time does not, so checking the manifest does not read the cm
+    files. Files written by a run are hashed when the run is recorded.
+    A file replaced by the decoder no longer matches its entry, every step is run
+    on it again.
+
+    Parameters
+    ----------
+    folder : date folder of the cm files.
+    '''
+    def __init__(self,folder: str):
+        self.folder = folder
+        self.files = {}
+        if os.path.exists(self.path):
+            with open(self.path,'r') as file:
+                self.files = json.load(file)['files']
+
+    @property
+    def path(self) -> str :
+        return self.folder+'/'+MANIFEST_FILE
+
+    def fingerprint(self,name: str,recorded: Optional[dict] = None) -> Optional[dict] :
+        '''
+        Return the current fingerprint of the file ``name`` of the folder, None if it does not exist.
+
+        ``recorded`` is the fingerprint the file is compared to, the output fingerprint of its
+        entry if not specified. It is returned as is when size and modification time match.
+        The sha1 is None when the file differs from ``recorded`` without hashing it.
+        '''
+        file = self.folder+'/'+name
+        try:
+            stat = os.stat(file)
+        except OSError:
+            return None
+
+        if recorded is None:
+            recorded = self.files.get(name,{}).get('output')
+        if recorded is None:
+            return {'size' : stat.st_size, 'mtime_ns' : stat.st_mtime_ns, 'sha1' : None}
+        if (recorded.get('size') == stat.st_size) and (recorded.get('mtime_ns') == stat.st_mtime_ns):
+            return recorded
+
+        sha1 = None
+        if recorded.get('size',stat.st_size) == stat.st_size:
+            # same size, the content may be unchanged, e.g. the file was copied
+            sha1 = file_hash(file)
+        return {'size' : stat.st_size, 'mtime_ns' : stat.st_mtime_ns, 'sha1' : sha1}
+
+    def hashed(self,name: str,fingerprint: Optional[dict]) -> Optional[dict] :
+        '''
+        Return ``fingerprint`` of the file ``name`` with its sha1, the file is hashed if it is not known.
+        '''
+        if (fingerprint is None) or (fingerprint['sha1'] is not None):
+            return fingerprint
+        return dict(fingerprint,sha1=file_hash(self.folder+'/'+name))
+
+    def entry(self,name: str) -> Optional[dict] :
+        '''
+        Return the entry of the file ``name`` if it is still the file written by the preprocessing.
+        '''
+        entry = self.files.get(name)
+        if entry is None:
+            return None
+        fingerprint = self.fingerprint(name)
+        if (fingerprint is None) or (fingerprint['sha1'] != entry['output']['sha1']):
+            return None
+        return entry
+
+    def applied(self,step: preprocessStep,name: str,input_names: dict) -> bool :
+        '''
+        Return ``True`` if ``step`` is recorded as applied to the file ``name`` and the
+        files it read, {MO : file name} ``input_names``, are unchanged since.
+        '''
+        entry = self.entry(name)
+        record = None if entry is None else entry['steps'].get(step.key)
+        if (record is None) or (record['version'] != step.version):
+            return False
+        for mo,input_name in input_names.items():
+            recorded = self.recorded_input(record,mo)
+            if recorded is None:
+                return False
+            fingerprint = self.fingerprint(input_name,recorded)
+            if (fingerprint is None) or (fingerprint['sha1'] != recorded['sha1']):
+                return False
+        return True
+
+    def recorded_input(self,record: dict,mo: str) -> Optional[dict] :
+        '''
+        Return the fingerprint of the file of ``mo`` read by the step ``record``, None if not recorded.
+        '''
+        recorded = record['inputs'].get(mo)
+        if isinstance(recorded,str):
+            # manifests written before the input size and modification time were recorded
+            return {'sha1' : recorded}
+        return recorded
+
+    def up_to_date(self,steps: list,names: dict) -> bool :
+        '''
+        Return ``True`` if all ``steps`` are applied, ``names`` maps their MOs to file names.
+        '''
+        return all(self.applied(step,names[step.output],{mo : names[mo] for mo in step.inputs if mo != step.output})
+                   for step in steps)
+
+    def record(self,steps: list,names: dict,before: dict) -> None :
+        '''
+        Record ``steps`` as applied. ``names`` maps the MOs of the steps to their file
+        names and ``before`` the file names to their fingerprint before the run.
+        '''
+        outputs = set(names[step.output] for step in steps)
+        after = {name : self.hashed(name,self.fingerprint(name)) for name in outputs}
+        for name in outputs:
+            if after[name] is None:
+                continue
+            entry = self.files.get(name)
+            if (entry is None) or (before.get(name) is None) or (before[name]['sha1'] != entry['output']['sha1']):
+                # new file, or dropped again by the decoder
+                input_fingerprint = before.get(name) or after[name]
+                if (input_fingerprint['size'],input_fingerprint['mtime_ns']) == (after[name]['size'],after[name]['mtime_ns']):
+                    input_fingerprint = after[name]
+                self.files[name] = {'input' : input_fingerprint, 'steps' : {}}
+            self.files[name]['output'] = after[name]
+
+        for step in steps:
+            entry = self.files.get(names[step.output])
+            if entry is None:
+                continue
+            previous = entry['steps'].get(step.key,{'inputs' : {}})
+            inputs = {}
+            for mo in step.inputs:
+                if mo == step.output:
+                    continue
+                fingerprint = after.get(names[mo]) or self.fingerprint(names[mo],self.recorded_input(previous,mo))
+                if fingerprint is not None:
+                    inputs[mo] = self.hashed(names[mo],fingerprint)
+            entry['steps'][step.key] = {
+                'version' : step.version,
+                'inputs'  : inputs
+            }
+
+    def save(self) -> None :
+        def write(path):
+            with open(path,'w') as file:
+                json.dump({'files' : self.files}, file, indent=4)
+
+        replace_file(self.path,write)
+
+def split_steps(steps: list) -> list :
+    '''
+    Split ``steps`` into groups of steps sharing no file. A group keeps the order
+    of its steps, groups are independent and can run concurrently.
+    '''
+    groups = []
+    for k,step in enumerate(steps):
+        files = set(step.inputs+[step.output])
+        joined = [group for group in groups if group[0] & files]
+        merged = (files.union(*[group[0] for group in joined]),
+                  sorted([k]+[i for group in joined for i in group[1]]))
+        groups = [group for group in groups if group not in joined]+[merged]
+
+    return [[steps[i] for i in group[1]] for group in sorted(groups,key=lambda group: group[1][0])]
+
+def _run_group(folder: str,steps: list,file_type: str,manifest: preprocessManifest) -> list :
+    '''
+    Run ``steps`` in a preprocessing worker, return the positions of the completed steps.
+    '''
+    completed = run_steps(folder,steps,file_type,manifest)
+    return [k for k,step in enumerate(steps) if step in completed]
 
 class cmPreProcessor():
+    '''
+    Preprocessor of the decoded cm files of a date.
+
+    Parameters
+    ----------
+    cm_folder   : folder of the decoded cm.
+    s_date      : date folder to preprocess.
+    sub_folders : ENM subfolders of ``cm_folder``, default [''].
+    workers     : number of processes preprocessing concurrently, default None.
+                  Subfolders, and groups of steps sharing no file within a subfolder,
+                  are run on a pool of processes. If not specified, or 1, they are run
+                  in this process.
+    '''
     def __init__(
             self,
             cm_folder: str,
             s_date: str,
-            sub_folders: Optional[list] = ['']
+            sub_folders: Optional[list] = [''],
+            workers: Optional[int] = None
     ):
         self.cm_folder = cm_folder
         self.sub_folders = sub_folders
         self.date = s_date
+        self.workers = workers
+
+    def plan(
+            self,
+            define_site_type: bool = True,
+            drop_featurestate_duplicate: bool = True,
+            handle_sectorCarrier: bool = True,
+            create_logicalchannelvalue: Optional[list] = [],
+            handle_preproc: Optional[list] = [],
+            merge_fdd_tdd: bool = False
+    ) -> list :
+        '''
+        Return the preprocessing steps requested, in order.
+        '''
+        steps = []
+        if define_site_type:
+            steps += [site_type_step('EUtranCellFDD'),site_type_step('EUtranCellTDD')]
+        if drop_featurestate_duplicate:
+            steps.append(featurestate_step())
+        if handle_sectorCarrier:
+            steps.append(sectorcarrier_step())
+        steps += [logicalchannel_step(mo) for mo in create_logicalchannelvalue]
+        steps += [preproc_step(mo) for mo in handle_preproc]
+        if merge_fdd_tdd:
+            steps.append(merge_fdd_tdd_step())
+
+        return steps
 
     def run(
             self,
@@ -22,11 +586,19 @@ class cmPreProcessor():
             handle_sectorCarrier: bool = True,
             create_logicalchannelvalue: Optional[list] = [],
             handle_preproc: Optional[list] = [],
-            file_type: str = 'csv'
+            file_type: str = 'csv',
+            merge_fdd_tdd: bool = False
     )-> None:
         '''
         Run preprocessing functions as specified in parameters.
 
+        The steps of a subfolder are run together by ``run_steps``: each cm file
+        is read once, every step on it is applied in memory and it is written once.
+        The steps applied to each file are recorded in the manifest of the date
+        folder, see ``preprocessManifest``, and are run again only when the file or
+        the step changed. The date folders are locked while they are preprocessed,
+        see ``folderLock``.
+
         Paramters
         ---------
         define_site_type : bool, default True
@@ -34,7 +606,7 @@ class cmPreProcessor():
 
         drop_featurestate_duplicate : bool, default True
             If ``True`` run method drop_featurestate_duplicate()
-        
+
         handle_sectorCarrier : bool, default True
             If ``True`` run method handle_sectorCarrier()
 
@@ -43,82 +615,72 @@ class cmPreProcessor():
 
         handle_preproc : ['MO1','MO2'] list of mo to process, default empty list
             If not empty run method handle_preproc() for all MO listed
-        
+
+        merge_fdd_tdd : bool, default False
+            If ``True`` run method merge_fdd_tdd()
+
         Returns
         -------
         None
             No object return from this function as this is just an
             interface to run the preprocessor functions
         '''
-        for subfolder in self.sub_folders:
-            file_path = self.cm_folder+'/'+subfolder+'/'+self.date
-            
-            log_file = file_path+'/preprocess.json'
-            if not os.path.exists(log_file):
-                initial_log = {'define_site_type' : 0,
-                               'drop_featurestate_duplicate' : 0,
-                               'handle_sectorCarrier' : 0,
-                               'create_logicalchannelvalue' : [],
-                               'handle_preproc' : []}
-                
-                with open(log_file,'w') as file:
-                    json.dump(initial_log, file, indent=4)
-                print(f'Initial preprocess log for {subfolder} created.')
-            
-            with open(log_file, 'r') as file:
-                preprocess_log = json.load(file)
-                print(f"Loading preprocess log {subfolder}.")
-            
-            try:
-                if define_site_type and (preprocess_log['define_site_type'] == 0):
-                    print(f"  Defining site type in {file_path}")
-                    self.define_site_type(file_path,file_type)
-                    preprocess_log['define_site_type'] = 1
-            except Exception as e:
-                print(e)
-            
-            try:    
-                if drop_featurestate_duplicate and (preprocess_log['drop_featurestate_duplicate'] == 0):
-                    print(f"  Dropping featureState duplicates in {file_path}")
-                    self.drop_featurestate_duplicate(file_path,file_type)
-                    preprocess_log['drop_featurestate_duplicate'] = 1
-            except Exception as e:
-                print(e)
-                
-            try:
-                if handle_sectorCarrier and (preprocess_log['handle_sectorCarrier'] == 0):
-                    print(f"  Modifying sectorCarrier in {file_path}")
-                    self.handle_sectorCarrier(file_path,file_type)
-                    preprocess_log['handle_sectorCarrier'] = 1
-            except Exception as e:
-                print(e)
-            
-            try:
-                if len(create_logicalchannelvalue)>0:
-                    print(f"  Creating logical channel in {file_path} for")
-                    for mo in create_logicalchannelvalue:
-                        print(f"   {mo}")
-                        if mo not in preprocess_log['create_logicalchannelvalue']:
-                            self.create_logicalchannelvalue(file_path,mo,file_type)
-                            preprocess_log['create_logicalchannelvalue'].append(mo)
-            except Exception as e:
-                print(e)
-            
-            try:
-                if len(handle_preproc)>0:
-                    print(f"  Handling preprocess in {file_path}")
-                    for mo in handle_preproc:
-                        if mo not in preprocess_log['handle_preproc']:
-                            self.handle_preproc(file_path,mo,file_type)
-                            preprocess_log['handle_preproc'].append(mo)
-            except Exception as e:
-                print(e)
-            
-            with open(log_file, 'w') as file:
-                json.dump(preprocess_log, file, indent=4)
-                print("Preprocess log updated.")
-             
-            print("\n")
+        folders = OrderedDict((subfolder,self.cm_folder+'/'+subfolder+'/'+self.date) for subfolder in self.sub_folders)
+
+        # folders are locked in a fixed order, concurrent runs cannot deadlock
+        with ExitStack() as locks:
+            for file_path in sorted(set(folders.values())):
+                locks.enter_context(folderLock(file_path))
+
+            steps = self.plan(
+                define_site_type=define_site_type,
+                drop_featurestate_duplicate=drop_featurestate_duplicate,
+                handle_sectorCarrier=handle_sectorCarrier,
+                create_logicalchannelvalue=create_logicalchannelvalue,
+                handle_preproc=handle_preproc,
+                merge_fdd_tdd=merge_fdd_tdd
+            )
+            names = file_names(steps,file_type)
+
+            manifests = {}
+            before = {}
+            for subfolder,file_path in folders.items():
+                manifests[subfolder] = preprocessManifest(file_path)
+                print(f"Loading preprocess manifest {subfolder}.")
+                before[subfolder] = {name : manifests[subfolder].fingerprint(name) for name in names.values()}
+
+            units = []
+            completed = {subfolder : [] for subfolder in folders}
+            for subfolder in folders:
+                missing = [name for name,fingerprint in before[subfolder].items() if fingerprint is None]
+                if len(missing)>0:
+                    print(f"  {', '.join(sorted(missing))} not found in {subfolder}.")
+                available = [step for step in steps if all(names[mo] not in missing for mo in step.inputs)]
+
+                for group in split_steps(available):
+                    if manifests[subfolder].up_to_date(group,names):
+                        completed[subfolder] += group
+                    else:
+                        units.append((subfolder,group))
+                if len(completed[subfolder]) == len(available):
+                    print(f"  {subfolder} is up to date.")
+
+            if (self.workers is None) or (self.workers <= 1) or (len(units) <= 1):
+                for subfolder,group in units:
+                    completed[subfolder] += run_steps(folders[subfolder],group,file_type,manifests[subfolder])
+            else:
+                with ProcessPoolExecutor(max_workers=self.workers) as executor:
+                    futures = [executor.submit(_run_group,folders[subfolder],group,file_type,manifests[subfolder])
+                               for subfolder,group in units]
+                    for (subfolder,group),future in zip(units,futures):
+                        completed[subfolder] += [group[k] for k in future.result()]
+
+            for subfolder in folders:
+                manifests[subfolder].record(completed[subfolder],names,before[subfolder])
+                manifests[subfolder].save()
+                print(f"Preprocess manifest {subfolder} updated.")
+
+        print("\n")
 
         return None
 
@@ -131,23 +693,7 @@ class cmPreProcessor():
         input : folder
         output : EUtranCellFDD and EUtranCellTDD MO CM file updated with site type
         '''
-        df_fdd = pd.read_csv(folder+f'/EUtranCellFDD.{file_type}',index_col=None)
-        df_tdd = pd.read_csv(folder+f'/EUtranCellTDD.{file_type}',index_col=None) 
-
-        df_fdd['SiteType'] = df_fdd['eutrancellfddid'].str[6]
-        df_tdd['SiteType'] = df_tdd['eutrancelltddid'].str[6]
-
-        df_fdd.loc[df_fdd['SiteType']!='I','SiteType'] = 'M'
-        df_tdd.loc[df_tdd['SiteType']!='I','SiteType'] = 'M'
-
-        df_fdd.to_csv(folder+'/EUtranCellFDD.csv',index=None)
-        df_tdd.to_csv(folder+'/EUtranCellTDD.csv',index=None)
-
-        if file_type=='zip':
-            self.__save_in_zip(folder+f'/EUtranCellFDD.{file_type}')
-            self.__save_in_zip(folder+f'/EUtranCellTDD.{file_type}')
-        
-        print("   Done")
+        run_steps(folder,[site_type_step('EUtranCellFDD'),site_type_step('EUtranCellTDD')],file_type)
 
     def drop_featurestate_duplicate(self,folder,file_type="csv"):
         '''
@@ -156,112 +702,16 @@ class cmPreProcessor():
         input : folder
         output : Featurestate MO CM with unique mecontext and featurestateid.
         '''
-        df = pd.read_csv(folder+f'/FeatureState.{file_type}',index_col=None)
-        df = df.sort_values(by='featureState',ascending=False)
-        df = df.drop_duplicates(subset=['mecontext','featurestateid'],keep='first')
-
-        df.to_csv(folder+'/FeatureState.csv',index=None)
-
-        if file_type=='zip':
-            self.__save_in_zip(folder+f'/FeatureState.{file_type}')
-
-        print("   Done")
+        run_steps(folder,[featurestate_step()],file_type)
 
     def handle_sectorCarrier(self,folder,file_type="csv"):
-        sectorCarrier_file = '%s/SectorCarrier.%s' %(folder,file_type)
-        eutrancelllFDD_file = '%s/EUtranCellFDD.%s' %(folder,file_type)
-        eutrancelllTDD_file = '%s/EUtranCellTDD.%s' %(folder,file_type)
-
-        df_sectorCarrier = pd.read_csv(sectorCarrier_file, delimiter=",", index_col=None, header='infer',low_memory=False, nrows=1)
-
-        if ('eutrancellfddid' in df_sectorCarrier.columns) and ('eutrancelltddid' in df_sectorCarrier.columns):
-            print('   Cell has been added to sectorCarrier')
-        elif ('eutrancellfddid' not in df_sectorCarrier.columns) or ('eutrancelltddid' not in df_sectorCarrier.columns):
-            print('Modifying %s' %sectorCarrier_file)
-            df_fdd = pd.read_csv(eutrancelllFDD_file, delimiter=",", index_col=None, header='infer',low_memory=False)
-            df_tdd = pd.read_csv(eutrancelllTDD_file, delimiter=",", index_col=None, header='infer',low_memory=False)
-            df_sectorCarrier = pd.read_csv(sectorCarrier_file, delimiter=",", index_col=None, header='infer',low_memory=False)
-
-            df_fdd = df_fdd[['mecontext', 'eutrancellfddid', 'sectorCarrierRef']]
-            df_tdd = df_tdd[['mecontext', 'eutrancelltddid', 'sectorCarrierRef']]
-
-            #df_fdd = df_fdd.rename(columns={'eutrancellfddid': 'eutrancellid'})
-            #df_tdd = df_tdd.rename(columns={'eutrancelltddid': 'eutrancellid'})
-            
-            #df_cell = pd.concat([df_fdd,df_tdd], axis=0, ignore_index=True, sort=False)
-            #df_cell['vsDataSectorCarrier'] = df_cell['sectorCarrierRef'].str.split('=').str[-1]
-            #df_cell['mapping'] = df_cell['mecontext'].astype('str') + df_cell['vsDataSectorCarrier'].astype('str')
-            
-            df_fdd['vsDataSectorCarrier'] = df_fdd['sectorCarrierRef'].str.split('=').str[-1]
-            df_fdd['mapping'] = df_fdd['mecontext'].astype('str') + df_fdd['vsDataSectorCarrier'].astype('str')
-            
-            df_tdd['vsDataSectorCarrier'] = df_tdd['sectorCarrierRef'].str.split('=').str[-1]
-            df_tdd['mapping'] = df_tdd['mecontext'].astype('str') + df_tdd['vsDataSectorCarrier'].astype('str')
-
-            #df_sectorCarrier = df_sectorCarrier[['mecontext', 'sectorcarrierid']]
-            df_sectorCarrier['mapping'] = df_sectorCarrier['mecontext'].astype('str') + df_sectorCarrier['sectorcarrierid'].astype('str')
-
-            dict_fdd = df_fdd.set_index('mapping').to_dict()['eutrancellfddid']
-            dict_tdd = df_tdd.set_index('mapping').to_dict()['eutrancelltddid']
-            
-            df_sectorCarrier['eutrancellfddid'] = df_sectorCarrier['mapping'].map(dict_fdd)
-            df_sectorCarrier['eutrancelltddid'] = df_sectorCarrier['mapping'].map(dict_tdd)
-
-            df_sectorCarrier.to_csv(sectorCarrier_file.replace('.zip','.csv'), index=False)
-
-            if file_type=='zip':
-                self.__save_in_zip(sectorCarrier_file)
-
-            print('   Done')
+        run_steps(folder,[sectorcarrier_step()],file_type)
 
     def handle_preproc(self,folder, mo, file_type="csv"):
-        file = f'{folder}/{mo}.{file_type}'
-
-        df = pd.read_csv(file, delimiter=",", index_col=None, header='infer',low_memory=False, nrows=1)
-
-        if 'modified' in df.columns:
-            print('   %s has been modified' %mo)
-        elif 'modified' not in df.columns:
-            df = pd.read_csv(file, delimiter=",", index_col=None, header='infer',low_memory=False)
-            if mo == 'QciProfilePredefined': 
-                df['drxProfileRef'] = df['drxProfileRef'].str.split('=').str[-1]
-                df['logicalChannelGroupRefValue'] = df['logicalChannelGroupRef'].str[-1]
-                df['modified'] = 1
-            elif mo == 'QciProfileOperatorDefined':
-                df['drxProfileRef'] = df['drxProfileRef'].str.extract(r'DataDrxProfile=([^,\s]+)')
-                df['logicalChannelGroupRefValue'] = df['logicalChannelGroupRef'].str[-1]
-                df['modified'] = 1
-            elif mo == 'ReportConfigSearch': 
-                df['qcia1a2throffsets_qciprofilerefValue'] = df['qciA1A2ThrOffsets_qciProfileRef'].str.split('=').str[-1]
-                df['modified'] = 1
-            elif mo == 'SubscriberGroupProfile': 
-                df['preschedProfileRef'] = df['preschedProfileRef'].str.split('=').str[-1]
-                df['modified'] = 1
-            elif mo == 'RlfProfile': 
-                df['reservedBy_ori'] = df['reservedBy']
-                df['reservedBy'] = df['reservedBy'].str.extract(r'QciProfilePredefined=([^,\s]+)')
-                df['modified'] = 1
-
-            df.to_csv(file.replace('.zip','.csv'), index=False)
-
-            if file_type=='zip':
-                self.__save_in_zip(file)
-            
-            print('   Done')
+        run_steps(folder,[preproc_step(mo)],file_type)
 
     def create_logicalchannelvalue(self,folder,mo, file_type="csv"):
-        file = f'{folder}/{mo}.{file_type}'
-        df = pd.read_csv(file,index_col=None)
-    
-        df['logicalChannelGroupRefValue'] = df['logicalChannelGroupRef'].str[-1]
-
-        if len(df)>1:
-            df.to_csv(file.replace('.zip','.csv'), index=False)
-
-        if file_type=='zip':
-            self.__save_in_zip(file)
-
-        print('   Done')
+        run_steps(folder,[logicalchannel_step(mo)],file_type)
 
     def merge_fdd_tdd(self,folder,file_type="csv"):
         '''
@@ -270,36 +720,4 @@ class cmPreProcessor():
         input : folder
         output : EUtranCellFDD_TDD.csv file in the specified folder.
         '''
-        print('Checking EUtranCellFDD_TDD...')
-        if 'EUtranCellFDD_TDD.csv' not in os.listdir(folder) :
-            print('     Merging EUtranCellFDD and TDD at %s'%folder)
-            
-            df_fdd = pd.read_csv(folder+'/EUtranCellFDD.csv',index_col=None)
-            df_tdd = pd.read_csv(folder+'/EUtranCellTDD.csv',index_col=None)
-
-            df_fdd = df_fdd.rename(columns={'eutrancellfddid':'eutrancellid'})
-            df_tdd = df_tdd.rename(columns={'eutrancelltddid':'eutrancellid'})
-
-            df_merge = pd.concat([df_fdd,df_tdd],ignore_index=True)
-
-            df_merge.loc[pd.isnull(df_merge['dlChannelBandwidth']),'dlChannelBandwidth'] = df_merge['channelBandwidth']     
-            #df_merge[['dlChannelBandwidth','channelBandwidth']]
-
-            df_merge.loc[df_merge['eutrancellid'].str[7]=='L','dlChannelBandwidth'] = 17700
-
-            df_merge.to_csv(folder+'/EUtranCellFDD_TDD.csv',index=None)
-            print('     Done.')
-        else:
-            print('     EUtranCellFDD_TDD.csv exist at %s'%folder)
-    
-    def __save_in_zip(self,file):
-        #hapus current zip
-        os.remove(file)
-
-        csv_file = file.replace('.zip','.csv')
-        
-        # Create a new zip file and add the modified CSV file to it
-        with zipfile.ZipFile(file, 'w') as new_zip_file:
-            new_zip_file.write(csv_file,os.path.basename(csv_file))
-
-
+        run_steps(folder,[merge_fdd_tdd_step()],file_type)
@@ -0,0 +1,243 @@
+import os
+import pandas as pd
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.formatting.rule import FormulaRule
+from openpyxl.styles import PatternFill, Alignment, Border, Side, Font
+from openpyxl.styles.colors import Color
+from openpyxl.utils import get_column_letter
+from openpyxl.utils.dataframe import dataframe_to_rows
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+THIN = Side(border_style='thin',color="000000")
+HEADER_BORDER = Border(left=THIN,right=THIN,top=THIN,bottom=THIN)
+BODY_BORDER = Border(left=THIN,right=THIN)
+
+SUMMARY_COLUMNS = ['mecontext','MO Class','MO','Parameter','Value','Recommended Setting','Status']
+SUMMARY_FORMATS = ['.csv','.parquet','.xlsx']
+SUMMARY_CHUNK_ROWS = 100000
+
+# data rows of an excel sheet, the first row is the header
+EXCEL_MAX_ROWS = 1048575
+
+def indexed_fill(color_index: int) -> PatternFill :
+    return PatternFill(patternType='solid', fgColor=Color(indexed=color_index))
+
+class verboseReportWriter:
+    '''
+    Streaming writer of the verbose report workbook.
+
+    The workbook is opened in openpyxl write-only mode: every sheet is written
+    row by row to a temporary file and its cells are not kept once written.
+    Only the two header rows of the indicator sheets and the first columns of
+    the Summary sheet are styled cell by cell, the borders of the data rows are
+    a conditional format over the data range.
+
+    The Summary sheet is the first sheet of the workbook, it is written last by
+    ``write_summary`` once the indicators are counted.
+
+    Parameters
+    ----------
+    file_path : path of the xlsx report.
+    '''
+    def __init__(self,file_path: str):
+        self.file_path = file_path
+        self.wb = Workbook(write_only=True)
+        self.summary = self.wb.create_sheet('Summary')
+
+    def cell(self,ws,value=None,fill=None,alignment=None,border=None,font=None) -> WriteOnlyCell :
+        cell = WriteOnlyCell(ws,value=value)
+        if fill is not None:
+            cell.fill = fill
+        if alignment is not None:
+            cell.alignment = alignment
+        if border is not None:
+            cell.border = border
+        if font is not None:
+            cell.font = font
+        return cell
+
+    def write_indicator(
+            self,
+            title: str,
+            df: pd.DataFrame,
+            groups: list,
+            overall_fill: PatternFill
+    ) -> None :
+        '''
+        Write the indicator sheet ``title``.
+
+        ``df`` columns are the id columns, the value, _ref and _check columns of the
+        parameters of each group, the check column of each group and the overall check.
+        ``groups`` lists (group name, fill, number of parameter columns) in column order.
+
+        Row 1 (hidden) has the group names merged over the columns of their parameters
+        and "Overall Check" merged over the group checks. Row 2 is the header, colored
+        by group, where the overall check column is titled "Summary". Data starts at row 3.
+        '''
+        ws = self.wb.create_sheet(title)
+        n_columns = df.shape[1]
+        # id columns, parameter columns, one check column per group and the overall check
+        first_check = n_columns - len(groups) - 1
+        first_param = first_check - sum(count for group,fill,count in groups)
+
+        # sheet properties are written with the first row
+        ws.row_dimensions[1].hidden = True
+        ws.freeze_panes = 'E3'
+        ws.sheet_view.zoomScale = 75
+
+        top = [self.cell(ws,border=HEADER_BORDER) for col in range(n_columns)]
+        header = [self.cell(ws,value=col,border=HEADER_BORDER) for col in df.columns]
+        for col in range(first_param):
+            header[col].alignment = Alignment(horizontal='center', vertical='center')
+
+        start = first_param
+        for k,(group,fill,count) in enumerate(groups):
+            top[start] = self.cell(ws,group,fill,Alignment(horizontal="center",vertical='center'),HEADER_BORDER)
+            ws.merged_cells.add('%s1:%s1'%(get_column_letter(start+1),get_column_letter(start+max(count,1))))
+            for col in list(range(start,start+count))+[first_check+k]:
+                header[col].fill = fill
+                header[col].alignment = Alignment(textRotation=45,horizontal="center")
+            start += count
+
+        top[first_check] = self.cell(ws,'Overall Check',overall_fill,Alignment(horizontal="center",vertical="center"),HEADER_BORDER)
+        ws.merged_cells.add('%s1:%s1'%(get_column_letter(first_check+1),get_column_letter(first_check+max(len(groups),1))))
+        header[-1] = self.cell(ws,'Summary',indexed_fill(52),Alignment(textRotation=45,horizontal="center"),HEADER_BORDER)
+
+        ws.append(top)
+        ws.append(header)
+        for r in dataframe_to_rows(df,index=None,header=False):
+            ws.append(r)
+
+        if len(df)>0:
+            data_range = 'A3:%s%s'%(get_column_letter(n_columns),len(df)+2)
+            ws.conditional_formatting.add(data_range,FormulaRule(formula=['TRUE'],border=BODY_BORDER))
+
+    def write_table(self,title: str,df: pd.DataFrame) -> None :
+        '''
+        Write ``df`` with its header as sheet ``title``.
+        '''
+        ws = self.wb.create_sheet(title=title)
+        for r in dataframe_to_rows(df,index=None,header=True):
+            ws.append(r)
+
+    def write_summary(
+            self,
+            df_summary: pd.DataFrame,
+            summary_index: list,
+            group_summary_index: list
+    ) -> None :
+        '''
+        Write the Summary sheet. The first 4 columns of the rows ``summary_index`` are
+        colored as indicators and of the rows ``group_summary_index`` as groups.
+        '''
+        ws = self.summary
+        header_color = indexed_fill(32)
+        summary_color = indexed_fill(48)
+        mo_color = indexed_fill(44)
+
+        rows = dataframe_to_rows(df_summary,index=None,header=True)
+        last_row = max([len(df_summary)+1]+list(summary_index)+list(group_summary_index))
+        for i in range(1,last_row+1):
+            values = list(next(rows,[]))
+            values += [None]*(4-len(values))
+            fill = None
+            if i == 1:
+                fill = header_color
+            if i in summary_index:
+                fill = summary_color
+            if i in group_summary_index:
+                fill = mo_color
+            if fill is not None:
+                for col in range(4):
+                    values[col] = self.cell(ws,values[col],fill,font=Font(color=Color(indexed=1)) if i == 1 else None)
+            ws.append(values)
+
+    def save(self) -> None :
+        self.wb.save(self.file_path)
+
+class summaryWriter:
+    '''
+    Streaming writer of the simple summary, the long table of SUMMARY_COLUMNS.
+
+    The format is chosen by the extension of ``file_path``:
+
+    - .csv     : the header then each chunk appended to the file.
+    - .parquet : each chunk a row group, Value and Recommended Setting as strings
+                 since a parameter column mixes numbers and text. Needs pyarrow.
+    - .xlsx    : write-only workbook, continued on a new sheet every EXCEL_MAX_ROWS rows.
+
+    Parameters
+    ----------
+    file_path : path of the summary file.
+    '''
+    def __init__(self,file_path: str):
+        self.file_path = file_path
+        self.format = os.path.splitext(file_path)[1].lower()
+        if self.format not in SUMMARY_FORMATS:
+            raise ValueError(f"Unrecognized summary format {file_path}, use one of {SUMMARY_FORMATS}")
+        if (self.format == '.parquet') and (pq is None):
+            raise ImportError("pyarrow is required to write the summary as parquet")
+
+        self.rows = 0
+        self.writer = None
+        if self.format == '.csv':
+            pd.DataFrame(columns=SUMMARY_COLUMNS).to_csv(file_path,index=False)
+        elif self.format == '.xlsx':
+            self.wb = Workbook(write_only=True)
+            self.ws = None
+
+    def __excel_sheet(self):
+        ws = self.wb.create_sheet('Sheet%s'%(len(self.wb.worksheets)+1))
+        font = Font(bold=True)
+        alignment = Alignment(horizontal='center',vertical='top')
+        header = []
+        for col in SUMMARY_COLUMNS:
+            cell = WriteOnlyCell(ws,value=col)
+            cell.font = font
+            cell.border = HEADER_BORDER
+            cell.alignment = alignment
+            header.append(cell)
+        ws.append(header)
+        return ws
+
+    def write(self,df: pd.DataFrame) -> None :
+        '''
+        Append the rows of ``df``, a chunk of the summary with SUMMARY_COLUMNS.
+        '''
+        if self.format == '.csv':
+            df.to_csv(self.file_path,mode='a',header=False,index=False)
+        elif self.format == '.parquet':
+            df = df.astype(object).where(pd.notnull(df),None)
+            for col in ['Value','Recommended Setting']:
+                df[col] = [None if value is None else str(value) for value in df[col]]
+            table = pa.Table.from_pandas(df,schema=pa.schema([(col,pa.string()) for col in SUMMARY_COLUMNS]),preserve_index=False)
+            if self.writer is None:
+                self.writer = pq.ParquetWriter(self.file_path,table.schema)
+            self.writer.write_table(table)
+        else:
+            df = df.astype(object).where(pd.notnull(df),None)
+            for row in df.itertuples(index=False,name=None):
+                if (self.ws is None) or (self.rows % EXCEL_MAX_ROWS == 0):
+                    self.ws = self.__excel_sheet()
+                self.ws.append(row)
+                self.rows += 1
+            return
+
+        self.rows += len(df)
+
+    def close(self) -> None :
+        if self.format == '.parquet':
+            if self.writer is None:
+                self.writer = pq.ParquetWriter(self.file_path,pa.schema([(col,pa.string()) for col in SUMMARY_COLUMNS]))
+            self.writer.close()
+        elif self.format == '.xlsx':
+            if self.ws is None:
+                self.ws = self.__excel_sheet()
+            self.wb.save(self.file_path)
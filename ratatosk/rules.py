@@ -0,0 +1,493 @@
+import re
+import operator
+import itertools
+import numpy as np
+import pandas as pd
+from pandas.api.types import is_numeric_dtype, is_bool_dtype
+
+from .exceptions import InvalidRuleError
+
+# Comparison operators of a reference target, longest first so ">=" is not read as ">"
+COMPARISON_OPERATORS = {
+    '>=' : operator.ge,
+    '<=' : operator.le,
+    '!=' : operator.ne,
+    '>'  : operator.gt,
+    '<'  : operator.lt,
+}
+
+def is_condition(target) -> bool:
+    '''
+    Return True if ``target`` is a comparison condition such as ">=-3" or "!=0".
+    '''
+    return isinstance(target,str) and (('>' in target) or ('<' in target) or ('!=' in target))
+
+def to_number(value):
+    '''
+    Return ``value`` as float, None if it is not a number. Text must be
+    written as a decimal number, e.g. "-96" or "0.5".
+    '''
+    if isinstance(value,str):
+        return float(value) if re.fullmatch(r'-?\d+(\.\d+)?',value) else None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+def numeric_values(values: pd.Series) -> np.ndarray :
+    '''
+    Return ``values`` as a float array, NaN for missing and non-numeric values.
+
+    Strings are non-numeric even if they hold a number. Object columns are
+    converted once per unique value.
+    '''
+    if is_numeric_dtype(values) and not is_bool_dtype(values):
+        return values.to_numpy(dtype=float,na_value=np.nan)
+
+    codes,uniques = pd.factorize(values)
+    numbers = [np.nan if isinstance(x,str) else to_number(x) for x in np.asarray(uniques,dtype=object)]
+    numbers = np.array([np.nan if x is None else x for x in numbers]+[np.nan],dtype=float)
+
+    return numbers[codes]
+
+class Condition:
+    '''
+    Comparison condition of a reference target, e.g. ">=-3", "<10" or "!=0".
+
+    The operator and operand are parsed once, ``mask`` then evaluates the
+    condition over a whole column with NumPy. Missing values never satisfy
+    a condition and non-numeric values only satisfy "!=".
+
+    Parameters
+    ----------
+    text : condition as written in the reference.
+    '''
+    def __init__(
+            self,
+            text: str
+    ):
+        self.text = text
+        match = re.search(r'([<>=!:\*]+)',text)
+        self.operator = match.group(1) if match else ''
+        self.operand = text[match.end():] if match else text
+        self.number = to_number(self.operand)
+
+    def mask(self,values: pd.Series) -> np.ndarray :
+        '''
+        Return a boolean array, True where ``values`` satisfy the condition.
+        '''
+        missing = pd.isna(values).to_numpy()
+
+        if self.operator not in COMPARISON_OPERATORS:
+            # not a comparison, the condition is compared as text
+            return (~missing) & (values == self.text).to_numpy()
+
+        compare = COMPARISON_OPERATORS[self.operator]
+        if self.number is None:
+            if self.operator == '!=':
+                return (~missing) & (values != self.operand).to_numpy()
+            return np.zeros(len(values),dtype=bool)
+
+        numbers = numeric_values(values)
+        # NaN (non-numeric) only compares True with "!="
+        with np.errstate(invalid='ignore'):
+            result = compare(numbers,self.number)
+
+        return (~missing) & result
+
+class Rule:
+    '''
+    Compiled rule of a band cell of the reference.
+
+    ``raw`` is the reference value the rule was compiled from and ``label``
+    the recommended setting written in the report.
+    '''
+    def __init__(
+            self,
+            raw
+    ):
+        self.raw = raw
+        self.label = raw
+
+    def check(self,values: pd.Series) -> np.ndarray :
+        '''
+        Return the status ('OK', 'NOK', 'NA' or None) of each item of ``values``.
+        '''
+        raise NotImplementedError(f"Rule {self.raw} cannot be checked without dependency")
+
+class Wildcard(Rule):
+    '''
+    "*", any value is OK.
+    '''
+    def check(self,values: pd.Series) -> np.ndarray :
+        return np.where(pd.notnull(values),'OK',None).astype(object)
+
+class Equal(Rule):
+    '''
+    "=", the value must be equal to the dependency value.
+    '''
+    pass
+
+class Exact(Rule):
+    '''
+    Single value, e.g. 0 or "UNLOCKED". Numeric text also matches numbers.
+    '''
+    def __init__(
+            self,
+            raw
+    ):
+        super().__init__(raw)
+        self.number = None if isinstance(raw,bool) else to_number(raw)
+
+    def check(self,values: pd.Series) -> np.ndarray :
+        ok = (values == self.raw).to_numpy(dtype=bool)
+        if (self.number is not None) and not np.isnan(self.number):
+            ok = ok | (numeric_values(values) == self.number)
+
+        return np.where(pd.isnull(values),'NA',np.where(ok,'OK','NOK')).astype(object)
+
+class Comparison(Rule):
+    '''
+    Comparison condition, e.g. ">=-3" or "!=0". Missing values are NA as for the other rules.
+    '''
+    def __init__(
+            self,
+            raw: str
+    ):
+        super().__init__(raw)
+        self.condition = Condition(raw)
+
+    def check(self,values: pd.Series) -> np.ndarray :
+        return np.where(pd.isnull(values),'NA',np.where(self.condition.mask(values),'OK','NOK')).astype(object)
+
+class InList(Rule):
+    '''
+    List of allowed values, e.g. "[-100,-96]". Values are compared as text,
+    integral numbers without decimal.
+    '''
+    def __init__(
+            self,
+            raw: str
+    ):
+        super().__init__(raw)
+        self.items = set(raw.strip('[]').split(','))
+
+    def check(self,values: pd.Series) -> np.ndarray :
+        codes,uniques = pd.factorize(values)
+        ok = np.array([self.__to_text(x) in self.items for x in np.asarray(uniques,dtype=object)]+[False],dtype=bool)
+
+        return np.where(codes == -1,'NA',np.where(ok[codes],'OK','NOK')).astype(object)
+
+    def __to_text(self,value) -> str:
+        if isinstance(value,(float,np.floating)) and float(value).is_integer():
+            value = int(value)
+        return str(value).replace(' ','')
+
+class Range(Rule):
+    '''
+    Inclusive integer range, e.g. "(-100,-95)", checked with interval comparison.
+    '''
+    def __init__(
+            self,
+            raw: str
+    ):
+        super().__init__(raw)
+        bounds = raw.strip('()').split(',')
+        if (len(bounds) != 2) or not all(re.fullmatch(r'-?\d+',bound) for bound in bounds):
+            raise InvalidRuleError(f"Invalid range {raw}. Range checking only take integer values.")
+        self.lower = int(bounds[0])
+        self.upper = int(bounds[1])
+        if self.lower > self.upper:
+            raise InvalidRuleError(f"Invalid range {raw}. Lower bound larger than upper bound.")
+        self.label = f"{bounds[0]} to {bounds[1]}"
+
+    def check(self,values: pd.Series) -> np.ndarray :
+        numbers = numeric_values(values)
+        with np.errstate(invalid='ignore'):
+            ok = (numbers >= self.lower) & (numbers <= self.upper)
+
+        return np.where(pd.isnull(values),'NA',np.where(ok,'OK','NOK')).astype(object)
+
+class Conditional(Rule):
+    '''
+    Rule depending on the value of a dependency, e.g. "5000:-130;>5000:-124".
+
+    Each clause maps a dependency value (exact or comparison condition) to a
+    rule. With several dependencies the clause key has one part per dependency
+    joined with "&", e.g. "5000&ACTIVATED:-130;>5000&*:-124", "*" matching any
+    value. ``map`` returns the clause value of each row, ``rules`` the compiled
+    rule of each clause value.
+
+    Parameters
+    ----------
+    raw : rule as written in the reference.
+
+    n_dependencies : number of dependencies affecting the target, default 1.
+    '''
+    def __init__(
+            self,
+            raw: str,
+            n_dependencies: int = 1
+    ):
+        super().__init__(raw)
+        self.n_dependencies = n_dependencies
+        self.clauses = []
+        self.rules = {}
+        for clause in raw.strip('{}').split(';'):
+            if clause == '=':
+                continue
+            if (':' not in clause) or (clause.split(':')[1] == ''):
+                raise InvalidRuleError(f"Invalid clause {clause} in {raw}. Clause must be written as dependency_value:rule.")
+            key,value = clause.split(':',1)
+            parts = key.split('&') if n_dependencies>1 else [key]
+            if len(parts) != n_dependencies:
+                raise InvalidRuleError(f"Invalid clause {clause} in {raw}. Clause must have one value per dependency joined with '&'.")
+            parts = [part if to_number(part) is None else float(part) for part in parts]
+            value = value if to_number(value) is None else float(value)
+            self.clauses.append((parts,value))
+            self.rules[value] = compile_rule(value)
+
+    def __is_exact(self,parts: list) -> bool:
+        return not any(is_condition(part) or (part == '*') for part in parts)
+
+    def __part_mask(self,part,values: pd.Series) -> np.ndarray :
+        if part == '*':
+            return pd.notnull(values).to_numpy()
+        if is_condition(part):
+            return Condition(part).mask(values)
+        return (values == part).to_numpy(dtype=bool)
+
+    def map(self,values) -> pd.Series :
+        '''
+        Return the clause value of each row of ``values``, a Series or a list of
+        Series with one Series per dependency. Clauses are evaluated once per
+        unique tuple of dependency values. Clauses with a condition take precedence
+        over exact clauses and the first matching one wins, a later exact clause
+        overrides a former one.
+        '''
+        if isinstance(values,pd.Series):
+            values = [values]
+        if len(values) != self.n_dependencies:
+            raise ValueError(f"Rule {self.raw} expects {self.n_dependencies} dependencies, got {len(values)}")
+
+        # unique tuples of dependency values
+        tuple_codes = np.zeros(len(values[0]),dtype=np.int64)
+        all_codes = []
+        all_uniques = []
+        for series in values:
+            codes,uniques = pd.factorize(series)
+            all_codes.append(codes)
+            all_uniques.append(np.append(np.asarray(uniques,dtype=object),np.nan))
+            tuple_codes = pd.factorize(tuple_codes*(len(uniques)+1) + codes + 1)[0]
+        first_rows = np.unique(tuple_codes,return_index=True)[1]
+        tuple_values = [pd.Series(uniques[codes[first_rows]],dtype=object) for codes,uniques in zip(all_codes,all_uniques)]
+
+        result = np.full(len(first_rows),np.nan,dtype=object)
+        for parts,value in self.clauses:
+            if self.__is_exact(parts):
+                mask = np.logical_and.reduce([self.__part_mask(part,series) for part,series in zip(parts,tuple_values)])
+                result[mask] = value
+        matched = np.zeros(len(first_rows),dtype=bool)
+        for parts,value in self.clauses:
+            if not self.__is_exact(parts):
+                mask = np.logical_and.reduce([self.__part_mask(part,series) for part,series in zip(parts,tuple_values)]) & ~matched
+                result[mask] = value
+                matched |= mask
+
+        return pd.Series(result[tuple_codes],index=values[0].index).infer_objects()
+
+def compile_rule(
+        value,
+        dependent: int = 0
+) -> Rule :
+    '''
+    Compile a band cell of the reference into a Rule.
+
+    Parameters
+    ----------
+    value : band cell value, "None" if empty.
+
+    dependent : int, default 0
+                Number of Dependency affecting the target. A dependent rule must
+                be "*", "=", "None" or conditional, "=" takes a single dependency.
+
+    Raises
+    ------
+    InvalidRuleError if the rule cannot be compiled.
+    '''
+    if not isinstance(value,str):
+        rule = Exact(value)
+        if dependent:
+            raise InvalidRuleError(f"Invalid rule {value}. Rule of a dependent parameter must be conditional dependency_value:rule or '='.")
+        return rule
+
+    text = re.sub(r'\s+','',value)
+    if text == '*':
+        return Wildcard(text)
+    if text == '=':
+        if dependent != 1:
+            raise InvalidRuleError("Invalid rule '='. Equal rule requires a single Dependency.")
+        return Equal(text)
+    if dependent and (text != 'None'):
+        if ':' not in text:
+            raise InvalidRuleError(f"Invalid rule {text}. Rule of a dependent parameter must be conditional dependency_value:rule or '='.")
+        return Conditional(text,int(dependent))
+    if '[' in text:
+        return InList(text)
+    if '(' in text:
+        return Range(text)
+    if ('>' in text) or ('<' in text) or ('!' in text) or ('=' in text):
+        return Comparison(text)
+
+    return Exact(text)
+
+def check_rows(
+        values: pd.Series,
+        codes: np.ndarray,
+        target_rules: list
+) -> tuple :
+    '''
+    Check every item of ``values`` against its own rule in one pass.
+
+    Parameters
+    ----------
+    values : values to check.
+
+    codes : index in ``target_rules`` of the rule of each item, sorted so the
+            items of a rule are contiguous.
+
+    target_rules : list of Rule.
+
+    Returns
+    -------
+    (labels, checks)
+        Object arrays of the recommended setting and status of each item.
+        Exact, Range and numeric Comparison rules are evaluated together over
+        the whole array, other rules are checked per rule.
+    '''
+    n_rules = len(target_rules)
+    labels = np.array([rule.label for rule in target_rules]+[None],dtype=object)[codes]
+    checks = np.empty(len(values),dtype=object)
+    if len(values) == 0:
+        return labels,checks
+
+    missing = pd.isnull(values).to_numpy()
+    numbers = numeric_values(values)
+    objects = values.to_numpy(dtype=object)
+
+    is_exact = np.array([isinstance(rule,Exact) for rule in target_rules],dtype=bool)
+    is_range = np.array([isinstance(rule,Range) for rule in target_rules],dtype=bool)
+    is_comparison = np.array([isinstance(rule,Comparison) and (rule.condition.operator in COMPARISON_OPERATORS)
+                              and (rule.condition.number is not None) for rule in target_rules],dtype=bool)
+
+    def rule_array(attribute,rule_mask,default=np.nan,dtype=float):
+        items = [getattr(rule,attribute,default) if rule_mask[i] else default for i,rule in enumerate(target_rules)]
+        items = [default if item is None else item for item in items]
+        return np.array(items,dtype=dtype)[codes]
+
+    with np.errstate(invalid='ignore'):
+        ### Exact ###
+        rows = is_exact[codes]
+        if rows.any():
+            ok = (objects[rows] == rule_array('raw',is_exact,None,object)[rows]) | (numbers[rows] == rule_array('number',is_exact)[rows])
+            checks[rows] = np.where(missing[rows],'NA',np.where(ok,'OK','NOK'))
+
+        ### Range ###
+        rows = is_range[codes]
+        if rows.any():
+            ok = (numbers[rows] >= rule_array('lower',is_range)[rows]) & (numbers[rows] <= rule_array('upper',is_range)[rows])
+            checks[rows] = np.where(missing[rows],'NA',np.where(ok,'OK','NOK'))
+
+        ### Comparison ###
+        if is_comparison.any():
+            operators = np.array([rule.condition.operator if is_comparison[i] else '' for i,rule in enumerate(target_rules)],dtype=object)[codes]
+            operands = np.array([rule.condition.number if is_comparison[i] else np.nan for i,rule in enumerate(target_rules)],dtype=float)[codes]
+            for operator_text,compare in COMPARISON_OPERATORS.items():
+                rows = operators == operator_text
+                if rows.any():
+                    ok = compare(numbers[rows],operands[rows])
+                    checks[rows] = np.where(missing[rows],'NA',np.where(ok,'OK','NOK'))
+
+    ### Other rules, per rule ###
+    bounds = np.searchsorted(codes,np.arange(n_rules+1),side='left')
+    for i,rule in enumerate(target_rules):
+        if not (is_exact[i] or is_range[i] or is_comparison[i]) and (bounds[i+1]>bounds[i]):
+            checks[bounds[i]:bounds[i+1]] = rule.check(values.iloc[bounds[i]:bounds[i+1]])
+
+    return labels,checks
+
+# key of a missing value in the ruleEvaluator memo, NaN cannot be used as dictionary key
+MISSING_VALUE = ('missing',)
+
+# statuses kept by a ruleEvaluator
+MEMO_MAX_ENTRIES = 1000000
+
+class ruleEvaluator:
+    '''
+    Evaluates rules once per unique (rule, value) tuple.
+
+    The checked values are factorized with the code of their rule, each
+    unique tuple is checked once and the status is broadcast back to the
+    rows by code. Statuses are memoised per tuple, thus sub-MOs and bands
+    sharing a rule reuse them. Values are keyed with their type so True, 1
+    and 1.0 are checked on their own.
+
+    Parameters
+    ----------
+    max_entries : number of statuses kept in the memo, default MEMO_MAX_ENTRIES.
+                  The oldest statuses are dropped first.
+    '''
+    def __init__(self,max_entries: int = MEMO_MAX_ENTRIES):
+        self.memo = {}
+        self.max_entries = max_entries
+
+    def rule_key(self,rule: Rule) -> tuple:
+        # 1, 1.0 and True are equal keys but not the same rule
+        return (type(rule).__name__,type(rule.raw),rule.raw)
+
+    def check_rows(
+            self,
+            values: pd.Series,
+            codes: np.ndarray,
+            target_rules: list
+    ) -> tuple :
+        '''
+        Same as ``check_rows`` evaluated on the unique (rule, value) tuples.
+        '''
+        labels = np.array([rule.label for rule in target_rules]+[None],dtype=object)[codes]
+        if len(values) == 0:
+            return labels,np.empty(0,dtype=object)
+
+        value_codes,unique_values = pd.factorize(values)
+        n_values = len(unique_values)+1
+        tuple_codes,tuple_keys = pd.factorize(codes.astype(np.int64)*n_values + value_codes + 1)
+        tuple_rules = tuple_keys // n_values
+        tuple_values = tuple_keys % n_values - 1
+        unique_values = np.asarray(unique_values,dtype=object)
+
+        tuple_checks = np.empty(len(tuple_keys),dtype=object)
+        memo_keys = []
+        todo = []
+        for i in range(len(tuple_keys)):
+            value = unique_values[tuple_values[i]] if tuple_values[i] != -1 else MISSING_VALUE
+            memo_key = (self.rule_key(target_rules[tuple_rules[i]]),type(value),value)
+            memo_keys.append(memo_key)
+            if memo_key in self.memo:
+                tuple_checks[i] = self.memo[memo_key]
+            else:
+                todo.append(i)
+
+        if len(todo)>0:
+            # check_rows needs the values of a rule to be contiguous
+            todo = np.array(todo)[np.argsort(tuple_rules[todo],kind='stable')]
+            todo_values = pd.Series([unique_values[j] if j != -1 else np.nan for j in tuple_values[todo]],dtype=object)
+            todo_rules,todo_codes = np.unique(tuple_rules[todo],return_inverse=True)
+            todo_labels,todo_checks = check_rows(todo_values,todo_codes,[target_rules[j] for j in todo_rules])
+            for i,check in zip(todo,todo_checks):
+                tuple_checks[i] = check
+                self.memo[memo_keys[i]] = check
+            # dictionaries keep insertion order, drop the oldest statuses
+            for memo_key in list(itertools.islice(self.memo,max(len(self.memo)-self.max_entries,0))):
+                del self.memo[memo_key]
+
+        return labels,tuple_checks[tuple_codes]
@@ -0,0 +1,134 @@
+import pickle
+import numpy as np
+import pandas as pd
+from multiprocessing import shared_memory
+
+# alignment of the column buffers inside a segment
+ALIGNMENT = 64
+
+# segments attached by this process, kept open while attached frames use their memory
+_attached = {}
+
+def _align(offset: int) -> int:
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+class sharedFrame:
+    '''
+    Picklable handle of a dataframe published in a sharedFrameStore.
+
+    The frame is pickled with protocol 5 into one shared memory segment: the
+    pickle payload followed by its out-of-band buffers, i.e. the numeric and
+    categorical code blocks. Attaching rebuilds the frame with those blocks as
+    read-only views of the segment, so they are never copied between processes.
+    String columns are published as dictionary codes, only their distinct
+    values are part of the payload, and are decoded on attach. Missing values
+    of a string column are attached as NaN. Other object columns are part of
+    the payload and are unpickled by every process attaching the frame.
+
+    Parameters
+    ----------
+    name         : name of the shared memory segment.
+    payload_size : size in bytes of the pickle payload.
+    buffers      : (offset, size) in the segment of each out-of-band buffer.
+    '''
+    def __init__(
+            self,
+            name: str,
+            payload_size: int,
+            buffers: list
+    ):
+        self.name = name
+        self.payload_size = payload_size
+        self.buffers = buffers
+
+    def attach(self) -> pd.DataFrame :
+        '''
+        Return the published dataframe. Its blocks must not be written to.
+        '''
+        segment = _attached.get(self.name)
+        if segment is None:
+            segment = shared_memory.SharedMemory(name=self.name)
+            _attached[self.name] = segment
+
+        view = segment.buf.toreadonly()
+        buffers = [view[offset:offset+size] for offset,size in self.buffers]
+        df,dictionaries = pickle.loads(view[:self.payload_size],buffers=buffers)
+        for position,values in dictionaries.items():
+            df.isetitem(position,values.take(df.iloc[:,position].to_numpy()))
+
+        return df
+
+def _encode_strings(df: pd.DataFrame):
+    '''
+    Return (``df`` with its string columns replaced by dictionary codes, {column position : distinct values}).
+    '''
+    encoded = None
+    dictionaries = {}
+    for position in range(df.shape[1]):
+        values = df.iloc[:,position]
+        if (values.dtype != object) or (pd.api.types.infer_dtype(values,skipna=True) != 'string'):
+            continue
+        codes,distinct = pd.factorize(values.to_numpy(),use_na_sentinel=False)
+        if encoded is None:
+            encoded = df.copy(deep=False)
+        encoded.isetitem(position,codes.astype(np.min_scalar_type(max(len(distinct)-1,0))))
+        dictionaries[position] = distinct
+
+    return (df if encoded is None else encoded),dictionaries
+
+class sharedFrameStore:
+    '''
+    Owner of the shared memory segments of published dataframes.
+
+    Dataframes are published once with ``publish`` and the returned sharedFrame
+    handles are sent to worker processes instead of the dataframes. The segments
+    are released by ``close``, or on exit when used as a context manager, once
+    no worker uses them anymore.
+    '''
+    def __init__(self):
+        self.segments = []
+
+    def publish(self,df: pd.DataFrame) -> sharedFrame :
+        '''
+        Copy ``df`` into a new shared memory segment and return its handle.
+        '''
+        buffers = []
+        payload = pickle.dumps(_encode_strings(df),protocol=5,buffer_callback=buffers.append)
+        raw_buffers = [buffer.raw() for buffer in buffers]
+
+        layout = []
+        size = len(payload)
+        for raw in raw_buffers:
+            offset = _align(size)
+            layout.append((offset,raw.nbytes))
+            size = offset + raw.nbytes
+
+        segment = shared_memory.SharedMemory(create=True,size=max(size,1))
+        self.segments.append(segment)
+        _attached[segment.name] = segment
+        segment.buf[:len(payload)] = payload
+        for raw,(offset,nbytes) in zip(raw_buffers,layout):
+            segment.buf[offset:offset+nbytes] = raw
+
+        return sharedFrame(segment.name,len(payload),layout)
+
+    def close(self) -> None:
+        '''
+        Release every published segment.
+        '''
+        for segment in self.segments:
+            try:
+                segment.close()
+                _attached.pop(segment.name,None)
+            except BufferError:
+                # frames attached in this process still use the memory, keep
+                # it mapped for them. The segment itself is removed anyway.
+                pass
+            segment.unlink()
+        self.segments = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self,*args):
+        self.close()
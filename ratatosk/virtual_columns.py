@@ -0,0 +1,191 @@
+import pandas as pd
+from functools import partial
+from typing import Optional, Callable
+from . import naming
+
+class virtualColumn:
+    '''
+    Column of a cm file derived on read from other columns.
+
+    The derived value is the value the preprocessing writes in the file, so a run
+    reads the same configuration whether the file was preprocessed or not. A
+    column the file already has is kept as is, except an ``in_place`` column:
+    a reference column parsed into its value in place, parsing again a value
+    already parsed leaves it unchanged.
+
+    Parameters
+    ----------
+    name     : column name, as written by the preprocessing.
+    sources  : columns of the cm file the column is derived from.
+    compute  : function of (dataframe, {MO : sibling dataframe}) returning the column.
+    siblings : {MO : columns} read from the cm files of other MOs in the same folder, default {}.
+    in_place : ``True`` if the column is the source column ``name`` parsed in place, default False.
+    '''
+    def __init__(
+            self,
+            name: str,
+            sources: list,
+            compute: Callable,
+            siblings: Optional[dict] = {},
+            in_place: bool = False
+    ):
+        self.name = name
+        self.sources = sources
+        self.compute = compute
+        self.siblings = siblings
+        self.in_place = in_place
+
+def last_value(values: pd.Series) -> pd.Series :
+    '''
+    Return the value after the last "=" of the references ``values``,
+    e.g. 5 for "ManagedElement=1,DrxProfile=5". Values without "=" are kept.
+    '''
+    if values.dtype != object:
+        return values
+    references = values.str.contains('=',na=False)
+    return values.where(~references,values.str.split('=').str[-1])
+
+def extract_value(values: pd.Series,pattern: str) -> pd.Series :
+    '''
+    Return the group of ``pattern`` matched in the references ``values``, NaN if it does
+    not match. Values without "=" are kept.
+    '''
+    if values.dtype != object:
+        return values
+    references = values.str.contains('=',na=False)
+    return values.where(~references,values.str.extract(pattern,expand=False))
+
+def last_character(values: pd.Series) -> pd.Series :
+    return values.astype(object).str[-1]
+
+def infer_type(values: pd.Series) -> pd.Series :
+    '''
+    Return ``values`` as a csv reader reads them back, numbers if they all are numbers.
+    '''
+    if values.dtype != object:
+        return values
+    try:
+        return pd.to_numeric(values)
+    except (ValueError,TypeError):
+        return values
+
+def sector_carrier_cells(df: pd.DataFrame,siblings: dict,mo: str) -> pd.Series :
+    '''
+    Return the cell of ``mo``, EUtranCellFDD or EUtranCellTDD, referring to each SectorCarrier of ``df``.
+    '''
+    cell_id = mo.lower()+'id'
+    df_cell = siblings[mo]
+    mapping = df_cell['mecontext'].astype('str') + df_cell['sectorCarrierRef'].str.split('=').str[-1].astype('str')
+    cells = pd.Series(df_cell[cell_id].to_numpy(),index=mapping.to_numpy())
+    # last cell wins on a sector carrier referred twice
+    cells = cells[~cells.index.duplicated(keep='last')]
+
+    return (df['mecontext'].astype('str') + df['sectorcarrierid'].astype('str')).map(cells)
+
+def _column(values: Callable,source: str) -> Callable :
+    return lambda df,siblings: values(df[source])
+
+# derived columns per MO, in the order the preprocessing adds them
+VIRTUAL_COLUMNS = {
+    'EUtranCellFDD' : [
+        virtualColumn('SiteType',['eutrancellfddid'],_column(naming.site_type,'eutrancellfddid'))
+    ],
+    'EUtranCellTDD' : [
+        virtualColumn('SiteType',['eutrancelltddid'],_column(naming.site_type,'eutrancelltddid'))
+    ],
+    'SectorCarrier' : [
+        virtualColumn('eutrancellfddid',['mecontext','sectorcarrierid'],partial(sector_carrier_cells,mo='EUtranCellFDD'),
+                      siblings={'EUtranCellFDD' : ['mecontext','eutrancellfddid','sectorCarrierRef']}),
+        virtualColumn('eutrancelltddid',['mecontext','sectorcarrierid'],partial(sector_carrier_cells,mo='EUtranCellTDD'),
+                      siblings={'EUtranCellTDD' : ['mecontext','eutrancelltddid','sectorCarrierRef']})
+    ],
+    'QciProfilePredefined' : [
+        virtualColumn('drxProfileRef',['drxProfileRef'],_column(last_value,'drxProfileRef'),in_place=True),
+        virtualColumn('logicalChannelGroupRefValue',['logicalChannelGroupRef'],_column(last_character,'logicalChannelGroupRef'))
+    ],
+    'QciProfileOperatorDefined' : [
+        virtualColumn('drxProfileRef',['drxProfileRef'],
+                      _column(partial(extract_value,pattern=r'DataDrxProfile=([^,\s]+)'),'drxProfileRef'),in_place=True),
+        virtualColumn('logicalChannelGroupRefValue',['logicalChannelGroupRef'],_column(last_character,'logicalChannelGroupRef'))
+    ],
+    'ReportConfigSearch' : [
+        virtualColumn('qcia1a2throffsets_qciprofilerefValue',['qciA1A2ThrOffsets_qciProfileRef'],
+                      _column(last_value,'qciA1A2ThrOffsets_qciProfileRef'))
+    ],
+    'SubscriberGroupProfile' : [
+        virtualColumn('preschedProfileRef',['preschedProfileRef'],_column(last_value,'preschedProfileRef'),in_place=True)
+    ],
+    'RlfProfile' : [
+        virtualColumn('reservedBy_ori',['reservedBy'],_column(lambda values: values,'reservedBy')),
+        virtualColumn('reservedBy',['reservedBy'],
+                      _column(partial(extract_value,pattern=r'QciProfilePredefined=([^,\s]+)'),'reservedBy'),in_place=True)
+    ]
+}
+
+def requested_columns(mo: str,parameters: Optional[list] = []) -> list :
+    '''
+    Return the virtual columns of ``mo`` needed for ``parameters``, all of them if empty.
+    Virtual identifier columns are always returned, every identifier column of a cm file is read.
+    '''
+    columns = VIRTUAL_COLUMNS.get(mo,[])
+    if len(parameters) == 0:
+        return columns
+    return [column for column in columns if (column.name.lower() in parameters) or column.name.endswith('id')]
+
+def file_columns(mo: str) -> list :
+    '''
+    Return the virtual columns of ``mo`` derived from its own cm file, without sibling files.
+    '''
+    return [column for column in VIRTUAL_COLUMNS.get(mo,[]) if len(column.siblings) == 0]
+
+def source_parameters(columns: list) -> list :
+    '''
+    Return the lowercase source columns of the virtual ``columns``.
+    '''
+    return list(dict.fromkeys(source.lower() for column in columns for source in column.sources))
+
+def add_virtual_columns(
+        df: pd.DataFrame,
+        columns: list,
+        siblings: Optional[Callable] = None
+) -> pd.DataFrame :
+    '''
+    Add the virtual ``columns`` to the raw cm dataframe ``df``, in place.
+
+    ``siblings`` is a function of (MO, columns) returning those columns of the cm
+    file of another MO in the same folder. A column that cannot be derived, e.g.
+    when a source column is missing, is reported and left out.
+    '''
+    for column in columns:
+        if (column.name in df.columns) and (not column.in_place):
+            continue
+        try:
+            sibling_frames = {mo : siblings(mo,sources) for mo,sources in column.siblings.items()}
+            df[column.name] = infer_type(column.compute(df,sibling_frames))
+        except Exception as err:
+            print(f"  Failed to derive {column.name} with error {err}")
+
+    return df
+
+def drop_featurestate_duplicate(df: pd.DataFrame) -> pd.DataFrame :
+    '''
+    Keep one FeatureState per mecontext and featurestateid, the first by descending featureState.
+    '''
+    df = df.sort_values(by='featureState',ascending=False,kind='stable')
+    return df.drop_duplicates(subset=['mecontext','featurestateid'],keep='first')
+
+# row rules per MO as (columns needed, rule)
+UNIQUE_ROWS = {
+    'FeatureState' : (['mecontext','featurestateid','featureState'],drop_featurestate_duplicate)
+}
+
+def unique_rows(mo: str,df: pd.DataFrame) -> pd.DataFrame :
+    '''
+    Return the rows of the raw cm dataframe ``df`` of ``mo`` without the duplicates the preprocessing drops.
+    '''
+    if mo not in UNIQUE_ROWS:
+        return df
+    columns,rule = UNIQUE_ROWS[mo]
+    if not all(col in df.columns for col in columns):
+        return df
+    return rule(df)
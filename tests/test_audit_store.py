@@ -0,0 +1,35 @@
+import unittest
+import numpy as np
+import pandas as pd
+from ratatosk.audit_store import auditFrame, encode_status, decode_status, count_status
+
+class TestStatusCodes(unittest.TestCase):
+    def test_round_trip(self):
+        codes = encode_status(['OK','NOK',None,'NA','As Info',np.nan])
+        self.assertEqual(codes.dtype,np.int8)
+        self.assertEqual(list(decode_status(codes)),['OK','NOK',None,'NA','As Info',None])
+
+    def test_count(self):
+        counts = count_status(encode_status(['OK','OK','NOK',None]))
+        self.assertEqual(counts,{'OK' : 2, 'NOK' : 1, 'NA' : 0, 'NC' : 0, 'As Info' : 0})
+
+class TestAuditFrame(unittest.TestCase):
+    def test_frame(self):
+        source = pd.DataFrame({
+            'mecontext' : ['A','B','C'],
+            'crsgain'   : [0,3,0]
+        })
+        audited = pd.DataFrame({
+            'crsgain_ref'   : [0,0],
+            'crsgain_check' : ['OK','OK']
+        })
+        result = auditFrame.from_frame('EUtranCellFDD',audited,[2,0],['crsgain','qrxlevmin'],source)
+
+        self.assertEqual(list(result.params),['crsgain'])
+        df = result.frame(columns=['mecontext','crsgain'])
+        self.assertEqual(list(df.columns),['mecontext','crsgain','crsgain_ref','crsgain_check'])
+        self.assertEqual(list(df['mecontext']),['C','A'])
+        self.assertEqual(list(df['crsgain_check']),['OK','OK'])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,139 @@
+import os
+import tempfile
+import threading
+import unittest
+import warnings
+import numpy as np
+import pandas as pd
+from ratatosk.auditor import Auditor, bandPartition
+from ratatosk.cm import Cm, cmPrefetcher
+from ratatosk.config_reference import ConfigReference
+
+class TestBandPartition(unittest.TestCase):
+    def setUp(self):
+        self.df = pd.DataFrame({
+            'eutrancellfddid' : ['A1','B1','A2','C1','B2'],
+            'band'            : ['L900','L1800',np.nan,'L900','L1800']
+        })
+
+    def test_groups_match_groupby(self):
+        partition = bandPartition(self.df)
+        for (band,group),(expected_band,expected_group) in zip(partition.groups(),self.df.groupby('band')):
+            self.assertEqual(band,expected_band)
+            pd.testing.assert_frame_equal(group,expected_group)
+
+    def test_update(self):
+        partition = bandPartition(self.df)
+        groups = [group.iloc[:1] for band,group in partition.groups()]
+        partition.update(pd.concat(groups,ignore_index=True),[len(group) for group in groups])
+        self.assertEqual([list(group['eutrancellfddid']) for band,group in partition.groups()],[['B1'],['A1']])
+
+class TestParallelAudit(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        reference_file = os.path.join(self.folder.name,'reference.xlsx')
+        pd.DataFrame({
+            'MO'                  : ['EUtranCellFDD','EUtranCellFDD','QciProfilePredefined=qci1,qci5'],
+            'Parameter'           : ['crsGain','qRxLevMin','priority'],
+            'Dependency'          : [np.nan,'EUtranCellFDD.dlchannelbandwidth',np.nan],
+            'L900'                : ['0','5000:-140;10000:-130','5'],
+            'L1800'               : ['>=0','*','5'],
+            'Tech'                : ['4G','4G','4G'],
+            'Action'              : [np.nan,np.nan,np.nan],
+            'Parameter Indicator' : ['Power','Access','Qci'],
+            'Group Parameter'     : ['G1','G2','G3'],
+            'Remark'              : ['','',''],
+            'Rules'               : ['','','']
+        }).to_excel(reference_file,index=None)
+        self.reference = ConfigReference(reference_file)
+
+        self.dict_df = {
+            'EUtranCellFDD' : Cm('EUtranCellFDD','20240101',pd.DataFrame({
+                'mecontext'          : ['BKT001ML','BKT001ML','BKT002ML'],
+                'eutrancellfddid'    : ['BKT001MT1','BKT001ML1','BKT002MT1'],
+                'crsgain'            : [0,-3,300],
+                'qrxlevmin'          : [-140,-124,-130],
+                'dlchannelbandwidth' : [5000,20000,10000]
+            })),
+            'QciProfilePredefined' : Cm('QciProfilePredefined','20240101',pd.DataFrame({
+                'mecontext'              : ['BKT001ML','BKT001ML','BKT002ML'],
+                'qciprofilepredefinedid' : ['qci1','qci5','qci1'],
+                'priority'               : [5,6,5]
+            }))
+        }
+
+    def tearDown(self):
+        self.folder.cleanup()
+
+    def test_parallel_matches_serial(self):
+        serial = Auditor().audit(self.reference,self.dict_df).audit_result
+        parallel = Auditor(workers=2).audit(self.reference,self.dict_df).audit_result
+
+        self.assertEqual(list(parallel),list(serial))
+        for sub_mo in serial:
+            pd.testing.assert_frame_equal(parallel[sub_mo].frame(),serial[sub_mo].frame())
+
+    def test_parallel_audits_mos_as_they_load(self):
+        serial = Auditor().audit(self.reference,self.dict_df).audit_result
+        release = threading.Event()
+        def load(mo):
+            if mo == 'QciProfilePredefined':
+                release.wait()
+            return self.dict_df[mo]
+
+        with cmPrefetcher() as dict_cm:
+            for mo in self.dict_df:
+                dict_cm.submit(mo,load,mo)
+            # the EUtranCellFDD units do not wait for QciProfilePredefined
+            threading.Timer(0.2,release.set).start()
+            parallel = Auditor(workers=2).audit(self.reference,dict_cm).audit_result
+
+        self.assertEqual(list(parallel),list(serial))
+        for sub_mo in serial:
+            pd.testing.assert_frame_equal(parallel[sub_mo].frame(),serial[sub_mo].frame())
+
+    def test_compact_result(self):
+        result = Auditor().audit(self.reference,self.dict_df).audit_result
+
+        # the QciProfilePredefined rows of qci1 point back into the loaded MO
+        qci1 = result['QciProfilePredefined=qci1']
+        self.assertEqual(list(qci1.rows),[0,2])
+        self.assertEqual(qci1.params['priority'][1].dtype,np.int8)
+
+        df = result['EUtranCellFDD'].frame()
+        self.assertEqual(list(result['EUtranCellFDD'].rows),[1,0,2])
+        self.assertEqual(list(df['eutrancellfddid']),['BKT001ML1','BKT001MT1','BKT002MT1'])
+        self.assertEqual(list(df['crsgain_check']),['NOK','OK','NOK'])
+        self.assertEqual(list(df['qrxlevmin_ref']),[-124,-140,-130])
+
+    def test_sub_mo_rows_are_copied(self):
+        with warnings.catch_warnings():
+            warnings.simplefilter('error',pd.errors.SettingWithCopyWarning)
+            sub_mo,df,rows = Auditor().prepare_sub_mo(self.reference,self.dict_df,'QciProfilePredefined','qci1',{})
+        self.assertEqual(sub_mo,'QciProfilePredefined=qci1')
+        self.assertEqual(list(rows),[0,2])
+        self.assertIn('band_label',df.columns)
+        self.assertNotIn('band_label',self.dict_df['QciProfilePredefined'].configuration.columns)
+
+    def test_verbose_report(self):
+        cells = pd.DataFrame({
+            'mecontext'          : ['BKT001ML','BKT001ML','BKT002ML'],
+            'siteid'             : ['BKT001','BKT001','BKT002'],
+            'cell'               : ['BKT001MT1','BKT001ML1','BKT002MT1'],
+            'dlChannelBandwidth' : [5000,20000,10000]
+        })
+        result = Auditor().audit(self.reference,self.dict_df)
+        file_path = os.path.join(self.folder.name,'report.xlsx')
+        result.create_report(file_path,cells,self.dict_df,verbose=True)
+
+        df = pd.read_excel(file_path,sheet_name='Power',header=1)
+        self.assertEqual(list(df['EUtranCellFDD.crsgain']),[0,-3,300])
+        self.assertEqual(list(df['EUtranCellFDD.crsgain_check']),['OK','NOK','NOK'])
+        self.assertEqual(list(df['check_G1']),['OK','NOK','NOK'])
+
+        df = pd.read_excel(file_path,sheet_name='Qci',header=1)
+        # node level MO, BKT001ML has qci1 priority 5 and qci5 priority 6
+        self.assertEqual(list(df['QciProfilePredefined=qci5.priority_check']),['NOK','NOK','NC'])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,173 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+import pandas as pd
+import threading
+from ratatosk.cm import cmCollector, cmPrefetcher
+
+try:
+    import pyarrow.parquet as pq
+except ImportError:
+    pq = None
+
+class TestCmCollector(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.cm_file = os.path.join(self.folder,'EUtranCellFDD.csv')
+        pd.DataFrame({
+            'mecontext' : ['4G_BKT402_X','4G_BKT403_X'],
+            'eutrancellfddid' : ['BKT402ML1','BKT403ML1'],
+            'crsGain' : [0,300],
+            'qRxLevMin' : [-140,-124],
+        }).to_csv(self.cm_file,index=False)
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_needed_columns(self):
+        cmc = cmCollector()
+        header = cmc.sniff_header(self.cm_file)
+        self.assertEqual(cmc.get_needed_columns(header,['crsgain'],{'mecontext':[]}),
+                         ['mecontext','eutrancellfddid','crsGain'])
+        self.assertIsNone(cmc.get_needed_columns(header,[],{}))
+
+    def test_streamed_read_match_source(self):
+        filters = {'mecontext' : ['4G_BKT403_X']}
+        df = cmCollector().read_cm_file(self.cm_file,['crsgain'],filters)
+        df_streamed = cmCollector(chunksize=1).read_cm_file(self.cm_file,['crsgain'],filters)
+        pd.testing.assert_frame_equal(df.reset_index(drop=True),df_streamed)
+        self.assertEqual(list(df_streamed['eutrancellfddid']),['BKT403ML1'])
+
+    def test_cached_read_match_source(self):
+        cmc = cmCollector()
+        cmc_cached = cmCollector(cache_folder=os.path.join(self.folder,'cache'))
+        if not cmc_cached.cache.enabled:
+            self.skipTest("pyarrow is not installed")
+
+        df = cmc.read_cm_file(self.cm_file,parameters=['crsgain'])
+        cmc_cached.read_cm_file(self.cm_file,parameters=['crsgain'])
+        self.assertTrue(cmc_cached.cache.has(self.cm_file))
+
+        df_cached = cmc_cached.read_cm_file(self.cm_file,parameters=['crsgain'])
+        pd.testing.assert_frame_equal(df,df_cached)
+        self.assertNotIn('qrxlevmin',df_cached.columns)
+
+    def test_unwritable_cache_falls_back_to_source(self):
+        cache_folder = os.path.join(self.cm_file,'cache')
+        for chunksize in [None,500000]:
+            cmc = cmCollector(cache_folder=cache_folder,chunksize=chunksize)
+            if not cmc.cache.enabled:
+                self.skipTest("pyarrow is not installed")
+
+            df = cmc.read_cm_file(self.cm_file,['crsgain'],{'mecontext' : ['4G_BKT402_X','4G_BKT403_X']})
+            self.assertEqual(len(df),2)
+            # a failed entry does not turn the cache off for the other files
+            self.assertTrue(cmc.cache.enabled)
+
+    def test_cache_miss_returns_needed_columns(self):
+        cmc = cmCollector(cache_folder=os.path.join(self.folder,'cache'))
+        if not cmc.cache.enabled:
+            self.skipTest("pyarrow is not installed")
+
+        df = cmc.load_cm_file(self.cm_file,['crsgain'])
+        self.assertEqual(list(df.columns),['mecontext','eutrancellfddid','crsGain'])
+        self.assertIn('qRxLevMin',cmc.cache.columns(self.cm_file))
+        pd.testing.assert_frame_equal(cmc.load_cm_file(self.cm_file,['crsgain']),df)
+
+    def test_streamed_read_builds_cache(self):
+        filters = {'mecontext' : ['4G_BKT403_X']}
+        cmc = cmCollector(cache_folder=os.path.join(self.folder,'cache'),chunksize=500000)
+        if not cmc.cache.enabled:
+            self.skipTest("pyarrow is not installed")
+
+        df = cmc.read_cm_file(self.cm_file,['crsgain'],filters)
+        self.assertTrue(cmc.cache.has(self.cm_file))
+        with mock.patch('pandas.read_csv',wraps=pd.read_csv) as read_csv:
+            df_cached = cmc.read_cm_file(self.cm_file,['crsgain'],filters)
+        read_csv.assert_not_called()
+        pd.testing.assert_frame_equal(df_cached,df)
+        pd.testing.assert_frame_equal(df,cmCollector().read_cm_file(self.cm_file,['crsgain'],filters).reset_index(drop=True))
+
+    def test_streamed_cache_miss_writes_chunks(self):
+        filters = {'mecontext' : ['4G_BKT403_X']}
+        cmc = cmCollector(cache_folder=os.path.join(self.folder,'cache'),chunksize=1)
+        if not cmc.cache.enabled:
+            self.skipTest("pyarrow is not installed")
+
+        with mock.patch('pandas.read_csv',wraps=pd.read_csv) as read_csv:
+            df = cmc.read_cm_file(self.cm_file,['crsgain'],filters)
+        # the file is only read chunk by chunk
+        self.assertTrue(all(call.kwargs.get('chunksize')==1 for call in read_csv.call_args_list))
+        self.assertEqual(pq.ParquetFile(cmc.cache.entry_path(self.cm_file)).num_row_groups,2)
+        self.assertIn('qRxLevMin',cmc.cache.columns(self.cm_file))
+        pd.testing.assert_frame_equal(cmc.read_cm_file(self.cm_file,['crsgain'],filters),df)
+        pd.testing.assert_frame_equal(df,cmCollector().read_cm_file(self.cm_file,['crsgain'],filters).reset_index(drop=True))
+
+    def test_mixed_chunk_types_drop_the_entry(self):
+        pd.DataFrame({
+            'mecontext' : ['4G_BKT402_X','4G_BKT403_X'],
+            'eutrancellfddid' : ['BKT402ML1','BKT403ML1'],
+            'crsGain' : ['0','a'],
+        }).to_csv(self.cm_file,index=False)
+        cmc = cmCollector(cache_folder=os.path.join(self.folder,'cache'),chunksize=1)
+        if not cmc.cache.enabled:
+            self.skipTest("pyarrow is not installed")
+
+        df = cmc.read_cm_file(self.cm_file,['crsgain'],{'mecontext' : ['4G_BKT402_X','4G_BKT403_X']})
+        self.assertEqual(list(df['crsgain'].astype(str)),['0','a'])
+        self.assertFalse(cmc.cache.has(self.cm_file))
+        self.assertTrue(cmc.cache.enabled)
+        self.assertEqual(os.listdir(os.path.dirname(cmc.cache.entry_path(self.cm_file))),[])
+
+    def test_compressed_read_match_source(self):
+        filters = {'mecontext' : ['4G_BKT403_X']}
+        df = cmCollector().read_cm_file(self.cm_file,['crsgain'],filters)
+        for ext in ['zip','gz']:
+            cm_file = os.path.join(self.folder,'EUtranCellFDD.'+ext)
+            pd.read_csv(self.cm_file).to_csv(cm_file,index=False)
+            pd.testing.assert_frame_equal(cmCollector().read_cm_file(cm_file,['crsgain'],filters),df)
+            pd.testing.assert_frame_equal(cmCollector(chunksize=1).read_cm_file(cm_file,['crsgain'],filters),df.reset_index(drop=True))
+
+class TestCmPrefetcher(unittest.TestCase):
+    def test_failure_cancels_pending_loads(self):
+        started = threading.Event()
+        release = threading.Event()
+        loaded = []
+        def load(mo):
+            started.set()
+            release.wait()
+            loaded.append(mo)
+            return mo
+
+        with self.assertRaises(RuntimeError):
+            with cmPrefetcher(max_workers=1) as dict_cm:
+                for mo in ['EUtranCellFDD','EUtranCellTDD','FeatureState']:
+                    dict_cm.submit(mo,load,mo)
+                started.wait()
+                # the first load ends once the pool is shutting down
+                threading.Timer(0.2,release.set).start()
+                raise RuntimeError('audit failed')
+        # the running load is waited for, the others never start
+        self.assertEqual(loaded,['EUtranCellFDD'])
+        self.assertTrue(dict_cm.futures['FeatureState'].cancelled())
+
+    def test_as_completed_follows_load_order(self):
+        release = threading.Event()
+        def load(mo):
+            if mo == 'EUtranCellFDD':
+                release.wait()
+            return mo
+
+        with cmPrefetcher(max_workers=2) as dict_cm:
+            for mo in ['EUtranCellFDD','EUtranCellTDD']:
+                dict_cm.submit(mo,load,mo)
+            loaded = []
+            for mo in dict_cm.as_completed():
+                loaded.append(mo)
+                release.set()
+        self.assertEqual(loaded,['EUtranCellTDD','EUtranCellFDD'])
+
+if __name__ == "__main__":
+    unittest.main()
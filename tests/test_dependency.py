@@ -0,0 +1,32 @@
+import unittest
+import numpy as np
+import pandas as pd
+from ratatosk.dependency import dependencyIndex
+from ratatosk.identifiers import IdentifierDictionary
+
+class TestDependencyIndex(unittest.TestCase):
+    def setUp(self):
+        self.identifiers = IdentifierDictionary()
+        self.df_dependent = self.identifiers.encode_frame(pd.DataFrame({
+            'mecontext'      : ['A','A','B','B'],
+            'featurestateid' : ['CXC1','CXC2','CXC1','CXC2'],
+            'featurestate'   : ['ACTIVATED','DEACTIVATED','DEACTIVATED','ACTIVATED']
+        }))
+        self.df_config = self.identifiers.encode_frame(pd.DataFrame({'mecontext' : ['B','A','C',np.nan]}))
+
+    def test_lookup_sub_id(self):
+        for identifiers in [self.identifiers,None]:
+            index = dependencyIndex(identifiers)
+            values = index.lookup(self.df_config,self.df_dependent,'FeatureState','CXC2',['mecontext'],'featurestate')
+            self.assertEqual(list(values[:2]),['ACTIVATED','DEACTIVATED'])
+            self.assertTrue(values[2:].isna().all())
+
+    def test_index_reused(self):
+        index = dependencyIndex(self.identifiers)
+        index.lookup(self.df_config,self.df_dependent,'FeatureState','CXC1',['mecontext'],'featurestate')
+        entry = index.indexes[('FeatureState','CXC1',('mecontext',))]
+        index.lookup(self.df_config.iloc[:2],self.df_dependent,'FeatureState','CXC1',['mecontext'],'featurestateid')
+        self.assertIs(index.indexes[('FeatureState','CXC1',('mecontext',))],entry)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,31 @@
+import unittest
+import numpy as np
+import pandas as pd
+from ratatosk.identifiers import IdentifierDictionary
+
+class TestIdentifierDictionary(unittest.TestCase):
+    def test_codes_are_shared_across_frames(self):
+        identifiers = IdentifierDictionary()
+        df_a = identifiers.encode_frame(pd.DataFrame({'mecontext' : ['A','B',np.nan]}))
+        df_b = identifiers.encode_frame(pd.DataFrame({'mecontext' : ['C','A']}))
+
+        self.assertEqual(list(df_a['mecontext'].cat.codes),[0,1,-1])
+        self.assertEqual(list(df_b['mecontext'].cat.codes),[2,0])
+        self.assertEqual(list(df_b['mecontext']),['C','A'])
+
+    def test_map_values(self):
+        identifiers = IdentifierDictionary()
+        df_source = identifiers.encode_frame(pd.DataFrame({
+            'mecontext' : ['A','A','B'],
+            'eutrancellfddid' : ['A1','A2','B1'],
+            'dlchannelbandwidth' : [5000,10000,20000]
+        }))
+        df = identifiers.encode_frame(pd.DataFrame({
+            'mecontext' : ['B','A','C'],
+            'eutrancellfddid' : ['B1','A2','C1']
+        }))
+        values = identifiers.map_values(df,df_source,['mecontext','eutrancellfddid'],'dlchannelbandwidth')
+        np.testing.assert_array_equal(values,[20000,10000,np.nan])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,37 @@
+import os
+import shutil
+import tempfile
+import unittest
+import pandas as pd
+from ratatosk.config_reference import ConfigReference
+from ratatosk.load_plan import LoadPlan
+
+class TestLoadPlan(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.reference_file = os.path.join(self.folder,'reference.xlsx')
+        pd.DataFrame([
+            {'MO' : 'EUtranCellFDD', 'Parameter' : 'crsGain', 'Dependency' : 'None', 'L900' : 0},
+            {'MO' : 'FeatureState=CXC4012504', 'Parameter' : 'featureState', 'Dependency' : 'None', 'L900' : 'ACTIVATED'},
+            {'MO' : 'EUtranCellFDD', 'Parameter' : 'qRxLevMin', 'Dependency' : 'FeatureState=CXC4012503.featurestate', 'L900' : 'ACTIVATED:-124;DEACTIVATED:-140'},
+            {'MO' : 'SectorCarrier', 'Parameter' : 'noOfTxAntennas', 'Dependency' : 'EUtranCellFDD.dlchannelbandwidth', 'L900' : '5000:2;10000:4'},
+        ]).to_excel(self.reference_file,index=False)
+        self.reference = ConfigReference(self.reference_file)
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_dependency_sub_id_merged(self):
+        self.assertEqual(self.reference.moList['FeatureState']['featurestateid'],['CXC4012504','CXC4012503'])
+
+    def test_one_entry_per_mo_and_sub_folder(self):
+        plan = LoadPlan(self.reference,'20231003','/cm',['enm7','enm9'],filters={'mecontext' : ['4G_BKT402_X']})
+        self.assertEqual(len(plan.entries),6)
+        self.assertEqual(plan.get_parameters('EUtranCellFDD'),['crsgain','qrxlevmin','dlchannelbandwidth'])
+        self.assertEqual(plan.get_parameters('FeatureState'),['featurestate','description'])
+        self.assertEqual(plan.get_filters('FeatureState'),{'mecontext' : ['4G_BKT402_X'],
+                                                           'featurestateid' : ['CXC4012504','CXC4012503']})
+        self.assertEqual(plan.get_filters('EUtranCellFDD'),{'mecontext' : ['4G_BKT402_X']})
+
+if __name__ == "__main__":
+    unittest.main()
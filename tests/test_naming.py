@@ -0,0 +1,29 @@
+import unittest
+import numpy as np
+import pandas as pd
+from ratatosk import naming
+
+class TestNaming(unittest.TestCase):
+    def test_parse_name(self):
+        parsed = naming.parse_name('BKT402ML1')
+        self.assertEqual(parsed.siteid,'BKT402')
+        self.assertEqual(parsed.ne,'BKT402ML')
+        self.assertEqual(parsed.band_label,'L')
+        self.assertEqual(parsed.sector,'1')
+        self.assertEqual(parsed.site_type,'M')
+        self.assertEqual(naming.parse_name('BKT402IL1').site_type,'I')
+
+    def test_parse_names_match_extract(self):
+        names = pd.Series(['BKT402ML1','4G_BKT402_X',np.nan,'BKT402ML1','XX'],index=[5,4,3,2,1])
+        pd.testing.assert_series_equal(naming.siteid(names),
+                                       names.str.extract(r'([A-Za-z]{3}\d{3})')[0],
+                                       check_names=False)
+        self.assertEqual(list(naming.site_type(names)),['M','M','M','M','M'])
+
+    def test_first_band_label(self):
+        df = pd.DataFrame({'eutrancellfddid' : ['BKT402ML1',np.nan],
+                           'eutrancelltddid' : [np.nan,'BKT402MF2']})
+        self.assertEqual(list(naming.first_band_label(df,['eutrancellfddid','eutrancelltddid','nrcellduid'])),['L','F'])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,219 @@
+import os
+import json
+import shutil
+import tempfile
+import threading
+import unittest
+import zipfile
+from unittest import mock
+import pandas as pd
+from ratatosk.pre_processor import cmPreProcessor, folderLock, split_steps, write_cm, file_hash, site_type_step, sectorcarrier_step, featurestate_step
+
+class TestPreProcessor(unittest.TestCase):
+    def setUp(self):
+        self.cm_folder = tempfile.mkdtemp()
+        self.folder = os.path.join(self.cm_folder,'enm7','20231003')
+        os.makedirs(self.folder)
+        pd.DataFrame({'mecontext' : ['4G_BKT402_X','4G_BKT402_X'],
+                      'eutrancellfddid' : ['BKT402ML1','BKT402IT1'],
+                      'dlChannelBandwidth' : [20000,5000],
+                      'sectorCarrierRef' : ['ManagedElement=1,SectorCarrier=1','ManagedElement=1,SectorCarrier=2']}).to_csv(self.file('EUtranCellFDD'),index=False)
+        pd.DataFrame({'mecontext' : ['4G_BKT402_X'],
+                      'eutrancelltddid' : ['BKT402ME1'],
+                      'channelBandwidth' : [20000],
+                      'sectorCarrierRef' : ['ManagedElement=1,SectorCarrier=3']}).to_csv(self.file('EUtranCellTDD'),index=False)
+        pd.DataFrame({'mecontext' : ['4G_BKT402_X']*3,
+                      'sectorcarrierid' : [1,2,3]}).to_csv(self.file('SectorCarrier'),index=False)
+        pd.DataFrame({'mecontext' : ['4G_BKT402_X']*2,
+                      'featurestateid' : ['CXC4012504']*2,
+                      'featureState' : ['DEACTIVATED','ACTIVATED']}).to_csv(self.file('FeatureState'),index=False)
+        pd.DataFrame({'mecontext' : ['4G_BKT402_X']*2,
+                      'qciprofilepredefinedid' : ['qci1','qci5'],
+                      'drxProfileRef' : ['ManagedElement=1,DrxProfile=1','ManagedElement=1,DrxProfile=5'],
+                      'logicalChannelGroupRef' : ['ManagedElement=1,LogicalChannelGroup=2']*2}).to_csv(self.file('QciProfilePredefined'),index=False)
+        self.preprocessor = cmPreProcessor(self.cm_folder,'20231003',['enm7'])
+
+    def tearDown(self):
+        shutil.rmtree(self.cm_folder)
+
+    def file(self,mo):
+        return os.path.join(self.folder,mo+'.csv')
+
+    def run_all(self):
+        self.preprocessor.run(
+            create_logicalchannelvalue=['QciProfilePredefined'],
+            handle_preproc=['QciProfilePredefined','RlfProfile'],
+            merge_fdd_tdd=True
+        )
+
+    def test_files_read_once(self):
+        with mock.patch('pandas.read_csv',wraps=pd.read_csv) as read_csv:
+            self.run_all()
+        full_reads = [call.args[0] for call in read_csv.call_args_list if 'nrows' not in call.kwargs]
+        self.assertEqual(sorted(full_reads),sorted(set(full_reads)))
+
+        df_fdd = pd.read_csv(self.file('EUtranCellFDD'))
+        self.assertEqual(list(df_fdd['SiteType']),['M','I'])
+        df_sectorCarrier = pd.read_csv(self.file('SectorCarrier'))
+        self.assertEqual(list(df_sectorCarrier['eutrancellfddid'].fillna('')),['BKT402ML1','BKT402IT1',''])
+        self.assertEqual(list(df_sectorCarrier['eutrancelltddid'].fillna('')),['','','BKT402ME1'])
+        df_featurestate = pd.read_csv(self.file('FeatureState'))
+        self.assertEqual(list(df_featurestate['featureState']),['DEACTIVATED'])
+        df_qci = pd.read_csv(self.file('QciProfilePredefined'))
+        self.assertEqual(list(df_qci['drxProfileRef']),[1,5])
+        self.assertEqual(list(df_qci['logicalChannelGroupRefValue']),[2,2])
+        df_merge = pd.read_csv(self.file('EUtranCellFDD_TDD'))
+        self.assertEqual(list(df_merge['eutrancellid']),['BKT402ML1','BKT402IT1','BKT402ME1'])
+        self.assertIn('SiteType',df_merge.columns)
+
+    def manifest(self,folder=None):
+        with open(os.path.join(folder or self.folder,'preprocess_manifest.json')) as file:
+            return json.load(file)['files']
+
+    def test_manifest_and_rerun(self):
+        self.run_all()
+        manifest = self.manifest()
+        self.assertEqual(sorted(manifest['QciProfilePredefined.csv']['steps']),['create_logicalchannelvalue','handle_preproc'])
+        self.assertEqual(sorted(manifest['SectorCarrier.csv']['steps']['handle_sectorCarrier']['inputs']),['EUtranCellFDD','EUtranCellTDD'])
+        # RlfProfile does not exist, it is not recorded
+        self.assertNotIn('RlfProfile.csv',manifest)
+
+        with mock.patch('ratatosk.pre_processor.write_cm') as write_cm, \
+             mock.patch('ratatosk.pre_processor.file_hash') as file_hash, \
+             mock.patch('pandas.read_csv',wraps=pd.read_csv) as read_csv:
+            self.run_all()
+        write_cm.assert_not_called()
+        read_csv.assert_not_called()
+        # nothing changed, the files are not hashed
+        file_hash.assert_not_called()
+
+    def test_new_files_hashed_once(self):
+        with mock.patch('ratatosk.pre_processor.file_hash',wraps=file_hash) as patched:
+            self.run_all()
+        # files without entry are only hashed to record them, once written
+        hashed = [os.path.basename(call.args[0]) for call in patched.call_args_list]
+        self.assertEqual(sorted(hashed),sorted(set(hashed)))
+        self.assertEqual(set(hashed),set(self.manifest()))
+
+    def test_touched_file_is_hashed(self):
+        self.run_all()
+        stat = os.stat(self.file('EUtranCellTDD'))
+        os.utime(self.file('EUtranCellTDD'),ns=(stat.st_atime_ns,stat.st_mtime_ns+10**9))
+
+        with mock.patch('ratatosk.pre_processor.write_cm') as write_cm, \
+             mock.patch('ratatosk.pre_processor.file_hash',wraps=file_hash) as patched:
+            self.run_all()
+        # same size, the content is compared and is unchanged
+        write_cm.assert_not_called()
+        self.assertIn('EUtranCellTDD.csv',[os.path.basename(call.args[0]) for call in patched.call_args_list])
+
+    def test_file_dropped_again(self):
+        self.run_all()
+        pd.DataFrame({'mecontext' : ['4G_BKT402_X'],
+                      'eutrancelltddid' : ['BKT402IE1'],
+                      'channelBandwidth' : [20000],
+                      'sectorCarrierRef' : ['ManagedElement=1,SectorCarrier=2']}).to_csv(self.file('EUtranCellTDD'),index=False)
+
+        with mock.patch('ratatosk.pre_processor.write_cm',wraps=write_cm) as patched:
+            self.run_all()
+        written = sorted(os.path.basename(call.args[1]) for call in patched.call_args_list)
+        # SectorCarrier and the merged cells read EUtranCellTDD
+        self.assertEqual(written,['EUtranCellFDD_TDD.csv','EUtranCellTDD.csv','SectorCarrier.csv'])
+        self.assertEqual(list(pd.read_csv(self.file('SectorCarrier'))['eutrancelltddid'].fillna('')),['','BKT402IE1',''])
+
+    def test_manifest_deleted(self):
+        self.run_all()
+        os.remove(os.path.join(self.folder,'preprocess_manifest.json'))
+
+        with mock.patch('ratatosk.pre_processor.write_cm') as patched:
+            self.run_all()
+        # only FeatureState has no trace of its step in the file header
+        self.assertEqual([os.path.basename(call.args[1]) for call in patched.call_args_list],['FeatureState.csv'])
+
+    def test_split_steps(self):
+        steps = [site_type_step('EUtranCellFDD'),featurestate_step(),site_type_step('EUtranCellTDD'),sectorcarrier_step()]
+        groups = split_steps(steps)
+        self.assertEqual([[step.output for step in group] for group in groups],
+                         [['EUtranCellFDD','EUtranCellTDD','SectorCarrier'],['FeatureState']])
+
+    def test_parallel_matches_serial(self):
+        parallel_folder = os.path.join(self.cm_folder,'enm9','20231003')
+        shutil.copytree(self.folder,parallel_folder)
+        self.run_all()
+
+        preprocessor = cmPreProcessor(self.cm_folder,'20231003',['enm9'],workers=2)
+        preprocessor.run(
+            create_logicalchannelvalue=['QciProfilePredefined'],
+            handle_preproc=['QciProfilePredefined','RlfProfile'],
+            merge_fdd_tdd=True
+        )
+        for mo in ['EUtranCellFDD','EUtranCellTDD','SectorCarrier','FeatureState','QciProfilePredefined','EUtranCellFDD_TDD']:
+            pd.testing.assert_frame_equal(pd.read_csv(os.path.join(parallel_folder,mo+'.csv')),pd.read_csv(self.file(mo)))
+        self.assertEqual({name : sorted(entry['steps']) for name,entry in self.manifest(parallel_folder).items()},
+                         {name : sorted(entry['steps']) for name,entry in self.manifest().items()})
+
+    def test_waits_for_locked_folder(self):
+        run = threading.Thread(target=self.run_all)
+        with folderLock(self.folder):
+            run.start()
+            run.join(0.5)
+            self.assertTrue(run.is_alive())
+            self.assertFalse(os.path.exists(os.path.join(self.folder,'preprocess_manifest.json')))
+        run.join()
+        self.assertTrue(os.path.exists(os.path.join(self.folder,'preprocess_manifest.json')))
+
+    def test_write_compressed(self):
+        df = pd.read_csv(self.file('FeatureState'))
+        zip_file = os.path.join(self.folder,'FeatureState.zip')
+        write_cm(df,zip_file)
+        with zipfile.ZipFile(zip_file) as archive:
+            self.assertEqual([(info.filename,info.compress_type) for info in archive.infolist()],
+                             [('FeatureState.csv',zipfile.ZIP_DEFLATED)])
+            self.assertEqual(archive.read('FeatureState.csv').decode(),df.to_csv(index=False))
+        pd.testing.assert_frame_equal(pd.read_csv(zip_file),df)
+
+        gz_file = os.path.join(self.folder,'FeatureState.gz')
+        write_cm(df,gz_file)
+        pd.testing.assert_frame_equal(pd.read_csv(gz_file),df)
+        # no uncompressed copy or temporary file is left next to the compressed files
+        self.assertEqual(sorted(name for name in os.listdir(self.folder) if name.startswith('FeatureState')),
+                         ['FeatureState.csv','FeatureState.gz','FeatureState.zip'])
+
+    def test_zip_streamed_to_member(self):
+        df = pd.read_csv(self.file('QciProfilePredefined'))
+        zip_file = os.path.join(self.folder,'QciProfilePredefined.zip')
+        # the member is not written at once from a csv buffered in memory
+        with mock.patch.object(zipfile.ZipFile,'writestr',side_effect=AssertionError('buffered')):
+            write_cm(df,zip_file)
+        with zipfile.ZipFile(zip_file) as archive:
+            self.assertEqual(archive.namelist(),['QciProfilePredefined.csv'])
+            with archive.open('QciProfilePredefined.csv') as member:
+                pd.testing.assert_frame_equal(pd.read_csv(member),df)
+
+    def test_failed_write_keeps_file(self):
+        zip_file = os.path.join(self.folder,'FeatureState.zip')
+        write_cm(pd.read_csv(self.file('FeatureState')),zip_file)
+        with open(zip_file,'rb') as file:
+            content = file.read()
+
+        with mock.patch('pandas.DataFrame.to_csv',side_effect=OSError('disk full')):
+            with self.assertRaises(OSError):
+                write_cm(pd.DataFrame({'mecontext' : []}),zip_file)
+        with open(zip_file,'rb') as file:
+            self.assertEqual(file.read(),content)
+        self.assertEqual(sorted(os.listdir(self.folder)),sorted(['EUtranCellFDD.csv','EUtranCellTDD.csv','SectorCarrier.csv',
+                                                                 'FeatureState.csv','FeatureState.zip','QciProfilePredefined.csv']))
+
+    def test_run_gzipped_folder(self):
+        for mo in ['EUtranCellFDD','EUtranCellTDD','SectorCarrier']:
+            pd.read_csv(self.file(mo)).to_csv(os.path.join(self.folder,mo+'.gz'),index=False)
+        self.preprocessor.run(define_site_type=True,handle_sectorCarrier=True,file_type='gz')
+
+        df_sectorCarrier = pd.read_csv(os.path.join(self.folder,'SectorCarrier.gz'))
+        self.assertEqual(list(df_sectorCarrier['eutrancellfddid'].fillna('')),['BKT402ML1','BKT402IT1',''])
+        self.assertIn('SiteType',pd.read_csv(os.path.join(self.folder,'EUtranCellFDD.gz')).columns)
+        # the csv files are not touched
+        self.assertNotIn('SiteType',pd.read_csv(self.file('EUtranCellFDD')).columns)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,84 @@
+import os
+import tempfile
+import unittest
+import pandas as pd
+from openpyxl import load_workbook
+from unittest import mock
+from ratatosk import report_writer
+from ratatosk.report_writer import verboseReportWriter, summaryWriter, indexed_fill, SUMMARY_COLUMNS
+
+class TestVerboseReportWriter(unittest.TestCase):
+    def test_indicator_layout(self):
+        df = pd.DataFrame({
+            'mecontext'              : ['A'],
+            'siteid'                 : ['A'],
+            'cell'                   : ['A1'],
+            'dlChannelBandwidth'     : [20000],
+            'EUtranCellFDD.x'        : [1],
+            'EUtranCellFDD.x_ref'    : [1],
+            'EUtranCellFDD.x_check'  : ['OK'],
+            'check_G1'               : ['OK'],
+            'check_overall_Power'    : ['OK']
+        })
+        with tempfile.TemporaryDirectory() as folder:
+            file_path = os.path.join(folder,'report.xlsx')
+            writer = verboseReportWriter(file_path)
+            writer.write_indicator('Power',df,[('G1',indexed_fill(40),3)],indexed_fill(41))
+            writer.write_summary(pd.DataFrame({'Parameter Indicator' : ['Power'], 'OK' : [1]}),[2],[3])
+            writer.save()
+
+            wb = load_workbook(file_path)
+            self.assertEqual(wb.sheetnames,['Summary','Power'])
+            ws = wb['Power']
+            self.assertTrue(ws.row_dimensions[1].hidden)
+            self.assertEqual(ws.freeze_panes,'E3')
+            self.assertEqual(ws['E1'].value,'G1')
+            self.assertEqual(ws['H1'].value,'Overall Check')
+            self.assertEqual({str(cells) for cells in ws.merged_cells.ranges},{'E1:G1','H1'})
+            self.assertEqual([cell.value for cell in ws[2]],list(df.columns[:-1])+['Summary'])
+            self.assertEqual([cell.value for cell in ws[3]],['A','A','A1',20000,1,1,'OK','OK','OK'])
+            self.assertEqual(ws['H2'].fill.fgColor.indexed,40)
+
+class TestSummaryWriter(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.df = pd.DataFrame({
+            'mecontext'           : ['A','A','B'],
+            'MO Class'            : 'EUtranCellFDD',
+            'MO'                  : ['eutrancellfdd=A1','eutrancellfdd=A2','eutrancellfdd=B1'],
+            'Parameter'           : 'crsgain',
+            'Value'               : [0,3,None],
+            'Recommended Setting' : [0,0,'>=0'],
+            'Status'              : ['OK','NOK','NA']
+        },columns=SUMMARY_COLUMNS)
+
+    def tearDown(self):
+        self.folder.cleanup()
+
+    def write(self,file_name):
+        file_path = os.path.join(self.folder.name,file_name)
+        writer = summaryWriter(file_path)
+        writer.write(self.df.iloc[:2])
+        writer.write(self.df.iloc[2:])
+        writer.close()
+        return file_path
+
+    def test_csv(self):
+        df = pd.read_csv(self.write('summary.csv'),keep_default_na=False)
+        self.assertEqual(list(df.columns),SUMMARY_COLUMNS)
+        self.assertEqual(list(df['Status']),['OK','NOK','NA'])
+
+    def test_excel_continues_on_new_sheet(self):
+        with mock.patch.object(report_writer,'EXCEL_MAX_ROWS',2):
+            file_path = self.write('summary.xlsx')
+        sheets = pd.read_excel(file_path,sheet_name=None)
+        self.assertEqual(list(sheets),['Sheet1','Sheet2'])
+        self.assertEqual(list(sheets['Sheet1']['MO']),['eutrancellfdd=A1','eutrancellfdd=A2'])
+        self.assertEqual(list(sheets['Sheet2']['Recommended Setting']),['>=0'])
+
+    def test_unknown_format(self):
+        with self.assertRaises(ValueError):
+            summaryWriter(os.path.join(self.folder.name,'summary.txt'))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,103 @@
+import unittest
+import numpy as np
+import pandas as pd
+from ratatosk.exceptions import InvalidRuleError
+from ratatosk.rules import Condition, check_rows, compile_rule, ruleEvaluator, Conditional, Exact, InList, Range, Wildcard
+
+class TestCondition(unittest.TestCase):
+    def test_numeric_comparison(self):
+        values = pd.Series([-96.0,-95.0,np.nan,-100.0])
+        self.assertEqual(list(Condition('<-95').mask(values)),[True,False,False,True])
+        self.assertEqual(list(Condition('>=-95').mask(values)),[False,True,False,False])
+        self.assertEqual(list(Condition('!=-96').mask(values)),[False,True,False,True])
+        self.assertEqual(list(Condition('>5.5').mask(pd.Series([5,6]))),[False,True])
+
+    def test_non_numeric_values(self):
+        values = pd.Series([10,'10','UNLOCKED',None],dtype=object)
+        self.assertEqual(list(Condition('>5').mask(values)),[True,False,False,False])
+        self.assertEqual(list(Condition('!=10').mask(values)),[False,True,True,False])
+
+    def test_conditional_map(self):
+        rule = compile_rule('>5000:-124;5000:-130;20000:*',dependent=True)
+        self.assertIsInstance(rule,Conditional)
+        ref = rule.map(pd.Series([5000.0,10000.0,20000.0,np.nan]))
+        self.assertEqual(list(ref[:3]),[-130.0,-124.0,-124.0])
+        self.assertTrue(pd.isna(ref[3]))
+
+    def test_conditional_multiple_dependency(self):
+        rule = compile_rule('5000&ACTIVATED:-130;>5000&*:-124;5000&DEACTIVATED:-140',dependent=2)
+        ref = rule.map([pd.Series([5000.0,5000.0,10000.0,5000.0]),pd.Series(['ACTIVATED','DEACTIVATED','DEACTIVATED',np.nan])])
+        self.assertEqual(list(ref[:3]),[-130.0,-140.0,-124.0])
+        self.assertTrue(pd.isna(ref[3]))
+        with self.assertRaises(InvalidRuleError):
+            compile_rule('5000:-130',dependent=2)
+
+class TestCompileRule(unittest.TestCase):
+    def test_rule_types(self):
+        self.assertIsInstance(compile_rule(' * '),Wildcard)
+        self.assertIsInstance(compile_rule(0),Exact)
+        self.assertIsInstance(compile_rule('[-100, -96]'),InList)
+        self.assertIsInstance(compile_rule('ACTIVATED:-96',dependent=False),Exact)
+        self.assertIsInstance(compile_rule('None',dependent=True),Exact)
+
+    def test_range(self):
+        rule = compile_rule('(-100,-95)')
+        self.assertEqual(rule.label,'-100 to -95')
+        self.assertEqual(list(rule.check(pd.Series([-100,-95,-94,np.nan]))),['OK','OK','NOK','NA'])
+
+    def test_missing_values_are_na(self):
+        values = pd.Series([-96.0,np.nan,None],dtype=object)
+        for raw in ['!=0','>=-96','<-100','!=UNLOCKED',-96.0,'(-100,-95)','[-96,-90]']:
+            rule = compile_rule(raw)
+            self.assertEqual(list(rule.check(values)[1:]),['NA','NA'])
+            self.assertEqual(list(check_rows(values,np.zeros(3,dtype=int),[rule])[1][1:]),['NA','NA'])
+
+    def test_invalid_rules(self):
+        for value,dependent in [('(5,1)',False),('(a,5)',False),('=',False),('UNLOCKED',True),('5000:',True)]:
+            with self.assertRaises(InvalidRuleError):
+                compile_rule(value,dependent)
+
+class TestCheckRows(unittest.TestCase):
+    def test_match_rule_check(self):
+        target_rules = [compile_rule(-130.0),compile_rule('(-100,-95)'),compile_rule('<-95'),compile_rule('[-96,-90]'),compile_rule('UNLOCKED')]
+        values = pd.Series([-130,-120,np.nan,-97,-90,-95,-94,-96,-91,-90,'UNLOCKED','LOCKED'],dtype=object)
+        codes = np.array([0,0,0,1,1,2,2,3,3,3,4,4])
+
+        labels,checks = check_rows(values,codes,target_rules)
+        expected = np.concatenate([rule.check(values[codes == i]) for i,rule in enumerate(target_rules)])
+        self.assertEqual(list(checks),list(expected))
+        self.assertEqual(labels[3],'-100 to -95')
+
+    def test_evaluator_match_check_rows(self):
+        target_rules = [compile_rule(0),compile_rule('>=0')]
+        values = pd.Series([0,1,0,np.nan,-1,0,1])
+        codes = np.array([0,0,0,0,1,1,1])
+
+        evaluator = ruleEvaluator()
+        labels,checks = evaluator.check_rows(values,codes,target_rules)
+        self.assertEqual(list(checks),list(check_rows(values,codes,target_rules)[1]))
+        self.assertEqual(len(evaluator.memo),6)
+
+        evaluator.check_rows(values[:3],codes[:3],[compile_rule(0)])
+        self.assertEqual(len(evaluator.memo),6)
+
+    def test_evaluator_memo_keys_and_bound(self):
+        evaluator = ruleEvaluator(max_entries=3)
+        rule = compile_rule('[1]')
+        codes = np.zeros(1,dtype=int)
+        self.assertEqual(list(evaluator.check_rows(pd.Series([1],dtype=object),codes,[rule])[1]),['OK'])
+        # the status of 1 is not reused for True
+        self.assertEqual(list(evaluator.check_rows(pd.Series([True],dtype=object),codes,[rule])[1]),['NOK'])
+
+        # rules compiled from 1, 1.0 and True do not share their statuses
+        evaluator = ruleEvaluator()
+        for raw in [1,1.0,True]:
+            evaluator.check_rows(pd.Series([1]),codes,[compile_rule(raw)])
+        self.assertEqual(len(evaluator.memo),3)
+
+        evaluator = ruleEvaluator(max_entries=3)
+        evaluator.check_rows(pd.Series(range(10)),np.zeros(10,dtype=int),[compile_rule(0)])
+        self.assertEqual(len(evaluator.memo),3)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,49 @@
+import unittest
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from ratatosk.cm import Cm, sharedCmDict
+from ratatosk.shared_frames import sharedFrameStore
+
+def _sum_column(shared_cm,mo,col):
+    return float(shared_cm[mo].configuration[col].sum())
+
+class TestSharedFrames(unittest.TestCase):
+    def setUp(self):
+        self.df = pd.DataFrame({
+            'mecontext' : pd.Categorical(['A','B',np.nan]),
+            'crsgain'   : [0.0,-3.0,np.nan],
+            'value'     : ['x',np.nan,5],
+            'cell'      : ['bkt001ml1',np.nan,'bkt001ml1']
+        },index=[10,11,12])
+
+    def test_round_trip(self):
+        with sharedFrameStore() as store:
+            df = store.publish(self.df).attach()
+            pd.testing.assert_frame_equal(df,self.df)
+            self.assertFalse(df['crsgain'].to_numpy().flags.writeable)
+
+    def test_string_columns_are_encoded(self):
+        # distinct string objects of the same value, as read from a csv file
+        self.df['cell'] = self.df['cell'].str.upper()
+        with sharedFrameStore() as store:
+            frame = store.publish(self.df)
+            # the cell values are published once each
+            segment = shared_memory.SharedMemory(name=frame.name)
+            payload = bytes(segment.buf[:frame.payload_size])
+            segment.close()
+            self.assertEqual(payload.count(b'BKT001ML1'),1)
+            df = frame.attach()
+            pd.testing.assert_frame_equal(df,self.df)
+            df['band'] = 'L900'
+
+    def test_workers_attach(self):
+        with sharedFrameStore() as store:
+            shared_cm = sharedCmDict.publish({'EUtranCellFDD' : Cm('EUtranCellFDD','20240101',self.df)},store)
+            with ProcessPoolExecutor(max_workers=1) as executor:
+                total = executor.submit(_sum_column,shared_cm,'EUtranCellFDD','crsgain').result()
+        self.assertEqual(total,-3.0)
+
+if __name__ == "__main__":
+    unittest.main()
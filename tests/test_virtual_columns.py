@@ -0,0 +1,95 @@
+import os
+import shutil
+import tempfile
+import unittest
+import pandas as pd
+from ratatosk.cm import cmCollector
+from ratatosk.pre_processor import cmPreProcessor
+from ratatosk.virtual_columns import last_value, requested_columns
+
+class TestVirtualColumns(unittest.TestCase):
+    def setUp(self):
+        self.cm_folder = tempfile.mkdtemp()
+        self.folder = os.path.join(self.cm_folder,'enm7','20231003')
+        os.makedirs(self.folder)
+        pd.DataFrame({'mecontext' : ['4G_BKT402_X','4G_BKT402_X'],
+                      'eutrancellfddid' : ['BKT402ML1','BKT402IT1'],
+                      'crsGain' : [0,300],
+                      'sectorCarrierRef' : ['ManagedElement=1,SectorCarrier=1','ManagedElement=1,SectorCarrier=2']}).to_csv(self.file('EUtranCellFDD'),index=False)
+        pd.DataFrame({'mecontext' : ['4G_BKT402_X'],
+                      'eutrancelltddid' : ['BKT402ME1'],
+                      'crsGain' : [0],
+                      'sectorCarrierRef' : ['ManagedElement=1,SectorCarrier=3']}).to_csv(self.file('EUtranCellTDD'),index=False)
+        pd.DataFrame({'mecontext' : ['4G_BKT402_X']*3,
+                      'sectorcarrierid' : [1,2,3],
+                      'noOfTxAntennas' : [2,4,4]}).to_csv(self.file('SectorCarrier'),index=False)
+        pd.DataFrame({'mecontext' : ['4G_BKT402_X']*2,
+                      'featurestateid' : ['CXC4012504']*2,
+                      'featureState' : ['ACTIVATED','DEACTIVATED']}).to_csv(self.file('FeatureState'),index=False)
+        pd.DataFrame({'mecontext' : ['4G_BKT402_X']*2,
+                      'qciprofilepredefinedid' : ['qci1','qci5'],
+                      'drxProfileRef' : ['ManagedElement=1,DrxProfile=1','ManagedElement=1,DrxProfile=5'],
+                      'logicalChannelGroupRef' : ['ManagedElement=1,LogicalChannelGroup=2']*2}).to_csv(self.file('QciProfilePredefined'),index=False)
+
+    def tearDown(self):
+        shutil.rmtree(self.cm_folder)
+
+    def file(self,mo,folder=None):
+        return os.path.join(folder or self.folder,mo+'.csv')
+
+    def read(self,mo,parameters,folder=None,cmc=None):
+        filters = {'mecontext' : ['4G_BKT402_X']}
+        return (cmc or cmCollector()).read_cm_file(self.file(mo,folder),parameters,filters).reset_index(drop=True)
+
+    def test_raw_read_matches_preprocessed(self):
+        preprocessed_folder = os.path.join(self.cm_folder,'enm9','20231003')
+        shutil.copytree(self.folder,preprocessed_folder)
+        cmPreProcessor(self.cm_folder,'20231003',['enm9']).run(
+            create_logicalchannelvalue=['QciProfilePredefined'],
+            handle_preproc=['QciProfilePredefined']
+        )
+        raw_files = {mo : open(self.file(mo)).read() for mo in ['EUtranCellFDD','SectorCarrier','QciProfilePredefined']}
+
+        cases = [
+            ('EUtranCellFDD',['crsgain','sitetype']),
+            ('SectorCarrier',['nooftxantennas']),
+            ('FeatureState',['featurestate']),
+            ('QciProfilePredefined',['drxprofileref','logicalchannelgrouprefvalue'])
+        ]
+        for mo,parameters in cases:
+            df = self.read(mo,parameters)
+            pd.testing.assert_frame_equal(df,self.read(mo,parameters,preprocessed_folder))
+            pd.testing.assert_frame_equal(df,self.read(mo,parameters,cmc=cmCollector(chunksize=1)))
+
+        self.assertEqual(list(self.read('EUtranCellFDD',['sitetype'])['sitetype']),['M','I'])
+        self.assertEqual(list(self.read('QciProfilePredefined',['drxprofileref'])['drxprofileref']),[1,5])
+        self.assertEqual(list(self.read('FeatureState',['featurestate'])['featurestate']),['DEACTIVATED'])
+        # the decoded files are only read
+        for mo,content in raw_files.items():
+            self.assertEqual(open(self.file(mo)).read(),content)
+
+    def test_only_requested_columns(self):
+        df = self.read('QciProfilePredefined',['logicalchannelgrouprefvalue'])
+        self.assertEqual(list(df['logicalchannelgrouprefvalue']),[2,2])
+        self.assertNotIn('drxprofileref',df.columns)
+        self.assertNotIn('logicalchannelgroupref',df.columns)
+        self.assertEqual([column.name for column in requested_columns('EUtranCellFDD',['crsgain'])],[])
+        self.assertEqual([column.name for column in requested_columns('SectorCarrier',['nooftxantennas'])],
+                         ['eutrancellfddid','eutrancelltddid'])
+
+    def test_cache_stores_virtual_columns(self):
+        cmc = cmCollector(cache_folder=os.path.join(self.cm_folder,'cache'))
+        if not cmc.cache.enabled:
+            self.skipTest("pyarrow is not installed")
+
+        cmc.load_cm_file(self.file('EUtranCellFDD'))
+        self.assertIn('SiteType',cmc.cache.columns(self.file('EUtranCellFDD')))
+        self.assertEqual(list(self.read('EUtranCellFDD',['sitetype'],cmc=cmc)['sitetype']),['M','I'])
+
+    def test_parse_is_idempotent(self):
+        values = pd.Series(['ManagedElement=1,DrxProfile=5','5',None],dtype=object)
+        self.assertEqual(list(last_value(values)),['5','5',None])
+        self.assertEqual(list(last_value(last_value(values))),['5','5',None])
+
+if __name__ == "__main__":
+    unittest.main()